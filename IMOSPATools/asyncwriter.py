@@ -0,0 +1,104 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import logging
+import threading
+import concurrent.futures
+from typing import Final
+
+from . import audiofile
+from . import profiling
+
+log = logging.getLogger('IMOSPATools')
+
+DEFAULT_WRITER_THREADS: Final[int] = 1
+# number of writes waiting for a free writer thread
+DEFAULT_WRITER_QUEUE: Final[int] = 1
+
+
+class IMOSAcousticAsyncWriterException(Exception):
+    pass
+
+
+class AsyncWriter:
+    """
+    Writer stage running WAV/FLAC encoding (or any write) on a pool of
+    threads, so the calibration of the next record overlaps with the
+    encoding of the previous one. libsndfile releases the GIL while
+    encoding.
+
+    Backpressure: at most numThreads + maxQueued writes are outstanding,
+    submit() blocks until one of them is finished. So at most that many
+    calibrated arrays are held in memory, however fast the calibration is.
+    With a single thread the writes are done in the order of submission,
+    eg blocks of one file.
+
+    The arrays passed to submit() must not be modified by the caller
+    until the write is done.
+    """
+
+    def __init__(self, numThreads: int = DEFAULT_WRITER_THREADS,
+                 maxQueued: int = DEFAULT_WRITER_QUEUE):
+        """
+        :param numThreads: number of writer threads
+        :param maxQueued: number of writes waiting for a free thread
+        """
+        if numThreads < 1 or maxQueued < 0:
+            raise ValueError(f"Invalid number of writer threads {numThreads} or queue size {maxQueued}")
+        self.numThreads = numThreads
+        self.maxQueued = maxQueued
+        self._slots = threading.BoundedSemaphore(numThreads + maxQueued)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=numThreads,
+                                                               thread_name_prefix='IMOSPATools-writer')
+
+    def submit(self, func, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Run func(*args, **kwargs) on a writer thread, blocks while
+        numThreads + maxQueued writes are outstanding
+
+        :param func: write function
+        :return: future of the write, its exception is the write error
+        """
+        with profiling.stage('asyncwriter.wait'):
+            self._slots.acquire()
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except RuntimeError as e:
+            self._slots.release()
+            logMsg = "Writer is already closed"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticAsyncWriterException(logMsg)
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def writeMono16bit(self, fileName: str, signal, metadata: audiofile.MetadataFull,
+                       fileFormat: str = 'WAV',
+                       profile: profiling.FileProfile = None) -> concurrent.futures.Future:
+        """
+        Asynchronous audiofile.writeMono16bit()
+
+        :param profile: profile of the file detached from the calling thread
+                        (see profiling.detachFile()), the encoding is timed into it
+        :return: future of the write
+        """
+        return self.submit(_writeMono16bit, profile, fileName, signal, metadata, fileFormat)
+
+    def close(self) -> None:
+        """
+        Wait for all the writes to finish and stop the writer threads
+        """
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+
+def _writeMono16bit(profile: profiling.FileProfile, fileName: str, signal,
+                    metadata: audiofile.MetadataFull, fileFormat: str) -> None:
+    # runs on a writer thread, timed into the profile of the file
+    with profiling.attachFile(profile):
+        audiofile.writeMono16bit(fileName, signal, metadata, fileFormat)
@@ -1,18 +1,59 @@
+import os
 import soundfile
 import logging
 import numpy
-import re
 import json
+import struct
 from datetime import datetime, timezone
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field, asdict
+from typing import Final
+
+from . import profiling
 
 log = logging.getLogger('IMOSPATools')
 
+# IMOS metadata (json string) is stored in the ICMT entry of the LIST/INFO
+# chunk of WAV, or as 'comment' of the VORBIS_COMMENT block of FLAC
+WAVE_COMMENT_ID: Final[bytes] = b'ICMT'
+FLAC_VORBIS_COMMENT_TYPE: Final[int] = 4
+FLAC_COMMENT_KEY: Final[str] = 'comment'
+# signal statistics are computed on 16 bit PCM counts
+FULL_SCALE_COUNT: Final[int] = 32768
+CLIP_UPPER_COUNT: Final[int] = 32767
+CLIP_LOWER_COUNT: Final[int] = -32768
+# number of frames read at once by inspectStats()
+INSPECT_BLOCK_FRAMES: Final[int] = 1 << 20
+
 
 class IMOSAcousticAudioFileException(Exception):
     pass
 
 
+@dataclass
+class AudioFileInfo:
+    fileName: str = ''
+    # soundfile format and subtype, eg WAV, PCM_16
+    format: str = ''
+    subtype: str = ''
+    numChannels: int = 1
+    sampleRate: int = 0
+    numFrames: int = 0
+    # duration in seconds
+    duration: float = 0
+    # ICMT (.wav) or comment (.flac), IMOS metadata as json string
+    comment: str = None
+
+
+@dataclass
+class AudioFileStats:
+    numFrames: int = 0
+    # amplitudes relative to the full scale (1.0)
+    maxAbs: float = 0.0
+    rms: float = 0.0
+    # samples at the limits of 16 bit PCM
+    numClipped: int = 0
+
+
 @dataclass
 class MetadataEssential:
     numChannels: int = 1
@@ -51,6 +92,26 @@ class MetadataFull:
     # -196 seems to be the most common value of hydrophone sensitivity
     hydrophoneSensitivity: float = -196
     scaleFactor: float = 1.0
+    # signal QA of the raw data (see qa.computeSignalQA()) - clipped
+    # (overloaded) samples and flat lines (stuck A/D converter or dropout)
+    numOverloaded: int = 0
+    longestOverloadRun: int = 0
+    numFlatRuns: int = 0
+    longestFlatRun: int = 0
+
+
+@dataclass
+class MetadataMerged(MetadataFull):
+    # number of consecutive DAT records merged into the file
+    numRecords: int = 0
+    # samples written as silence where records do not follow each other
+    numGapSamples: int = 0
+    # samples of the records beyond the scale factor, clipped to full scale
+    numClipped: int = 0
+    # per record boundary [name of the next record, its startTime,
+    # time from the previous record endTime to it in seconds]
+    # (positive gap, negative overlap)
+    gaps: list = field(default_factory=list)
 
 
 def deriveOutputFileName(rawFileName: str, ext: str) -> str:
@@ -87,30 +148,23 @@ def createOutputFileName(setID: int, startTime: datetime, ext: str) -> str:
     return outputFileName
 
 
-def writeMono16bit(fileName: str, binData: numpy.ndarray,
-                   metadataStruct: MetadataEssential=None,
-                   fileFormat='WAV') -> None:
+def formatMetadata(metadataStruct: MetadataEssential = None) -> str:
     """
-    Write audio signal data into a MS wave file
+    Format metadata into a json string stored in the comment tag
 
-    :param fileName: filename of the output audio file
-    :param sampleRate: sampling rate
-    :param binData: audio data as numpy.ndarray of numpy.int16
-    :param metadataStruct: a dataclass structure with metadata. 
-                           some go into the mandatory file header,
-                           all then as metadata stored in comment tag
-                           as json string.
-    :return: None
+    :param metadataStruct: a dataclass structure with metadata
+    :return: metadata as json string
     """
     if metadataStruct is not None:
         # Micro$oft wave format does not support custom metadata.
         # The workaround is: Format metadata into a json string and
         # write that into wav as a ad sound frame at the end of the file
-        metadataStruct.durationFile = len(binData)/metadataStruct.sampleRate
         metadataDict = asdict(metadataStruct)
         for key, value in metadataDict.items():
-            # Convert the value to a string
-            metadataDict[key] = str(value)
+            # Convert the value to a string, lists (eg gaps of
+            # MetadataMerged) stay JSON arrays readers can parse
+            if not isinstance(value, (list, dict)):
+                metadataDict[key] = str(value)
 
         # #Serialize the metadata dictionary to a JSON
         # metadataJson = json.dumps(metadataDict)
@@ -121,13 +175,56 @@ def writeMono16bit(fileName: str, binData: numpy.ndarray,
         metadataString = json.dumps(metadataDict)
     else:
         metadataString = "IMOS audio"
+    return metadataString
+
+
+def openMono16bit(fileName: str, metadataStruct: MetadataEssential,
+                  fileFormat='WAV') -> soundfile.SoundFile:
+    """
+    Open audio file for writing in blocks, with the metadata
+    already stored in the comment tag - all the metadata
+    (incl. durationFile) must be known before the audio data.
 
+    :param fileName: filename of the output audio file
+    :param metadataStruct: a dataclass structure with metadata
+    :param fileFormat: 'WAV' or 'FLAC'
+    :return: soundfile.SoundFile open for writing, to be closed by the caller
+    """
+    try:
+        sf = soundfile.SoundFile(fileName, mode='w', samplerate=int(metadataStruct.sampleRate),
+                                 channels=1, subtype='PCM_16', format=fileFormat)
+        # __setattr__(self, name, value) is not part of official documented API
+        # see https://python-soundfile.readthedocs.io/en/0.11.0/_modules/soundfile.htm
+        sf.__setattr__('comment', formatMetadata(metadataStruct))
+    except (IOError, OSError, soundfile.LibsndfileError) as e:
+        logMsg = f"Error writing audio file {fileName}"
+        log.error(logMsg + f"\nException {e}")
+        raise IMOSAcousticAudioFileException(logMsg)
+    return sf
+
+
+@profiling.timed('audiofile.encode')
+def writeMono16bit(fileName: str, binData: numpy.ndarray,
+                   metadataStruct: MetadataEssential=None,
+                   fileFormat='WAV') -> None:
+    """
+    Write audio signal data into a MS wave file
+
+    :param fileName: filename of the output audio file
+    :param sampleRate: sampling rate
+    :param binData: audio data as numpy.ndarray of numpy.int16
+    :param metadataStruct: a dataclass structure with metadata. 
+                           some go into the mandatory file header,
+                           all then as metadata stored in comment tag
+                           as json string.
+    :return: None
+    """
+    if metadataStruct is not None:
+        metadataStruct.durationFile = len(binData)/metadataStruct.sampleRate
+
+    sf = openMono16bit(fileName, metadataStruct, fileFormat)
     try:
-        with soundfile.SoundFile(fileName, mode='w', samplerate=int(metadataStruct.sampleRate),
-                                 channels=1, subtype='PCM_16', format=fileFormat) as sf:
-            # __setattr__(self, name, value) is not part of official documented API
-            # see https://python-soundfile.readthedocs.io/en/0.11.0/_modules/soundfile.htm
-            sf.__setattr__('comment', metadataString)
+        with sf:
             sf.write(binData)
     except (IOError, OSError, soundfile.LibsndfileError) as e:
         logMsg = f"Error writing audio file {fileName}"
@@ -160,42 +257,120 @@ def detectAudioFormat(fileName: str) -> str:
         return "Unknown format"
 
 
-def extractMetadataStr(fileName: str) -> str:
+def readWaveComment(file) -> str:
     """
-    Extract IMOS metadata as string from tag ICMT (.wav)
-    or comment (.flac)
+    Read the ICMT entry of the LIST/INFO chunk of a WAV file, walking
+    the RIFF chunks - the audio data chunk is skipped, not read
 
-    :param fileName: filename of the audio file
-    :return: meta data in text form, shall be a Json string
+    :param file: binary file object positioned at the start of the file
+    :return: comment as string, None if there is no comment
     """
-    # Define the regular expression pattern to find the JSON-like structure
-    regexp_ICMT = r'ICMT\s*:\s*({.*?})'
-    regexp_comment = r'comment\s*:\s*({.*?})'
-
-    audioFormat = detectAudioFormat(fileName)
-    log.debug(f"Detected file format {audioFormat}")
+    header = file.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise IMOSAcousticAudioFileException(f"Not a WAVE file: {file.name}")
+
+    while True:
+        chunkHeader = file.read(8)
+        if len(chunkHeader) < 8:
+            return None
+        chunkId, chunkSize = struct.unpack('<4sI', chunkHeader)
+        # chunks are padded to even size
+        skip = chunkSize + (chunkSize & 1)
+        if chunkId == b'LIST' and file.read(4) == b'INFO':
+            body = file.read(chunkSize - 4)
+            pos = 0
+            while pos + 8 <= len(body):
+                entryId, entrySize = struct.unpack_from('<4sI', body, pos)
+                if entryId == WAVE_COMMENT_ID:
+                    return body[pos + 8:pos + 8 + entrySize].rstrip(b'\x00').decode('utf-8', errors='replace')
+                pos += 8 + entrySize + (entrySize & 1)
+            skip = chunkSize & 1
+        elif chunkId == b'LIST':
+            skip -= 4
+        file.seek(skip, os.SEEK_CUR)
+
+
+def readFlacComment(file) -> str:
+    """
+    Read the comment of the VORBIS_COMMENT metadata block of a FLAC file,
+    walking the metadata blocks - no audio frame is read or decoded
 
-    if audioFormat == "WAVE":
-        regexpMeta = regexp_ICMT
-    elif audioFormat == "FLAC":
-        regexpMeta = regexp_comment
-    else:
-        regexpMeta = ""
-        raise IMOSAcousticAudioFileException(f"Unsupported audio format for file: {fileName}, expected WAVE or FLAC.")
+    :param file: binary file object positioned at the start of the file
+    :return: comment as string, None if there is no comment
+    """
+    if file.read(4) != b'fLaC':
+        raise IMOSAcousticAudioFileException(f"Not a FLAC file: {file.name}")
+
+    while True:
+        blockHeader = file.read(4)
+        if len(blockHeader) < 4:
+            return None
+        isLast = blockHeader[0] & 0x80
+        blockType = blockHeader[0] & 0x7f
+        blockSize = int.from_bytes(blockHeader[1:4], 'big')
+        if blockType == FLAC_VORBIS_COMMENT_TYPE:
+            # little-endian lengths, unlike the rest of FLAC
+            body = file.read(blockSize)
+            vendorLength, = struct.unpack_from('<I', body, 0)
+            pos = 4 + vendorLength
+            numComments, = struct.unpack_from('<I', body, pos)
+            pos += 4
+            for _ in range(numComments):
+                length, = struct.unpack_from('<I', body, pos)
+                pos += 4
+                name, sep, value = body[pos:pos + length].decode('utf-8', errors='replace').partition('=')
+                pos += length
+                if sep and name.lower() == FLAC_COMMENT_KEY:
+                    return value
+            # there is at most one VORBIS_COMMENT block
+            return None
+        if isLast:
+            return None
+        file.seek(blockSize, os.SEEK_CUR)
+
+
+def readComment(fileName: str) -> (str, str):
+    """
+    Read the comment of a WAV or FLAC file directly from the file header,
+    without opening the file with soundfile (no audio decoder)
 
+    :param fileName: filename of the audio file
+    :return: audio format "WAVE" or "FLAC"
+    :return: comment as string, None if there is no comment
+    """
     try:
-        with soundfile.SoundFile(fileName, mode='r') as sf:
-            info = sf.extra_info
-    except (IOError, OSError, soundfile.LibsndfileError) as e:
+        with open(fileName, 'rb') as file:
+            magic = file.read(12)
+            file.seek(0)
+            if magic.startswith(b'RIFF') and magic[8:12] == b'WAVE':
+                return "WAVE", readWaveComment(file)
+            elif magic.startswith(b'fLaC'):
+                return "FLAC", readFlacComment(file)
+    except (IOError, OSError) as e:
         logMsg = f"Error inspecting audio file {fileName}"
         log.error(logMsg + f"\nException {e}")
         raise IMOSAcousticAudioFileException(logMsg)
+    except struct.error as e:
+        logMsg = f"Error: Truncated metadata in audio file {fileName}"
+        log.error(logMsg + f"\nException {e}")
+        raise IMOSAcousticAudioFileException(logMsg)
+    raise IMOSAcousticAudioFileException(f"Unsupported audio format for file: {fileName}, expected WAVE or FLAC.")
+
+
+def extractMetadataStr(fileName: str) -> str:
+    """
+    Extract IMOS metadata as string from tag ICMT (.wav)
+    or comment (.flac), reading only the file header (see readComment())
 
-    # Search for the pattern in the file content
-    match = re.search(regexpMeta, info, re.DOTALL)
-    if match:
-        metadataString = match.group(1)
-        return metadataString
+    :param fileName: filename of the audio file
+    :return: meta data in text form, shall be a Json string
+    """
+    audioFormat, comment = readComment(fileName)
+    log.debug(f"Detected file format {audioFormat}")
+
+    # IMOS metadata is a json object, other comments are not metadata
+    if comment is not None and comment.lstrip().startswith('{'):
+        return comment.strip()
     else:
         logMsg = f"Error: Metadata (as ICMT tag) not found in audio file {fileName}"
         log.error(logMsg)
@@ -253,6 +428,67 @@ def extractMetadataStruct(fileName: str) -> MetadataEssential:
         raise IMOSAcousticAudioFileException(logMsg)
 
 
+def inspectInfo(fileName: str) -> AudioFileInfo:
+    """
+    Read the facts about an audio file available in its header,
+    no audio data is read
+
+    :param fileName: filename of the audio file
+    :return: AudioFileInfo
+    """
+    try:
+        info = soundfile.info(fileName)
+    except (IOError, OSError, soundfile.LibsndfileError) as e:
+        logMsg = f"Error inspecting audio file {fileName}"
+        log.error(logMsg + f"\nException {e}")
+        raise IMOSAcousticAudioFileException(logMsg)
+    try:
+        _, comment = readComment(fileName)
+    except IMOSAcousticAudioFileException:
+        comment = None
+    return AudioFileInfo(fileName=fileName, format=info.format, subtype=info.subtype,
+                         numChannels=info.channels, sampleRate=info.samplerate,
+                         numFrames=info.frames, duration=info.frames / info.samplerate,
+                         comment=comment)
+
+
+def inspectStats(fileName: str, blockFrames: int = INSPECT_BLOCK_FRAMES) -> AudioFileStats:
+    """
+    Signal statistics of an audio file, read in blocks of fixed size,
+    so the memory used does not depend on the length of the file
+
+    :param fileName: filename of the audio file
+    :param blockFrames: number of frames read at once
+    :return: AudioFileStats, amplitudes relative to full scale
+    """
+    stats = AudioFileStats()
+    maxCount = 0
+    sumSquares = 0.0
+    try:
+        with soundfile.SoundFile(fileName, mode='r') as sf:
+            for block in sf.blocks(blocksize=blockFrames, dtype='int16'):
+                # int32, abs(-32768) does not fit int16
+                counts = block.astype(numpy.int32).ravel()
+                if counts.size == 0:
+                    continue
+                stats.numFrames += block.shape[0]
+                stats.numClipped += int(numpy.count_nonzero((counts >= CLIP_UPPER_COUNT) |
+                                                            (counts <= CLIP_LOWER_COUNT)))
+                maxCount = max(maxCount, int(numpy.max(numpy.abs(counts))))
+                # float64, the sum of squares overflows int32
+                floatCounts = counts.astype(numpy.float64)
+                sumSquares += float(numpy.dot(floatCounts, floatCounts))
+            numSamples = stats.numFrames * sf.channels
+    except (IOError, OSError, soundfile.LibsndfileError) as e:
+        logMsg = f"Error inspecting audio file {fileName}"
+        log.error(logMsg + f"\nException {e}")
+        raise IMOSAcousticAudioFileException(logMsg)
+    stats.maxAbs = maxCount / FULL_SCALE_COUNT
+    if numSamples > 0:
+        stats.rms = float(numpy.sqrt(sumSquares / numSamples)) / FULL_SCALE_COUNT
+    return stats
+
+
 def loadInspect(fileName: str) -> soundfile.SoundFile:
     """
     Load IMOS audio record (wav or flac) and print
@@ -278,3 +514,30 @@ def loadInspect(fileName: str) -> soundfile.SoundFile:
         logMsg = f"Error inspecting audio file {fileName}"
         log.error(logMsg + f"\nException {e}")
         raise IMOSAcousticAudioFileException(logMsg)
+
+
+def inspectReport(fileName: str, stats: bool = False) -> AudioFileInfo:
+    """
+    Inspect IMOS audio record (wav or flac) and print
+    information from the file header. Unlike loadInspect()
+    the signal is read only with stats, in blocks, never
+    as a whole (see inspectStats()).
+
+    :param fileName: filename of the audio file
+    :param stats: read the signal and print its maximum abs amplitude,
+                  by default only the file header is read
+    :return: AudioFileInfo
+    """
+    info = inspectInfo(fileName)
+    print(f"{info.format} {info.subtype}, {info.numChannels} channel(s)")
+    if info.comment is not None:
+        print(f"Comment: {info.comment}")
+    print("----------------------------------------------------")
+    print(f"Audio record duration {info.duration:.2f}s")
+    print(f"Sampling rate {info.sampleRate}Hz")
+    if stats:
+        signalStats = inspectStats(fileName)
+        print(f"Maximum abs amplitude of the signal: {signalStats.maxAbs}")
+        print(f"RMS amplitude of the signal: {signalStats.rms}")
+        print(f"Clipped samples: {signalStats.numClipped}")
+    return info
@@ -0,0 +1,630 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import glob
+import time
+import logging
+import functools
+import multiprocessing
+import numpy
+from datetime import timedelta
+from dataclasses import dataclass
+from typing import Final
+
+from . import rawdat
+from . import calibration
+from . import audiofile
+from . import calibcache
+from . import qa
+from . import profiling
+from . import asyncwriter
+from . import prefetch
+from . import manifest
+from . import streamcalib
+
+log = logging.getLogger('IMOSPATools')
+
+# Calibration prepared once per worker process by initWorker(),
+# as calibration.CalibrationTransfer, None if not calibrating
+_workerTransfer = None
+_workerCnl = None
+_workerHs = None
+# floating point precision of the calibration, numpy.float64 or numpy.float32
+_workerDtype = numpy.float64
+# buffers of the calibration reused from file to file
+_workerWorkspace = None
+# number of encoder threads per worker process, 0 means synchronous writing
+_workerWriterThreads = 0
+# number of raw files read ahead per worker process, 0 means no read-ahead
+_workerPrefetchDepth = 0
+# calibrate block by block straight into the output file (see
+# streamcalib.calibrateRawToFile()), with a fixed scale factor
+# or None to compute it in a first pass
+_workerStreaming = False
+_workerScaleFactor = None
+# error loading the calibration in the worker process, reported
+# for each file of the worker, None if loaded
+_workerInitError = None
+# number of files handed to a worker process at once when encoding
+# asynchronously or reading ahead (per worker, the encoding and
+# the reading overlap within a chunk)
+WRITER_CHUNKS_PER_WORKER: Final[int] = 4
+# module globals set by initWorker(), restored after converting in-process
+_WORKER_GLOBALS: Final[tuple] = ('_workerTransfer', '_workerCnl', '_workerHs', '_workerDtype',
+                                 '_workerWorkspace', '_workerWriterThreads', '_workerPrefetchDepth',
+                                 '_workerStreaming', '_workerScaleFactor', '_workerInitError')
+
+
+class IMOSAcousticBatchException(Exception):
+    pass
+
+
+@dataclass
+class BatchFileResult:
+    rawFileName: str = ""
+    outputFileName: str = ""
+    success: bool = False
+    errorMsg: str = ""
+    # wall time spent on the conversion of the file, in seconds
+    elapsed: float = 0.0
+    # signal QA statistics of the raw data, None if not read
+    signalQA: qa.SignalQA = None
+    # reason the file was not converted (output up to date, duplicate
+    # of another file), empty if converted
+    skipped: str = ""
+
+
+def collectInputFiles(inputs: list[str]) -> list[str]:
+    """
+    Expand batch inputs into a sorted list of raw (.DAT) file names
+
+    Each input item can be
+        - a directory: all .DAT files directly in the directory
+          (not recursive, so 'Calib_file' sub-directories are skipped)
+        - a glob pattern, eg 'deployment/*.DAT'
+        - a file list: text file with one .DAT file name per line,
+          either prefixed with '@' or with extension .txt or .lst
+        - a single .DAT file name
+
+    :param inputs: list of directories, glob patterns or file lists
+    :return: sorted list of unique raw file names
+    """
+    fileNames = []
+    for item in inputs:
+        if os.path.isdir(item):
+            fileNames.extend(glob.glob(os.path.join(item, '*.DAT')))
+        elif item.startswith('@') or item.lower().endswith(('.txt', '.lst')):
+            listFileName = item[1:] if item.startswith('@') else item
+            try:
+                with open(listFileName, 'r') as listFile:
+                    for line in listFile:
+                        line = line.strip()
+                        if line and not line.startswith('#'):
+                            fileNames.append(line)
+            except (IOError, OSError) as e:
+                logMsg = f"Error reading list of input files {listFileName}"
+                log.error(logMsg + f"\nException {e}")
+                raise IMOSAcousticBatchException(logMsg)
+        elif glob.has_magic(item):
+            fileNames.extend(glob.glob(item))
+        else:
+            fileNames.append(item)
+
+    # remove duplicates, keep deterministic order
+    return sorted(set(fileNames))
+
+
+def outputFileNameFor(rawFileName: str, fileFormat: str,
+                      outputDir: str = None) -> str:
+    """
+    Derive the output audio file name for a raw file in batch mode
+
+    :param rawFileName: raw (.DAT) file name
+    :param fileFormat: output format extension ('wav' or 'flac')
+    :param outputDir: output directory, None means next to the input file
+    :return: output file name
+    """
+    outputFileName = audiofile.deriveOutputFileName(rawFileName, fileFormat)
+    if outputDir is not None:
+        outputFileName = os.path.join(outputDir, os.path.basename(outputFileName))
+    return outputFileName
+
+
+def loadCalibration(calibFileName: str, cnl: float, hs: float,
+                    calibCacheDir: str = None,
+                    spectralHighPass: bool = False) -> calibration.CalibrationTransfer:
+    """
+    Load and pre-process the calibration file of a batch conversion
+
+    :param calibFileName: calibration file name
+    :param cnl: calibration noise level (dB re V^2/Hz)
+    :param hs: hydrophone sensitivity (dB re V/uPa)
+    :param calibCacheDir: directory of the on-disk calibration cache,
+                          None means no caching
+    :param spectralHighPass: apply the high-pass filter in the frequency domain
+                             (see calibration.CalibrationTransfer)
+    :return: calibration.CalibrationTransfer
+    """
+    try:
+        if calibCacheDir is not None:
+            cache = calibcache.CalibCache(calibCacheDir)
+            calSpec, calFreq, calSampleRate = cache.loadPrepCalibFile(calibFileName, cnl, hs)
+        else:
+            calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(calibFileName, cnl, hs)
+        return calibration.CalibrationTransfer(calSpec, calFreq, calSampleRate,
+                                               spectralHighPass=spectralHighPass)
+    except calibration.IMOSAcousticCalibException:
+        raise
+    except (calibcache.IMOSAcousticCalibCacheException, IOError, OSError, ValueError) as e:
+        logMsg = f"Error loading calibration file {calibFileName}"
+        log.error(logMsg + f"\nException {e}")
+        raise calibration.IMOSAcousticCalibException(logMsg)
+
+
+def initWorker(calibFileName: str, cnl: float, hs: float,
+               logLevel: int = logging.INFO,
+               calibCacheDir: str = None,
+               dtype: numpy.dtype = numpy.float64,
+               profileFileName: str = None,
+               fftWorkers: int = 1,
+               fftFastLength: bool = False,
+               spectralHighPass: bool = False,
+               writerThreads: int = 0,
+               prefetchDepth: int = 0,
+               streaming: bool = False,
+               scaleFactor: float = None,
+               profileRunID: str = None) -> None:
+    """
+    Initialise a batch worker process - load and pre-process
+    the calibration file only once per worker. Never raises (a failing
+    pool initializer is respawned forever), a calibration error is
+    reported by convertFile() for each file instead.
+
+    :param calibFileName: calibration file name, None if not calibrating
+    :param cnl: calibration noise level (dB re V^2/Hz)
+    :param hs: hydrophone sensitivity (dB re V/uPa)
+    :param logLevel: logging level of the worker process
+    :param calibCacheDir: directory of the on-disk calibration cache,
+                          None means no caching
+    :param dtype: numpy.float64 or numpy.float32 (single precision calibration)
+    :param profileFileName: JSON lines file of per file stage timing
+                            (see profiling module), None means no profiling
+    :param fftWorkers: number of FFT threads per worker (see calibration.setFFTBackend())
+    :param fftFastLength: zero-pad the FFT to a fast length (see calibration.setFFTBackend())
+    :param spectralHighPass: apply the high-pass filter in the frequency domain
+                             (see calibration.CalibrationTransfer)
+    :param writerThreads: number of encoder threads (see asyncwriter.AsyncWriter),
+                          0 means the output files are written synchronously
+    :param prefetchDepth: number of raw files read ahead (see prefetch.Prefetcher),
+                          0 means each file is read when it is converted
+    :param streaming: calibrate and write block by block (see
+                      streamcalib.calibrateRawToFile()), memory bounded
+                      by the block size instead of the record length
+    :param scaleFactor: scale factor of the streamed output, None means
+                        computed in a first pass over the record
+    :param profileRunID: id of the batch written into the profile records
+                         (see profiling.enable())
+    """
+    global _workerTransfer, _workerCnl, _workerHs, _workerDtype, _workerWriterThreads, \
+        _workerPrefetchDepth, _workerWorkspace, _workerStreaming, _workerScaleFactor, \
+        _workerInitError
+
+    # spawned (not forked) workers do not inherit logging configuration
+    if not logging.getLogger().hasHandlers():
+        logging.basicConfig(level=logLevel)
+    log.setLevel(logLevel)
+
+    if profileFileName is not None:
+        profiling.enable(profileFileName, runID=profileRunID)
+    calibration.setFFTBackend(fftWorkers, fftFastLength)
+
+    _workerCnl = cnl
+    _workerHs = hs
+    _workerDtype = dtype
+    _workerWriterThreads = writerThreads
+    _workerPrefetchDepth = prefetchDepth
+    _workerStreaming = streaming
+    _workerScaleFactor = scaleFactor
+    # no whole record buffers when streaming
+    _workerWorkspace = None if streaming else calibration.Workspace()
+    _workerTransfer = None
+    _workerInitError = None
+    if calibFileName is not None:
+        try:
+            _workerTransfer = loadCalibration(calibFileName, cnl, hs, calibCacheDir, spectralHighPass)
+        except calibration.IMOSAcousticCalibException as e:
+            _workerInitError = str(e)
+
+
+def convertFile(rawFileName: str, outputFileName: str,
+                fileFormat: str = 'wav', setID: int = 0,
+                generateFileName: bool = False,
+                writer: asyncwriter.AsyncWriter = None,
+                prefetched=None) -> BatchFileResult:
+    """
+    Convert one raw (.DAT) file into calibrated WAV or FLAC file,
+    using the calibration prepared by initWorker().
+    Errors are not raised, they are reported in the returned result.
+
+    :param rawFileName: raw (.DAT) file name
+    :param outputFileName: output audio file name
+    :param fileFormat: output format ('wav' or 'flac')
+    :param setID: data set ID stored in the metadata
+    :param generateFileName: generate output file name from set ID
+                             and record start time, placed in the
+                             directory of outputFileName
+    :param writer: asynchronous writer of the output file, None means
+                   writing synchronously. The result is completed when
+                   the file is written, ie once the writer is closed.
+    :param prefetched: future of the raw record read ahead (see prefetch.Prefetcher),
+                       None means the file is read (memory mapped) here
+    :return: BatchFileResult - conversion result of the file
+    """
+    result = BatchFileResult(rawFileName=rawFileName,
+                             outputFileName=outputFileName)
+    timeStart = time.perf_counter()
+    pending = False
+    profile = None
+    profiling.beginFile(rawFileName)
+    try:
+        if _workerInitError is not None:
+            raise calibration.IMOSAcousticCalibException(_workerInitError)
+        if prefetched is not None:
+            record = prefetch.waitRecord(prefetched)
+        else:
+            # header and footer only, the samples are mapped below
+            record = rawdat.RawDatRecord(rawFileName)
+        sampleRate = record.sampleRate
+        startTime = record.startTime
+
+        if generateFileName:
+            outputFileName = os.path.join(os.path.dirname(outputFileName),
+                                          audiofile.createOutputFileName(setID, startTime, fileFormat))
+            result.outputFileName = outputFileName
+
+        binData = record.samples
+        durationFile = binData.size / sampleRate
+        endTime = startTime + timedelta(seconds=durationFile)
+
+        metadata = audiofile.MetadataFull(
+            setID=setID,
+            schedule=record.schedule,
+            numChannels=record.numChannels,
+            sampleRate=sampleRate,
+            durationHeader=record.durationHeader,
+            durationFile=durationFile,
+            startTime=startTime,
+            endTime=endTime,
+        )
+
+        signalQA = qa.computeSignalQA(binData)
+        result.signalQA = signalQA
+        qa.storeInMetadata(signalQA, metadata)
+        if signalQA.numOverloaded > 0:
+            log.warning(f"Logger was overloaded - signal is clipped for {signalQA.numOverloaded} samples in {rawFileName}.")
+
+        if _workerTransfer is not None:
+            if sampleRate != _workerTransfer.fSample:
+                raise calibration.IMOSAcousticCalibException(
+                    "Sample rate is different between the audio record and calibration file.")
+            metadata.calibNoiseLevel = _workerCnl
+            metadata.hydrophoneSensitivity = _workerHs
+
+        if _workerStreaming:
+            # calibrated block by block straight into the output file
+            streamcalib.calibrateRawToFile(binData, _workerTransfer, outputFileName, metadata,
+                                           fileFormat.upper(), signalQA.meanCount, _workerScaleFactor)
+            result.success = True
+        else:
+            workspace = _workerWorkspace
+            voltsOut = None
+            if workspace is not None:
+                voltsOut = workspace.buffer('volts', binData.size, _workerDtype)
+            volts = calibration.toVolts(binData, signalQA.meanCount, _workerDtype, voltsOut)
+            if _workerTransfer is not None:
+                signal = _workerTransfer.calibrateReal(volts, _workerDtype, workspace)
+            else:
+                signal = volts
+
+            # scaled in place, unless the file is written asynchronously
+            # while the next file reuses the workspace
+            scaledSignal, scaleFactor = calibration.scale(signal, signal if writer is None else None)
+            metadata.scaleFactor = scaleFactor
+
+            if writer is None:
+                audiofile.writeMono16bit(outputFileName, scaledSignal, metadata,
+                                         fileFormat.upper())
+                result.success = True
+            else:
+                # the profile of the file is finished once it is written,
+                # along with the encoding time of the writer thread
+                profile = profiling.detachFile()
+                future = writer.writeMono16bit(outputFileName, scaledSignal, metadata,
+                                               fileFormat.upper(), profile)
+                pending = True
+                future.add_done_callback(functools.partial(_writeDone, result, timeStart, profile))
+    except (rawdat.IMOSAcousticRAWReadException,
+            calibration.IMOSAcousticCalibException,
+            audiofile.IMOSAcousticAudioFileException,
+            IOError, OSError, ValueError) as e:
+        result.errorMsg = str(e)
+        log.error(f"Failed to convert {rawFileName}: {e}")
+    except Exception as e:
+        # unexpected error, fail only this file and keep its traceback
+        result.errorMsg = f"{type(e).__name__}: {e}"
+        log.exception(f"Unexpected error converting {rawFileName}")
+
+    if not pending:
+        result.elapsed = time.perf_counter() - timeStart
+        profiling.endFile(profile, output=result.outputFileName, success=result.success)
+    return result
+
+
+def _writeDone(result: BatchFileResult, timeStart: float,
+               profile: profiling.FileProfile, future) -> None:
+    # called by the writer thread once the output file is written
+    e = future.exception()
+    if e is None:
+        result.success = True
+    else:
+        result.errorMsg = str(e)
+        log.error(f"Failed to write {result.outputFileName}: {e}")
+    result.elapsed = time.perf_counter() - timeStart
+    if profile is not None:
+        profiling.endFile(profile, output=result.outputFileName, success=result.success)
+
+
+def _convertChunk(tasks: list[tuple]) -> list[BatchFileResult]:
+    # convert a chunk of files in a worker, reading of the next files
+    # and encoding of the previous one overlap with the calibration
+    writer = asyncwriter.AsyncWriter(_workerWriterThreads) if _workerWriterThreads > 0 else None
+    try:
+        if _workerPrefetchDepth > 0:
+            prefetcher = prefetch.Prefetcher([task[0] for task in tasks], _workerPrefetchDepth)
+            results = [convertFile(*task, writer=writer, prefetched=future)
+                       for task, (_, future) in zip(tasks, prefetcher)]
+        else:
+            results = [convertFile(*task, writer=writer) for task in tasks]
+    finally:
+        if writer is not None:
+            writer.close()
+    return results
+
+
+def _saveProcessState() -> tuple:
+    # state changed by initWorker() - FFT backend, logging, worker globals
+    rootLogger = logging.getLogger()
+    return (calibration.fftWorkers, calibration.fftFastLength,
+            log.level, rootLogger.level, list(rootLogger.handlers),
+            {name: globals()[name] for name in _WORKER_GLOBALS})
+
+
+def _restoreProcessState(processState: tuple) -> None:
+    fftWorkers, fftFastLength, logLevel, rootLevel, rootHandlers, workerGlobals = processState
+    calibration.setFFTBackend(fftWorkers, fftFastLength)
+    log.setLevel(logLevel)
+    rootLogger = logging.getLogger()
+    rootLogger.setLevel(rootLevel)
+    rootLogger.handlers[:] = rootHandlers
+    globals().update(workerGlobals)
+
+
+def runBatch(rawFileNames: list[str], fileFormat: str = 'wav',
+             outputDir: str = None,
+             calibFileName: str = None, cnl: float = None, hs: float = None,
+             setID: int = 0, generateFileName: bool = False,
+             numWorkers: int = None,
+             calibCacheDir: str = None,
+             dtype: numpy.dtype = numpy.float64,
+             profileFileName: str = None,
+             fftWorkers: int = 1,
+             fftFastLength: bool = False,
+             spectralHighPass: bool = False,
+             writerThreads: int = 0,
+             prefetchDepth: int = 0,
+             manifestFileName: str = None,
+             streaming: bool = False,
+             scaleFactor: float = None,
+             profileRunID: str = None) -> list[BatchFileResult]:
+    """
+    Convert many raw (.DAT) files using a pool of worker processes.
+    The calibration file is loaded and pre-processed once per worker.
+    Files which would overwrite the output of another file of the batch
+    (same name, eg from different folders into one output directory)
+    fail without being converted. A calibration file which fails to load
+    raises calibration.IMOSAcousticCalibException before any conversion.
+
+    :param rawFileNames: list of raw (.DAT) file names
+    :param fileFormat: output format ('wav' or 'flac')
+    :param outputDir: output directory, None means next to the input files
+    :param calibFileName: calibration file name, None means no calibration
+    :param cnl: calibration noise level (dB re V^2/Hz)
+    :param hs: hydrophone sensitivity (dB re V/uPa)
+    :param setID: data set ID stored in the metadata
+    :param generateFileName: generate output file names from set ID and start time
+    :param numWorkers: number of worker processes, None means all CPU cores
+    :param calibCacheDir: directory of the on-disk calibration cache,
+                          None means no caching
+    :param dtype: numpy.float64 or numpy.float32 (single precision calibration)
+    :param profileFileName: JSON lines file of per file stage timing
+                            (see profiling module), None means no profiling
+    :param fftWorkers: number of FFT threads per worker process
+                       (see calibration.setFFTBackend())
+    :param fftFastLength: zero-pad the FFT to a fast length (see calibration.setFFTBackend())
+    :param spectralHighPass: apply the high-pass filter in the frequency domain
+                             (see calibration.CalibrationTransfer)
+    :param writerThreads: number of encoder threads per worker process, the
+                          encoding overlaps with the calibration of the next
+                          file (see asyncwriter.AsyncWriter), 0 means synchronous
+    :param prefetchDepth: number of raw files read ahead per worker process by
+                          a background thread, the reading overlaps with the
+                          calibration (see prefetch.Prefetcher), 0 means no read-ahead
+    :param manifestFileName: manifest of the converted files (see manifest.Manifest),
+                             only new or changed files (or all the files, if the
+                             conversion parameters changed) are converted, files
+                             with the same content only once. None means convert all
+    :param streaming: calibrate and write block by block (see
+                      streamcalib.calibrateRawToFile()), memory bounded
+                      by the block size instead of the record length,
+                      always double precision, no encoder threads nor read-ahead
+    :param scaleFactor: scale factor of the streamed output, None means
+                        computed in a first pass over each record
+    :param profileRunID: id of the batch written into each profile record,
+                         to read only its records from the profile file
+                         (see profiling.readProfile()), None means a new id
+    :return: list of BatchFileResult, in the order of rawFileNames
+    """
+    if numWorkers is None:
+        numWorkers = os.cpu_count() or 1
+    if profileFileName is not None and profileRunID is None:
+        profileRunID = profiling.newRunID()
+
+    if outputDir is not None:
+        os.makedirs(outputDir, exist_ok=True)
+
+    if streaming and (writerThreads > 0 or prefetchDepth > 0):
+        log.warning("Streaming conversion writes each block as it is calibrated, "
+                    "encoder threads and read-ahead are not used")
+        writerThreads = 0
+        prefetchDepth = 0
+
+    skipped = {}
+    if manifestFileName is not None:
+        fileManifest = manifest.Manifest.load(manifestFileName)
+        params = manifest.conversionParams(calibFileName, cnl, hs, fileFormat, setID,
+                                           generateFileName, outputDir, dtype,
+                                           fftFastLength, spectralHighPass,
+                                           streaming, scaleFactor)
+        states = fileManifest.sourceStates(rawFileNames)
+        duplicates = manifest.findDuplicates(states)
+        for rawFileName in rawFileNames:
+            if rawFileName in duplicates:
+                skipped[rawFileName] = f"duplicate of {duplicates[rawFileName]}"
+            elif fileManifest.isUpToDate(rawFileName, states[rawFileName], params):
+                skipped[rawFileName] = "up to date"
+        log.info(f"Manifest {manifestFileName}: {len(skipped)} of {len(rawFileNames)} files "
+                 f"up to date or duplicates")
+
+    tasks = []
+    failed = {}
+    outputOwners = {}
+    for rawFileName in rawFileNames:
+        if rawFileName in skipped:
+            continue
+        outputFileName = outputFileNameFor(rawFileName, fileFormat, outputDir)
+        if not generateFileName:
+            # eg same named files from more folders into one output directory
+            owner = outputOwners.setdefault(os.path.normcase(os.path.abspath(outputFileName)),
+                                            rawFileName)
+            if owner != rawFileName:
+                errorMsg = f"Output file {outputFileName} is also the output of {owner}"
+                log.error(f"Failed to convert {rawFileName}: {errorMsg}")
+                failed[rawFileName] = BatchFileResult(rawFileName=rawFileName,
+                                                      outputFileName=outputFileName,
+                                                      errorMsg=errorMsg)
+                continue
+        tasks.append((rawFileName, outputFileName, fileFormat, setID, generateFileName))
+
+    if tasks and calibFileName is not None:
+        # fail fast in this process, rather than in each worker
+        loadCalibration(calibFileName, cnl, hs, calibCacheDir, spectralHighPass)
+
+    numWorkers = max(1, min(numWorkers, len(tasks)))
+    initArgs = (calibFileName, cnl, hs, log.getEffectiveLevel(), calibCacheDir, dtype,
+                profileFileName, fftWorkers, fftFastLength, spectralHighPass, writerThreads,
+                prefetchDepth, streaming, scaleFactor, profileRunID)
+
+    log.info(f"Converting {len(tasks)} files using {numWorkers} worker(s)")
+
+    if not tasks:
+        results = []
+    elif numWorkers == 1:
+        # no point spawning a process pool, do the work in this process,
+        # leaving it as it was for the caller
+        processState = _saveProcessState()
+        try:
+            initWorker(*initArgs)
+            results = _convertChunk(tasks)
+        finally:
+            if profileFileName is not None:
+                profiling.disable()
+            _restoreProcessState(processState)
+    else:
+        # files one by one for the best load balance, unless encoding
+        # asynchronously or reading ahead, which overlap only within
+        # a chunk of files
+        chunkSize = 1
+        if writerThreads > 0 or prefetchDepth > 0:
+            chunkSize = max(1, len(tasks) // (numWorkers * WRITER_CHUNKS_PER_WORKER))
+        chunks = [tasks[i:i + chunkSize] for i in range(0, len(tasks), chunkSize)]
+        with multiprocessing.Pool(numWorkers, initializer=initWorker,
+                                  initargs=initArgs) as pool:
+            results = [result for chunkResults in pool.imap(_convertChunk, chunks)
+                       for result in chunkResults]
+
+    converted = {r.rawFileName: r for r in results}
+    converted.update(failed)
+    if manifestFileName is not None:
+        for rawFileName, result in converted.items():
+            if result.success and states[rawFileName] is not None:
+                fileManifest.record(rawFileName, states[rawFileName], params, result.outputFileName)
+            else:
+                fileManifest.forget(rawFileName)
+        for rawFileName in skipped:
+            original = duplicates.get(rawFileName)
+            outputFileName = fileManifest.outputOf(original or rawFileName)
+            result = BatchFileResult(rawFileName=rawFileName, outputFileName=outputFileName,
+                                     success=outputFileName is not None,
+                                     skipped=skipped[rawFileName])
+            if result.success:
+                # refresh modification time, eg of a touched file
+                fileManifest.record(rawFileName, states[rawFileName], params, outputFileName, original)
+            else:
+                # the file with the same content failed to convert
+                result.errorMsg = f"{original} failed to convert"
+            converted[rawFileName] = result
+        fileManifest.save()
+
+    results = [converted[rawFileName] for rawFileName in rawFileNames]
+    return results
+
+
+def summariseBatch(results: list[BatchFileResult]) -> str:
+    """
+    Format per file success/failure summary of a batch conversion
+
+    :param results: list of BatchFileResult
+    :return: summary as multi-line string
+    """
+    numFailed = sum(1 for r in results if not r.success)
+    numSkipped = sum(1 for r in results if r.success and r.skipped)
+    numSuspect = sum(1 for r in results if r.success and _formatSignalQA(r.signalQA))
+    totalElapsed = sum(r.elapsed for r in results)
+    lines = []
+    for r in results:
+        if r.success and r.skipped:
+            lines.append(f"SKIPPED {r.rawFileName} -> {r.outputFileName} ({r.skipped})")
+        elif r.success:
+            lines.append(f"OK     {r.rawFileName} -> {r.outputFileName} ({r.elapsed:.2f}s)"
+                         f"{_formatSignalQA(r.signalQA)}")
+        else:
+            lines.append(f"FAILED {r.rawFileName}: {r.errorMsg}")
+    lines.append(f"Converted {len(results) - numFailed - numSkipped} of {len(results)} files, "
+                 f"{numSkipped} skipped, {numFailed} failed, {numSuspect} clipped or with flat lines, "
+                 f"{totalElapsed:.2f}s total worker time.")
+    return "\n".join(lines)
+
+
+def _formatSignalQA(signalQA: qa.SignalQA) -> str:
+    # overload and flat line statistics of a file, empty if none
+    if signalQA is None:
+        return ""
+    issues = []
+    if signalQA.numOverloaded > 0:
+        issues.append(f"{signalQA.numOverloaded} samples clipped, "
+                      f"longest run {signalQA.longestOverloadRun}")
+    if signalQA.numFlatRuns > 0:
+        issues.append(f"{signalQA.numFlatRuns} flat lines, "
+                      f"longest {signalQA.longestFlatRun} samples")
+    return f" [{'; '.join(issues)}]" if issues else ""
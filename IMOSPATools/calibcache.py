@@ -0,0 +1,188 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import hashlib
+import logging
+import tempfile
+import numpy
+from typing import Final
+
+from . import calibration
+
+log = logging.getLogger('IMOSPATools')
+
+# bump when the content or meaning of the cached arrays changes,
+# so stale cache entries are never used
+CACHE_FORMAT_VERSION: Final[int] = 1
+CACHE_FILE_EXT: Final[str] = '.npz'
+DEFAULT_CACHE_MAX_BYTES: Final[int] = 256 * 1024 * 1024
+HASH_BLOCK_SIZE: Final[int] = 1 << 20
+
+
+class IMOSAcousticCalibCacheException(Exception):
+    pass
+
+
+def hashFileContent(fileName: str) -> str:
+    """
+    Compute SHA-256 hash of the file content
+
+    :param fileName: file name (can be relative/full path)
+    :return: hex digest of the file content
+    """
+    sha = hashlib.sha256()
+    with open(fileName, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class CalibCache:
+    """
+    Persistent on-disk cache of pre-processed calibration spectra
+    (the product of calibration.loadPrepCalibFile()).
+
+    Entries are .npz files keyed by the calibration file content hash
+    plus the calibration noise level and hydrophone sensitivity.
+    When the total size of the cache exceeds maxBytes, the least
+    recently used entries are evicted.
+    Safe to share between parallel worker processes - entries are
+    written into a temporary file and atomically renamed.
+    """
+
+    def __init__(self, cacheDir: str, maxBytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cacheDir, exist_ok=True)
+
+    def key(self, fileName: str, cnl: float, hs: float) -> str:
+        """
+        Cache key of the pre-processed calibration file
+
+        :param fileName: calibration file name
+        :param cnl: calibration noise level (dB re V^2/Hz)
+        :param hs: hydrophone sensitivity (dB re V/uPa)
+        :return: cache key as hex string
+        """
+        sha = hashlib.sha256()
+        sha.update(hashFileContent(fileName).encode('ascii'))
+        sha.update(f"|{float(cnl)!r}|{float(hs)!r}|{CACHE_FORMAT_VERSION}".encode('ascii'))
+        return sha.hexdigest()
+
+    def entryPath(self, key: str) -> str:
+        return os.path.join(self.cacheDir, key + CACHE_FILE_EXT)
+
+    def get(self, key: str) -> tuple[numpy.ndarray, numpy.ndarray, float] | None:
+        """
+        Get cache entry
+
+        :param key: cache key
+        :return: (calSpec, calFreq, sampleRate) or None if not cached
+        """
+        path = self.entryPath(key)
+        try:
+            with numpy.load(path) as npz:
+                entry = (npz['calSpec'], npz['calFreq'], float(npz['sampleRate']))
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+        # mark as recently used for the eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, calSpec: numpy.ndarray, calFreq: numpy.ndarray,
+            sampleRate: float) -> None:
+        """
+        Store cache entry and evict old entries if the cache is too big
+
+        :param key: cache key
+        :param calSpec: calibration spectrum
+        :param calFreq: calibration frequencies
+        :param sampleRate: sampling rate of the calibration file
+        """
+        tmpPath = None
+        try:
+            fd, tmpPath = tempfile.mkstemp(suffix='.tmp', dir=self.cacheDir)
+            with os.fdopen(fd, 'wb') as file:
+                numpy.savez(file, calSpec=calSpec, calFreq=calFreq,
+                            sampleRate=numpy.float64(sampleRate))
+            os.replace(tmpPath, self.entryPath(key))
+        except (IOError, OSError) as e:
+            # failing to cache is not fatal, the result is still valid
+            log.warning(f"Failed to store calibration cache entry {key}: {e}")
+            if tmpPath is not None:
+                try:
+                    os.remove(tmpPath)
+                except OSError:
+                    pass
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache fits into maxBytes
+        """
+        entries = []
+        for entry in os.scandir(self.cacheDir):
+            if entry.name.endswith(CACHE_FILE_EXT):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        totalBytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                log.debug(f"Evicted calibration cache entry {path}")
+            except OSError:
+                # possibly removed by another worker in the meantime
+                pass
+            totalBytes -= size
+
+    def loadPrepCalibFile(self, fileName: str, cnl: float,
+                          hs: float) -> (numpy.ndarray, numpy.ndarray, float):
+        """
+        Cached equivalent of calibration.loadPrepCalibFile()
+
+        :param fileName: calibration file name (can be relative/full path)
+        :param cnl: calibration noise level (dB re V^2/Hz)
+        :param hs: hydrophone sensitivity (dB re V/uPa)
+        :return: calibration spectrum as numpy array
+        :return: calibration frequencies as numpy array
+        :return: sampling rate
+        """
+        try:
+            key = self.key(fileName, cnl, hs)
+        except (IOError, OSError) as e:
+            logMsg = f"Error reading calibration file {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticCalibCacheException(logMsg)
+
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            log.info(f"Calibration cache hit for {fileName} (key {key[:12]})")
+            return entry
+
+        self.misses += 1
+        log.info(f"Calibration cache miss for {fileName} (key {key[:12]})")
+        calSpec, calFreq, sampleRate = calibration.loadPrepCalibFile(fileName, cnl, hs)
+        self.put(key, calSpec, calFreq, sampleRate)
+        return calSpec, calFreq, sampleRate
+
+    def stats(self) -> dict:
+        """
+        Cache statistics of this process
+
+        :return: dict with number of hits and misses
+        """
+        return {'hits': self.hits, 'misses': self.misses}
@@ -2,22 +2,93 @@ import numpy
 import scipy
 import logging
 from typing import Final
+from collections import OrderedDict
 
 from . import rawdat
+from . import profiling
+from . import psd
 # from IMOSPATools import diagplot
 
 OVERLOAD_LOWER_BOUND: Final[int] = 50
 OVERLOAD_UPPER_BOUND: Final[int] = 65000
 FULLSCALE_VOLTS: Final[float] = 5.0
+# number of record lengths memoised by CalibrationTransfer
+TRANSFER_MAX_CACHED_LENGTHS: Final[int] = 8
+# number of Welch segments of the calibration record read at once
+# by the streaming PSD estimate, see loadPrepCalibFile()
+CALIB_BLOCK_SEGMENTS: Final[int] = 16
+# size of the median filter smoothing the calibration spectrum
+CALIB_MEDIAN_SIZE: Final[int] = 51
+# length of the record edges affected by the zero-padded FFT (fast length)
+# calibration and by the spectral high-pass, and the max difference from
+# the unpadded calibration and sosfiltfilt() elsewhere, relative to the
+# max amplitude, see setFFTBackend() and CalibrationTransfer
+EDGE_EFFECT_SECONDS: Final[float] = 2.0
+EDGE_EFFECT_REL_TOLERANCE: Final[float] = 5e-4
 
 log = logging.getLogger('IMOSPATools')
 doWriteIntermediateResults = False
+# FFT backend of the real FFT calibration, see setFFTBackend()
+fftWorkers = 1
+fftFastLength = False
+# numpy.fft writes into preallocated arrays (out=) since numpy 2.0
+_NUMPY_FFT_OUT: Final[bool] = numpy.lib.NumpyVersion(numpy.__version__) >= '2.0.0'
 
 
 class IMOSAcousticCalibException(Exception):
     pass
 
 
+class Workspace:
+    """
+    Buffers of the calibration pipeline (volts, spectrum, calibrated
+    signal, NaN mask) reused from record to record, eg by a batch worker.
+    A buffer is allocated only when a record is longer than any before
+    (or of different dtype), otherwise a view of its first samples is
+    returned - records of a deployment are nearly all of the same length,
+    so nothing is allocated after the first one.
+
+    The buffers are overwritten by the next record, results living in
+    a buffer must be consumed (eg written) before that.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        # number of buffers allocated so far
+        self.numAllocations = 0
+
+    def buffer(self, name: str, size: int, dtype: numpy.dtype) -> numpy.ndarray:
+        """
+        :param name: name of the buffer, eg 'volts'
+        :param size: number of elements
+        :param dtype: dtype of the elements
+        :return: 1-D array of size elements, contents undefined
+        """
+        buf = self._buffers.get(name)
+        if buf is None or buf.size < size or buf.dtype != dtype:
+            buf = numpy.empty(size, dtype=dtype)
+            self._buffers[name] = buf
+            self.numAllocations += 1
+        return buf[:size]
+
+    def clear(self) -> None:
+        """
+        Release all the buffers
+        """
+        self._buffers.clear()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+
+def _hasNaN(signal: numpy.ndarray, workspace: Workspace = None) -> bool:
+    # the mask of the NaN check is a full length temporary
+    if workspace is None:
+        return bool(numpy.isnan(signal).any())
+    return bool(numpy.isnan(signal, out=workspace.buffer('nanMask', signal.size, numpy.bool_)).any())
+
+
 def countOverload(binData: numpy.ndarray) -> int:
     """
     Count samples with overload
@@ -29,20 +100,26 @@ def countOverload(binData: numpy.ndarray) -> int:
     :param binData: raw audio data
     :return: count of samples with overload
     """
-    count = 0
-    for i in binData:
-        if i < OVERLOAD_LOWER_BOUND or i > OVERLOAD_UPPER_BOUND:
-            count += 1
+    count = numpy.count_nonzero((binData < OVERLOAD_LOWER_BOUND) | (binData > OVERLOAD_UPPER_BOUND))
 
-    return count
+    return int(count)
 
 
-def toVolts(binData: numpy.ndarray) -> numpy.ndarray:
+@profiling.timed('calibration.toVolts')
+def toVolts(binData: numpy.ndarray, meanCount: float = None,
+            dtype: numpy.dtype = numpy.float64,
+            out: numpy.ndarray = None) -> numpy.ndarray:
     """
     Convert waw data to Volts
     Modified Franks method
 
     :param binData: raw audio data
+    :param meanCount: mean of raw audio data if already known
+                      (eg from qa.computeSignalQA()), saves one pass
+    :param dtype: numpy.float64 (default) or numpy.float32 for
+                  single precision calibration, half memory traffic
+    :param out: preallocated array of dtype and size of binData
+                (eg from Workspace), None means allocate
     :return: audio data in Volts
     """
 
@@ -51,8 +128,24 @@ def toVolts(binData: numpy.ndarray) -> numpy.ndarray:
 
     # Multiply by this factor to convert A/D counts to volts 0.0..5.0V
     countsToVolts = FULLSCALE_VOLTS / (1 << rawdat.BITS_PER_SAMPLE)
-    offsetToVolts = numpy.mean(binData[:] * countsToVolts)
-    voltsData = (countsToVolts * binData[:]) - offsetToVolts
+    if numpy.dtype(dtype) == numpy.float64:
+        if meanCount is None:
+            offsetToVolts = numpy.mean(binData[:] * countsToVolts)
+        else:
+            offsetToVolts = meanCount * countsToVolts
+        voltsData = numpy.multiply(countsToVolts, binData, out=out)
+        voltsData -= offsetToVolts
+    else:
+        # the mean is always accumulated in double precision
+        if meanCount is None:
+            meanCount = numpy.mean(binData, dtype=numpy.float64)
+        if out is None:
+            voltsData = binData.astype(dtype)
+        else:
+            voltsData = out
+            numpy.copyto(voltsData, binData, casting='unsafe')
+        voltsData -= dtype(meanCount)
+        voltsData *= dtype(countsToVolts)
 
     if doWriteIntermediateResults:
         numpy.savetxt('signal_voltsData.txt', voltsData, fmt='%.5f')
@@ -60,20 +153,60 @@ def toVolts(binData: numpy.ndarray) -> numpy.ndarray:
     return voltsData
 
 
+def welchCalibFile(fileName: str,
+                   blockSegments: int = CALIB_BLOCK_SEGMENTS) -> (numpy.ndarray, numpy.ndarray, float):
+    """
+    Power spectral density of the calibration file, estimated by Welch
+    method with Hamming window of 1 second, streamed from the file in
+    blocks of blockSegments segments - same result as scipy.signal.welch()
+    of the whole calibration record in Volts (see loadPrepCalibFile())
+
+    :param fileName: file name (can be relative/full path)
+    :param blockSegments: number of segments read at once
+    :return: calibration frequencies as numpy array
+    :return: calibration spectrum as numpy array
+    :return: sampling rate
+    """
+    info = rawdat.readRawFileInfo(fileName)
+    sampleRate = float(info.header.sampleRate)
+    log.debug(f"Calibration data size is: {info.numSamples}")
+
+    welch = psd.StreamingWelch(sampleRate, scipy.signal.windows.hamming(round(sampleRate)))
+    # no need to subtract the mean of the record when converting to Volts,
+    # the Welch estimate detrends each segment
+    countsToVolts = FULLSCALE_VOLTS / (1 << rawdat.BITS_PER_SAMPLE)
+    blockSize = blockSegments * welch.step
+    for firstSample in range(0, info.numSamples, blockSize):
+        binData = rawdat.readRawSampleRange(info, firstSample,
+                                            min(blockSize, info.numSamples - firstSample))
+        welch.update(binData * countsToVolts)
+
+    calFreq, calSpec = welch.psd()
+    return calFreq, calSpec, sampleRate
+
+
+@profiling.timed('calibration.loadPrepCalibFile')
 def loadPrepCalibFile(fileName: str,
                       cnl: float,
-                      hs: float) -> (numpy.ndarray, numpy.ndarray, float):
+                      hs: float,
+                      streaming: bool = True) -> (numpy.ndarray, numpy.ndarray, float):
     """
     Load and pre-process calibration file
 
     :param fileName: file name (can be relative/full path)
     :param cnl: calibration noise level (dB re V^2/Hz)
     :param hs: hydrophone sensitivity (dB re V/uPa)
-    :param binData: raw audio data
+    :param streaming: estimate the spectrum reading the file in blocks
+                      (welchCalibFile()), not the whole record at once,
+                      not used when writing intermediate results
     :return: calibration spectrum as numpy array
     :return: calibration frequencies as numpy array
     :return: sampling rate
     """
+    if streaming and not doWriteIntermediateResults:
+        calFreq, calSpec, sampleRate = welchCalibFile(fileName)
+        return _calibSpecNoise(calSpec, cnl, hs), calFreq, sampleRate
+
     calBinData, numChannels, sampleRate, durationHeader, \
         startTime, endTime, scheduleTime = rawdat.readRawFile(fileName)
 
@@ -122,8 +255,13 @@ def loadPrepCalibFile(fileName: str,
     log.debug(f"calSpec size is: {calSpec.size}")
     log.debug(f"calFreq size is: {calFreq.size}")
 
+    return _calibSpecNoise(calSpec, cnl, hs), calFreq, sampleRate
+
+
+def _calibSpecNoise(calSpec: numpy.ndarray, cnl: float, hs: float) -> numpy.ndarray:
     # apply 51 th-order one-dimensional median filter
-    calSpecFilt = scipy.signal.medfilt(calSpec, 51)
+    # (same as scipy.signal.medfilt(calSpec, 51))
+    calSpecFilt = psd.runningMedian(calSpec, CALIB_MEDIAN_SIZE)
     calSpecNoise = calSpecFilt / (10.0 ** (cnl/10.0)) * (10.0 ** (hs/10.0))
     log.debug(f"calSpec scaled size is: {calSpec.size}")
 
@@ -131,7 +269,7 @@ def loadPrepCalibFile(fileName: str,
         numpy.savetxt('calSpecFilt.txt', calSpecFilt)
         numpy.savetxt('calSpecNoise.txt', calSpecNoise)
 
-    return calSpecNoise, calFreq, sampleRate
+    return calSpecNoise
 
 
 def extractNotClose(array1, array2, rtol=1e-05, atol=1e-08):
@@ -229,6 +367,311 @@ def enforceConjugateSymmetry(spectrum: numpy.ndarray) -> numpy.ndarray:
     return spectrum
 
 
+def setFFTBackend(workers: int = 1, fastLength: bool = False) -> None:
+    """
+    Configure the FFT of the real FFT calibration (calibrateReal())
+
+    The number of samples of a record is the nominal duration plus an
+    arbitrary tail, and often has large prime factors, so the FFT time
+    varies a lot from record to record. With fastLength the signal is
+    zero-padded to the next 2-3-5 smooth length and the calibrated
+    signal is cropped back. The padding replaces the circular wrap-around
+    of the calibration filter at the record edges by zeros, so the result
+    differs from the unpadded calibration within the first and last
+    EDGE_EFFECT_SECONDS of the record, elsewhere within
+    EDGE_EFFECT_REL_TOLERANCE of the max amplitude.
+    scipy.fft threads work on independent transforms, so a single record
+    gains little from workers - the padding is what makes it fast.
+
+    :param workers: number of threads of scipy.fft, -1 means all CPU cores,
+                    1 (default) means numpy.fft in double precision
+    :param fastLength: zero-pad the FFT to a fast length (scipy.fft.next_fast_len)
+    """
+    global fftWorkers, fftFastLength
+    if workers == 0 or workers < -1:
+        raise ValueError(f"Invalid number of FFT workers {workers}")
+    fftWorkers = workers
+    fftFastLength = fastLength
+
+
+def fftLength(numSamples: int) -> int:
+    """
+    FFT length used by the real FFT calibration of a record, see setFFTBackend()
+
+    :param numSamples: number of samples of the audio record
+    :return: FFT length, >= numSamples
+    """
+    if fftFastLength:
+        return scipy.fft.next_fast_len(numSamples, real=True)
+    return numSamples
+
+
+@profiling.timed('calibration.rfft')
+def rfft(signal: numpy.ndarray, n: int = None,
+         out: numpy.ndarray = None) -> numpy.ndarray:
+    """
+    Real FFT that keeps single precision of the signal
+    (numpy.fft before version 2.0 always computes in double precision,
+    scipy.fft keeps float32 -> complex64)
+
+    :param signal: real signal, float64 or float32
+    :param n: FFT length, the signal is zero-padded up to it
+    :param out: preallocated complex128 array of n // 2 + 1 elements,
+                used by numpy.fft only (double precision, 1 worker, numpy 2.0+)
+    :return: one-sided spectrum, complex128 or complex64
+    """
+    if signal.dtype == numpy.float32 or fftWorkers != 1:
+        return scipy.fft.rfft(signal, n, workers=fftWorkers)
+    if out is not None and _NUMPY_FFT_OUT:
+        return numpy.fft.rfft(signal, n, out=out)
+    return numpy.fft.rfft(signal, n)
+
+
+@profiling.timed('calibration.irfft')
+def irfft(spec: numpy.ndarray, n: int = None,
+          out: numpy.ndarray = None) -> numpy.ndarray:
+    """
+    Inverse real FFT that keeps single precision of the spectrum
+
+    :param spec: one-sided spectrum, complex128 or complex64
+    :param n: length of the output signal
+    :param out: preallocated float64 array of n elements, used by
+                numpy.fft only (double precision, 1 worker, numpy 2.0+)
+    :return: real signal, float64 or float32
+    """
+    if spec.dtype == numpy.complex64 or fftWorkers != 1:
+        return scipy.fft.irfft(spec, n, workers=fftWorkers)
+    if out is not None and _NUMPY_FFT_OUT:
+        return numpy.fft.irfft(spec, n, out=out)
+    return numpy.fft.irfft(spec, n)
+
+
+class CalibrationTransfer:
+    """
+    Calibration transfer function prepared from the pre-processed
+    calibration file (product of loadPrepCalibFile()), reusable
+    for calibration of many audio records.
+
+    The high-pass filter and the interpolation function are made
+    only once. The interpolated calibration spectrum and the spectral
+    correction 1/sqrt(calSpecInt) depend on the number of samples
+    of the record, so they are memoised per record length, least
+    recently used lengths are evicted. Nearly all records of a
+    deployment are of the same length, so the interpolation is done
+    once per batch.
+
+    With spectralHighPass the high-pass filter is not run over the
+    record, its zero-phase (forward-backward) magnitude response |H|^2
+    is multiplied into the memoised correction instead, so the record
+    is traversed only by the FFT. The filter is then circular rather than
+    starting from rest, so like the fast length FFT (setFFTBackend()) the
+    result deviates from sosfiltfilt() at the record edges, bounded by
+    EDGE_EFFECT_SECONDS and EDGE_EFFECT_REL_TOLERANCE.
+    """
+
+    def __init__(self, calSpec: numpy.ndarray, calFreq: numpy.ndarray,
+                 fSample: float, maxCachedLengths: int = TRANSFER_MAX_CACHED_LENGTHS,
+                 spectralHighPass: bool = False):
+        """
+        :param calSpec: calibration spectrum
+        :param calFreq: calibration frequencies
+        :param fSample: sampling frequency of the recorder sensor
+        :param maxCachedLengths: max number of record lengths memoised
+        :param spectralHighPass: apply the high-pass filter in the frequency
+                                 domain, as part of the correction
+        """
+        self.calSpec = calSpec
+        self.calFreq = calFreq
+        self.fSample = fSample
+        self.maxCachedLengths = maxCachedLengths
+        self.spectralHighPass = spectralHighPass
+        # memoised (calSpecInt, correction) keyed by number of samples
+        self._cache = OrderedDict()
+
+        # Make high-pass filter to remove slow varying DC offset
+        # 5th order Butterworth filter with a critical frequency 10/sampling rate
+
+        # MCu Note: according to SciPy documentation, and other public information,
+        # https://stackoverflow.com/questions/12093594/how-to-implement-band-pass-butterworth-filter-with-scipy-signal-butter
+        # SciPy bandpass filters designed with b, a are unstable and may result
+        # in erroneous filters at higher filter orders.
+        # It is better use sos (second-order sections) output of filter design.
+        #   b, a = scipy.signal.butter(5, 5/fSample*2, btype='high', output='ba')
+        self.sos = scipy.signal.butter(5, 5/fSample*2, btype='high', output='sos')
+
+        # MC note: the interpolation function numpy.interp() has a different
+        #          params order compared with matlab function interp1()
+        # calSpecInt = numpy.interp(freqFFT, calFreq, calSpec)
+
+        # --- Let's try scipy.interpolate.interp1d instead ---
+        # Create the interpolation function, only once per calibration file
+        # (results are the same as with numpy.interp())
+        self.interpFunc = scipy.interpolate.interp1d(calFreq, calSpec,
+                                                     kind='linear',
+                                                     fill_value="extrapolate")
+
+    @profiling.timed('calibration.highPass')
+    def highPass(self, volts: numpy.ndarray) -> numpy.ndarray:
+        """
+        Apply the high-pass filter removing slow varying DC offset
+
+        :param volts: audio data/signal in Volts
+        :return: filtered audio signal
+        """
+        # Apply the filter on the input signal
+        # MCu Note: Both ba and regular sos filters result in frequency
+        # dependant phase shift. The phase delay can be eliminated by using
+        # forward-backward filtering, in case of non-realtim processing.
+        #   signal = scipy.signal.lfilter(b, a, volts)
+        # Just replace lfilter() with filtfilt()
+        # signal = scipy.signal.filtfilt(b, a, volts)
+
+        #   signal = scipy.signal.sosfilt(sos, volts)
+        # Just replace sosfilt() with sosfiltfilt()
+        signal = scipy.signal.sosfiltfilt(self.sos, volts)
+        # However, the first about 100 milliseconds of the forward-backward
+        # filtered signal have a bit of DC offset artifact
+
+        # MCu Note: the poles of the 5 Hz high-pass are very close to the unit
+        # circle, the recursive filter in float32 is off by up to 36 LSB of
+        # the 16-bit output. So it always runs in double precision, and only
+        # the result is converted back to single precision.
+        return signal.astype(volts.dtype, copy=False)
+
+    def fftFrequencies(self, numSamples: int) -> numpy.ndarray:
+        """
+        Frequencies of the one-sided spectrum of a record
+
+        :param numSamples: number of samples of the audio record
+        :return: frequencies as numpy array
+        """
+        fmax = self.calFreq[len(self.calFreq) - 1]
+        df = fmax * 2 / numSamples
+        # generate a set of frequencies as ndarray, exactly as many as
+        # rfft() bins also for odd number of samples (same values as
+        # numpy.arange(0, fmax + df, df) for even number of samples)
+        return numpy.arange(numSamples // 2 + 1) * df
+
+    def highPassResponse(self, numSamples: int) -> numpy.ndarray:
+        """
+        Magnitude response of the forward-backward high-pass filter
+        (squared magnitude response of the filter) at the frequencies
+        of the one-sided spectrum of a record
+
+        :param numSamples: number of samples of the audio record
+        :return: zero-phase high-pass response, real
+        """
+        freq = numpy.fft.rfftfreq(numSamples, 1.0 / self.fSample)
+        _, h = scipy.signal.sosfreqz(self.sos, worN=freq, fs=self.fSample)
+        return h.real ** 2 + h.imag ** 2
+
+    def _prepare(self, numSamples: int) -> tuple:
+        entry = self._cache.get(numSamples)
+        if entry is not None:
+            self._cache.move_to_end(numSamples)
+            return entry
+
+        freqFFT = self.fftFrequencies(numSamples)
+        calSpecInt = self.interpFunc(freqFFT)
+
+        # Ignore calibration values below 5 Hz to avoid inadequate correction
+        N5Hz = numpy.where(freqFFT <= 5)[0]
+        calSpecInt[N5Hz] = calSpecInt[N5Hz[-1]]
+
+        correction = 1.0 / numpy.sqrt(calSpecInt)
+        if self.spectralHighPass:
+            correction *= self.highPassResponse(numSamples)
+        # memoised arrays are shared, protect them from modification
+        calSpecInt.setflags(write=False)
+        correction.setflags(write=False)
+
+        # correction in single precision made on demand, see correction()
+        entry = [calSpecInt, correction, None]
+        self._cache[numSamples] = entry
+        if len(self._cache) > self.maxCachedLengths:
+            self._cache.popitem(last=False)
+        log.debug(f"Calibration transfer prepared for record length {numSamples}")
+        return entry
+
+    def interpolatedSpectrum(self, numSamples: int) -> numpy.ndarray:
+        """
+        Calibration spectrum interpolated onto the one-sided spectrum
+        frequencies of a record (read-only, memoised)
+
+        :param numSamples: number of samples of the audio record
+        :return: interpolated calibration spectrum
+        """
+        return self._prepare(numSamples)[0]
+
+    def correction(self, numSamples: int,
+                   dtype: numpy.dtype = numpy.float64) -> numpy.ndarray:
+        """
+        Spectral correction 1/sqrt(calSpecInt) of the one-sided spectrum
+        of a record (read-only, memoised), with spectralHighPass
+        multiplied by the high-pass response (see highPassResponse())
+
+        :param numSamples: number of samples of the audio record
+        :param dtype: numpy.float64 (default) or numpy.float32
+        :return: spectral correction
+        """
+        entry = self._prepare(numSamples)
+        if numpy.dtype(dtype) == numpy.float64:
+            return entry[1]
+        if entry[2] is None:
+            entry[2] = entry[1].astype(numpy.float32)
+            entry[2].setflags(write=False)
+        return entry[2]
+
+    def calibrateReal(self, volts: numpy.ndarray,
+                      dtype: numpy.dtype = numpy.float64,
+                      workspace: Workspace = None) -> numpy.ndarray:
+        """
+        calibrate sound record using real FFT,
+        equivalent to module function calibrateReal()
+
+        :param volts: audio data/signal in Volts
+        :param dtype: numpy.float64 (default) or numpy.float32
+                      for single precision (complex64 spectrum)
+        :param workspace: buffers reused across records, the calibrated
+                          signal is then a view of a workspace buffer
+                          (valid until the next record), None means allocate
+        :return: calibrated audio signal
+        """
+        # Sanity check of the input audio signal (parameter volts) for NaNs
+        if _hasNaN(volts, workspace):
+            logMsg = "Audio signal in volts contains NaN value(s)"
+            log.error(logMsg)
+            raise IMOSAcousticCalibException(logMsg)
+
+        if self.spectralHighPass:
+            # high-pass is part of the correction
+            signal = volts.astype(dtype, copy=False)
+        else:
+            signal = self.highPass(volts.astype(dtype, copy=False))
+
+            # Sanity check if filtered audio signal sill has no NaNs
+            if _hasNaN(signal, workspace):
+                logMsg = "Audio signal in volts contains NaN value(s)"
+                log.error(logMsg)
+                raise IMOSAcousticCalibException(logMsg)
+
+        # the FFT may be zero-padded to a fast length, see setFFTBackend()
+        numFFT = fftLength(len(signal))
+        specOut = None
+        signalOut = None
+        # only numpy.fft writes into preallocated arrays, see rfft()
+        if workspace is not None and signal.dtype == numpy.float64 and fftWorkers == 1 and _NUMPY_FFT_OUT:
+            specOut = workspace.buffer('spectrum', numFFT // 2 + 1, numpy.complex128)
+            signalOut = workspace.buffer('calibrated', numFFT, numpy.float64)
+        spec = rfft(signal, numFFT, specOut)
+        spec *= self.correction(numFFT, signal.dtype)
+        calibratedSignal = irfft(spec, numFFT, signalOut)[:len(signal)]
+
+        log.debug(f"calibrated signal size is: {calibratedSignal.size}")
+
+        return calibratedSignal
+
+
 def calibrate(volts: numpy.ndarray, cnl: float, hs: float,
               calSpec: numpy.ndarray, calFreq: numpy.ndarray,
               fSample: float) -> numpy.ndarray:
@@ -251,29 +694,9 @@ def calibrate(volts: numpy.ndarray, cnl: float, hs: float,
         raise IMOSAcousticCalibException(logMsg)
 
     # Make high-pass filter to remove slow varying DC offset
-    # 5th order Butterworth filter with a critical frequency 10/sampling rate
-
-    # MCu Note: according to SciPy documentation, and other public information,
-    # https://stackoverflow.com/questions/12093594/how-to-implement-band-pass-butterworth-filter-with-scipy-signal-butter
-    # SciPy bandpass filters designed with b, a are unstable and may result
-    # in erroneous filters at higher filter orders.
-    # It is better use sos (second-order sections) output of filter design.
-    #   b, a = scipy.signal.butter(5, 5/fSample*2, btype='high', output='ba')
-    sos = scipy.signal.butter(5, 5/fSample*2, btype='high', output='sos')
-
-    # Apply the filter on the input signal
-    # MCu Note: Both ba and regular sos filters result in frequency
-    # dependant phase shift. The phase delay can be eliminated by using
-    # forward-backward filtering, in case of non-realtim processing.
-    #   signal = scipy.signal.lfilter(b, a, volts)
-    # Just replace lfilter() with filtfilt()
-    # signal = scipy.signal.filtfilt(b, a, volts)
-
-    #   signal = scipy.signal.sosfilt(sos, volts)
-    # Just replace sosfilt() with sosfiltfilt()
-    signal = scipy.signal.sosfiltfilt(sos, volts)
-    # However, the first about 100 milliseconds of the forward-backward
-    # filtered signal have a bit of DC offset artifact
+    # and apply it on the input signal (forward-backward, no phase shift)
+    transfer = CalibrationTransfer(calSpec, calFreq, fSample)
+    signal = transfer.highPass(volts)
 
     if doWriteIntermediateResults:
         numpy.savetxt('signal_filtered.txt', signal, fmt='%.5f')
@@ -287,37 +710,18 @@ def calibrate(volts: numpy.ndarray, cnl: float, hs: float,
     log.debug(f"filtered signal size is: {signal.size}")
 
     # make correction for calibration data to get signal amplitude in uPa:
-    fmax = calFreq[len(calFreq) - 1]
-    df = fmax * 2 / len(signal)
-    # generate a set of frequencies as ndarray
-    freqFFT = numpy.arange(0, fmax + df, df)
-    # MC note: the interpolation function numpy.interp() has a different
-    #          params order compared with matlab function interp1()
-    # calSpecInt = numpy.interp(freqFFT, calFreq, calSpec)
-
-    # --- Let's try scipy.interpolate.interp1d instead ---
-    # Create the interpolation function
-    # (which could be extracted from this library function
-    # and done only once per calibration file, not per each data file)
-    interp_func = scipy.interpolate.interp1d(calFreq, calSpec,
-                                             kind='linear',
-                                             fill_value="extrapolate")
-    # Interpolate the values (results are the same as with numpy.interp())
-    calSpecInt = interp_func(freqFFT)
-
-    # Ignore calibration values below 5 Hz to avoid inadequate correction
-    N5Hz = numpy.where(freqFFT <= 5)[0]
-    calSpecInt[N5Hz] = calSpecInt[N5Hz[-1]]
+    calSpecInt = transfer.interpolatedSpectrum(len(signal))
 
     if doWriteIntermediateResults:
-        numpy.savetxt('freq_fft.txt', freqFFT, fmt='%.3f')
+        numpy.savetxt('freq_fft.txt', transfer.fftFrequencies(len(signal)), fmt='%.3f')
         numpy.savetxt('calSpecInt.txt', calSpecInt)
 
     # debugging...
     log.debug(f'cal spec beg {calSpecInt[0:3]}')
     log.debug(f'cal spec end {calSpecInt[-3:][::-1]}')
 
-    spec = numpy.fft.fft(signal)
+    with profiling.stage('calibration.fft'):
+        spec = numpy.fft.fft(signal)
     if doWriteIntermediateResults:
         numpy.savetxt('spec.txt', spec, fmt='%.10f')
 
@@ -362,7 +766,8 @@ def calibrate(volts: numpy.ndarray, cnl: float, hs: float,
         log.warning(logMsg)
         # raise IMOSAcousticCalibException(logMsg)    
 
-    calibratedSignal = numpy.fft.ifft(specToInverse)
+    with profiling.stage('calibration.ifft'):
+        calibratedSignal = numpy.fft.ifft(specToInverse)
 
     # ## THIS DIAGNOSTIC CODE MAKES SENSE ONLY WHEN WE DON OT PICK ONLY REAL COMPONENT ABOVE
     maxAbsImaginary = numpy.max(numpy.abs(calibratedSignal.imag))
@@ -397,10 +802,12 @@ def calibrate(volts: numpy.ndarray, cnl: float, hs: float,
 
 def calibrateReal(volts: numpy.ndarray, cnl: float, hs: float,
                   calSpec: numpy.ndarray, calFreq: numpy.ndarray,
-                  fSample: float) -> numpy.ndarray:
+                  fSample: float,
+                  dtype: numpy.dtype = numpy.float64,
+                  spectralHighPass: bool = False) -> numpy.ndarray:
     """
     calibrate sound record using real FFT
-    (function numpy.fft.rfft(), numpy.fft.irfft())
+    (function numpy.fft.rfft(), numpy.fft.irfft(), or scipy.fft see setFFTBackend())
 
     :param volts: audio data/signal in Volts
     :param cnl: calibration noise level (dB re V^2/Hz)
@@ -408,6 +815,11 @@ def calibrateReal(volts: numpy.ndarray, cnl: float, hs: float,
     :param calSpec: calibration spectrum
     :param calFreq: calibration frequencies
     :param fSample: sampling frequency of the recorder sensor
+    :param dtype: numpy.float64 (default) or numpy.float32 for single
+                  precision (complex64 spectrum), see precision_report.py
+                  for the accuracy compared to double precision
+    :param spectralHighPass: apply the high-pass filter in the frequency domain
+                             (see CalibrationTransfer), instead of sosfiltfilt()
     :return: calibrated audio signal
     """
     # Sanity check of the input audio signal (parameter volts) for NaNs
@@ -417,30 +829,14 @@ def calibrateReal(volts: numpy.ndarray, cnl: float, hs: float,
         raise IMOSAcousticCalibException(logMsg)
 
     # Make high-pass filter to remove slow varying DC offset
-    # 5th order Butterworth filter with a critical frequency 10/sampling rate
-
-    # MCu Note: according to SciPy documentation, and other public information,
-    # https://stackoverflow.com/questions/12093594/how-to-implement-band-pass-butterworth-filter-with-scipy-signal-butter
-    # SciPy bandpass filters designed with b, a are unstable and may result
-    # in erroneous filters at higher filter orders.
-    # It is better use sos (second-order sections) output of filter design.
-
-    #   b, a = scipy.signal.butter(5, 5/fSample*2, btype='high', output='ba')
-    sos = scipy.signal.butter(5, 5/fSample*2, btype='high', output='sos')
-
-    # Apply the filter on the input signal
-    # MCu Note: Both ba and regular sos filters result in frequency
-    # dependant phase shift. The phase delay can be eliminated by using
-    # forward-backward filtering, in case of non-realtim processing.
-    #   signal = scipy.signal.lfilter(b, a, volts)
-    # Just replace lfilter() with filtfilt()
-    # signal = scipy.signal.filtfilt(b, a, volts)
-
-    #   signal = scipy.signal.sosfilt(sos, volts)
-    # Just replace sosfilt() with sosfiltfilt()
-    signal = scipy.signal.sosfiltfilt(sos, volts)
-    # However, the first about 100 milliseconds of the forward-backward
-    # filtered signal have a bit of DC offset artifact
+    # and apply it on the input signal (forward-backward, no phase shift)
+    # or in the frequency domain along with the calibration correction
+    transfer = CalibrationTransfer(calSpec, calFreq, fSample,
+                                   spectralHighPass=spectralHighPass)
+    if spectralHighPass:
+        signal = volts.astype(dtype, copy=False)
+    else:
+        signal = transfer.highPass(volts.astype(dtype, copy=False))
 
     if doWriteIntermediateResults:
         numpy.savetxt('signal_filtered.txt', signal, fmt='%.5f')
@@ -454,37 +850,19 @@ def calibrateReal(volts: numpy.ndarray, cnl: float, hs: float,
     log.debug(f"filtered signal size is: {signal.size}")
 
     # make correction for calibration data to get signal amplitude in uPa:
-    fmax = calFreq[len(calFreq) - 1]
-    df = fmax * 2 / len(signal)
-    # generate a set of frequencies as ndarray
-    freqFFT = numpy.arange(0, fmax + df, df)
-    # MC note: the interpolation function numpy.interp() has a different
-    #          params order compared with matlab function interp1()
-    # calSpecInt = numpy.interp(freqFFT, calFreq, calSpec)
-
-    # --- Let's try scipy.interpolate.interp1d instead ---
-    # Create the interpolation function
-    # (which could be extracted from this library function
-    # and done only once per calibration file, not per each data file)
-    interp_func = scipy.interpolate.interp1d(calFreq, calSpec,
-                                             kind='linear',
-                                             fill_value="extrapolate")
-    # Interpolate the values (results are the same as with numpy.interp())
-    calSpecInt = interp_func(freqFFT)
-
-    # Ignore calibration values below 5 Hz to avoid inadequate correction
-    N5Hz = numpy.where(freqFFT <= 5)[0]
-    calSpecInt[N5Hz] = calSpecInt[N5Hz[-1]]
+    # (the FFT may be zero-padded to a fast length, see setFFTBackend())
+    numFFT = fftLength(len(signal))
+    calSpecInt = transfer.interpolatedSpectrum(numFFT)
 
     if doWriteIntermediateResults:
-        numpy.savetxt('freq_fft.txt', freqFFT, fmt='%.3f')
+        numpy.savetxt('freq_fft.txt', transfer.fftFrequencies(numFFT), fmt='%.3f')
         numpy.savetxt('calSpecInt.txt', calSpecInt)
 
     # debugging...
     log.debug(f'cal spec beg {calSpecInt[0:3]}')
     log.debug(f'cal spec end {calSpecInt[-3:][::-1]}')
 
-    spec = numpy.fft.rfft(signal)
+    spec = rfft(signal, numFFT)
     log.debug(f"spec.size = {spec.size}")
     if doWriteIntermediateResults:
         numpy.savetxt('spec.txt', spec, fmt='%.10f')
@@ -498,9 +876,16 @@ def calibrateReal(volts: numpy.ndarray, cnl: float, hs: float,
     #   rfft() / irfft()
     pwrSpec = calSpecInt
     log.debug(f"pwrSpec.size = {pwrSpec.size}")
-    specToInverse = spec / numpy.sqrt(pwrSpec)
+    if spec.dtype == numpy.complex64:
+        # stay in single precision, use memoised float32 correction
+        specToInverse = spec * transfer.correction(numFFT, numpy.float32)
+    elif spectralHighPass:
+        # correction includes the high-pass response
+        specToInverse = spec * transfer.correction(numFFT)
+    else:
+        specToInverse = spec / numpy.sqrt(pwrSpec)
     log.debug(f"specToInverse.size = {specToInverse.size}")
-    calibratedSignal = numpy.fft.irfft(specToInverse)
+    calibratedSignal = irfft(specToInverse, numFFT)[:len(signal)]
 
     # debugging...
     # print(calibratedSignal[:5])
@@ -517,26 +902,53 @@ def calibrateReal(volts: numpy.ndarray, cnl: float, hs: float,
 
 
 
-def scale(signal: numpy.ndarray) -> (numpy.ndarray, float):
+def maxAbsOf(signal: numpy.ndarray) -> float:
+    """
+    Maximum abs amplitude of the signal, without a temporary abs array
+
+    :param signal: audio data/signal
+    :return: max abs amplitude
+    """
+    return max(numpy.max(signal), -numpy.min(signal))
+
+
+def scaleFactorOf(signal: numpy.ndarray, maxAbs: float = None) -> float:
+    """
+    Scale factor normalising the signal into -1..1,
+    the smallest power of 10 >= max abs amplitude
+
+    :param signal: audio data/signal in volts
+    :param maxAbs: max abs amplitude of the signal if already known
+    :return: scaleFactor as float
+    """
+    if maxAbs is None:
+        maxAbs = maxAbsOf(signal)
+    # scaling as per Sasha's matlab code
+    return 10.0 ** numpy.ceil(numpy.log10(maxAbs))
+
+
+@profiling.timed('calibration.scale')
+def scale(signal: numpy.ndarray, out: numpy.ndarray = None) -> (numpy.ndarray, float):
     """
     scaling of output for writing into wav file
 
     :param signal: audio data/signal in volts
-    :param bitsPerSample: bits per sample
+    :param out: preallocated array of dtype and size of signal, can be
+                the signal itself (scaling in place), None means allocate
     :return: scaled audio signal as numpy.ndarray
     :return: scaleFactor as float
     """
+    maxAbs = maxAbsOf(signal)
+    log.debug(f"Maximum abs amplitude of the calibrated signal before scaling: {maxAbs}")
 
-    log.debug(f"Maximum abs amplitude of the calibrated signal before scaling: {numpy.max(numpy.abs(signal))}")
-
-    # scaling as per Sasha's matlab code
-    scaleFactor = 10.0 ** numpy.ceil(numpy.log10(numpy.max(numpy.abs(signal))))
-    normalisedSignal = signal / scaleFactor
+    scaleFactor = scaleFactorOf(signal, maxAbs)
+    # keep precision of the signal (float32 stays float32)
+    normalisedSignal = numpy.divide(signal, scaleFactor, out=out, dtype=signal.dtype)
 
     log.info(f"Scale factor to reconstruct normalised signal is: {scaleFactor}")
     if doWriteIntermediateResults:
         numpy.savetxt('signal_normalised.txt', normalisedSignal)
 
-    log.debug(f"Maximum abs amplitude of the normalised/scaled signal: {numpy.max(numpy.abs(normalisedSignal))}")
+    log.debug(f"Maximum abs amplitude of the normalised/scaled signal: {maxAbs / scaleFactor}")
 
     return normalisedSignal, scaleFactor
@@ -0,0 +1,312 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import sqlite3
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Final
+
+from . import rawdat
+
+log = logging.getLogger('IMOSPATools')
+
+# bump when the table layout changes, the catalogue is then rebuilt
+CATALOGUE_SCHEMA_VERSION: Final[int] = 2
+DAT_FILE_EXT: Final[str] = '.DAT'
+
+_COLUMNS: Final[list] = [
+    ('path', 'TEXT PRIMARY KEY'),
+    ('mtimeNs', 'INTEGER'),
+    ('fileSize', 'INTEGER'),
+    ('error', 'TEXT'),
+    ('dataOffset', 'INTEGER'),
+    ('footerOffset', 'INTEGER'),
+    ('numSamples', 'INTEGER'),
+    ('recordHeader', 'TEXT'),
+    ('setID', 'INTEGER'),
+    ('schedule', 'TEXT'),
+    ('sampleRate', 'INTEGER'),
+    ('duration', 'INTEGER'),
+    ('filter0LowFreq', 'INTEGER'),
+    ('filter0HighFreq', 'INTEGER'),
+    ('filter0PGain', 'INTEGER'),
+    ('filter0Gain', 'INTEGER'),
+    ('filter1LowFreq', 'INTEGER'),
+    ('filter1HighFreq', 'INTEGER'),
+    ('filter1PGain', 'INTEGER'),
+    ('filter1Gain', 'INTEGER'),
+    # channels C0/C1 of the filter 0 line, C2/C3 of the filter 1 line
+    ('channel0', 'INTEGER'),
+    ('channel1', 'INTEGER'),
+    ('channel2', 'INTEGER'),
+    ('channel3', 'INTEGER'),
+    ('numChannels', 'INTEGER'),
+    ('startTime', 'TEXT'),
+    ('endTime', 'TEXT'),
+    ('dataValidity', 'TEXT'),
+    ('dataToRAM', 'INTEGER'),
+    ('dataBlockSize', 'INTEGER'),
+]
+COLUMN_NAMES: Final[list] = [name for name, _ in _COLUMNS]
+# times are stored as ISO 8601 text, which sorts and compares correctly in SQL
+TIME_COLUMNS: Final[list] = ['schedule', 'startTime', 'endTime']
+
+
+class IMOSAcousticCatalogueException(Exception):
+    pass
+
+
+def infoToRow(path: str, mtimeNs: int, info: rawdat.RAWFileInfo) -> dict:
+    """
+    Flatten RAWFileInfo into a catalogue row
+
+    :param path: file path as stored in the catalogue
+    :param mtimeNs: file modification time in ns
+    :param info: header/footer/layout information of the file
+    :return: dict column name -> value
+    """
+    header = info.header
+    footer = info.footer
+    return {'path': path,
+            'mtimeNs': mtimeNs,
+            'fileSize': info.fileSize,
+            'error': None,
+            'dataOffset': info.dataOffset,
+            'footerOffset': info.footerOffset,
+            'numSamples': info.numSamples,
+            'recordHeader': header.recordHeader,
+            'setID': header.setID,
+            'schedule': header.schedule.isoformat(),
+            'sampleRate': header.sampleRate,
+            'duration': header.duration,
+            'filter0LowFreq': header.filter0.lowFreq,
+            'filter0HighFreq': header.filter0.highFreq,
+            'filter0PGain': header.filter0.pGain,
+            'filter0Gain': header.filter0.gain,
+            'filter1LowFreq': header.filter1.lowFreq,
+            'filter1HighFreq': header.filter1.highFreq,
+            'filter1PGain': header.filter1.pGain,
+            'filter1Gain': header.filter1.gain,
+            'channel0': int(header.filter0.channelA),
+            'channel1': int(header.filter0.channelB),
+            'channel2': int(header.filter1.channelA),
+            'channel3': int(header.filter1.channelB),
+            'numChannels': rawdat.countChannels(header),
+            'startTime': footer.startTime.isoformat(),
+            'endTime': footer.endTime.isoformat(),
+            'dataValidity': footer.dataValidity,
+            'dataToRAM': int(footer.dataToRAM),
+            'dataBlockSize': footer.dataBlockSize}
+
+
+def rowToInfo(record: dict) -> rawdat.RAWFileInfo:
+    """
+    Rebuild RAWFileInfo from a catalogue record (as returned by Catalogue.records())
+
+    :param record: dict column name -> value, times as datetime
+    :return: RAWFileInfo
+    """
+    header = rawdat.RAWFileHeader(
+        recordHeader=record['recordHeader'], setID=record['setID'],
+        schedule=record['schedule'], sampleRate=record['sampleRate'],
+        duration=record['duration'],
+        filter0=rawdat.RAWFileFilterLine(channelA=bool(record['channel0']),
+                                         channelB=bool(record['channel1']),
+                                         lowFreq=record['filter0LowFreq'],
+                                         highFreq=record['filter0HighFreq'],
+                                         pGain=record['filter0PGain'],
+                                         gain=record['filter0Gain']),
+        filter1=rawdat.RAWFileFilterLine(channelA=bool(record['channel2']),
+                                         channelB=bool(record['channel3']),
+                                         lowFreq=record['filter1LowFreq'],
+                                         highFreq=record['filter1HighFreq'],
+                                         pGain=record['filter1PGain'],
+                                         gain=record['filter1Gain']))
+    footer = rawdat.RAWFileFooter(
+        startTime=record['startTime'], endTime=record['endTime'],
+        dataValidity=record['dataValidity'], dataToRAM=bool(record['dataToRAM']),
+        dataBlockSize=record['dataBlockSize'])
+    return rawdat.RAWFileInfo(fileName=record['path'], fileSize=record['fileSize'],
+                              dataOffset=record['dataOffset'],
+                              footerOffset=record['footerOffset'],
+                              numSamples=record['numSamples'],
+                              header=header, footer=footer)
+
+
+def _scanFile(path: str, mtimeNs: int, fileSize: int) -> dict:
+    # runs in a worker thread, never raises - errors are recorded in the row
+    try:
+        return infoToRow(path, mtimeNs, rawdat.readRawFileInfo(path))
+    except (rawdat.IMOSAcousticRAWReadException, IOError, OSError) as e:
+        log.warning(f"Failed to read header/footer of {path}: {e}")
+        row = dict.fromkeys(COLUMN_NAMES)
+        row.update({'path': path, 'mtimeNs': mtimeNs, 'fileSize': fileSize,
+                    'error': str(e) or type(e).__name__})
+        return row
+
+
+def findDatFiles(rootDir: str) -> dict:
+    """
+    Find all the .DAT files under the directory tree
+
+    :param rootDir: root directory of the tree (eg deployment or archive)
+    :return: dict path -> (mtime in ns, file size)
+    """
+    files = {}
+    for dirPath, dirNames, fileNames in os.walk(rootDir):
+        dirNames.sort()
+        for fileName in fileNames:
+            if fileName.upper().endswith(DAT_FILE_EXT):
+                path = os.path.join(dirPath, fileName)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class Catalogue:
+    """
+    Local SQLite catalogue of RAW (.DAT) file headers and footers.
+
+    Only the header and footer of each file is read (see
+    rawdat.readRawFileInfo()), never the audio data. The catalogue is
+    updated incrementally - files with unchanged mtime and size are
+    not read again. Files which fail to parse are kept with the error
+    message, so they are not re-read on every scan either.
+    """
+
+    def __init__(self, dbFileName: str):
+        """
+        :param dbFileName: SQLite database file name, created if it does not exist
+        """
+        self.dbFileName = dbFileName
+        self.connection = sqlite3.connect(dbFileName)
+        self.connection.row_factory = sqlite3.Row
+        self._createSchema()
+
+    def _createSchema(self) -> None:
+        cursor = self.connection.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version != CATALOGUE_SCHEMA_VERSION:
+            if version != 0:
+                log.warning(f"Catalogue {self.dbFileName} schema version {version} "
+                            f"differs from {CATALOGUE_SCHEMA_VERSION}, rebuilding it")
+            cursor.execute("DROP TABLE IF EXISTS records")
+        columns = ', '.join(f"{name} {sqlType}" for name, sqlType in _COLUMNS)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS records ({columns})")
+        cursor.execute("CREATE INDEX IF NOT EXISTS recordsStartTime ON records (startTime)")
+        cursor.execute(f"PRAGMA user_version = {CATALOGUE_SCHEMA_VERSION}")
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def scan(self, rootDir: str, numWorkers: int = 8) -> dict:
+        """
+        Scan the directory tree and update the catalogue incrementally
+
+        :param rootDir: root directory of the tree (eg deployment or archive)
+        :param numWorkers: number of threads reading headers/footers
+        :return: dict with number of added, updated, unchanged, removed and failed files
+        """
+        if not os.path.isdir(rootDir):
+            logMsg = f"Directory {rootDir} does not exist"
+            log.error(logMsg)
+            raise IMOSAcousticCatalogueException(logMsg)
+
+        files = findDatFiles(rootDir)
+        known = {row['path']: (row['mtimeNs'], row['fileSize'])
+                 for row in self.connection.execute("SELECT path, mtimeNs, fileSize FROM records")}
+
+        # only the files under the scanned tree can vanish
+        prefix = os.path.join(rootDir, '')
+        removed = [path for path in known
+                   if path not in files and (path.startswith(prefix) or path == rootDir)]
+        toScan = [(path, mtimeNs, fileSize) for path, (mtimeNs, fileSize) in sorted(files.items())
+                  if known.get(path) != (mtimeNs, fileSize)]
+
+        counts = {'added': 0, 'updated': 0, 'unchanged': len(files) - len(toScan),
+                  'removed': len(removed), 'failed': 0}
+
+        if toScan:
+            with ThreadPoolExecutor(max_workers=max(1, numWorkers)) as executor:
+                rows = list(executor.map(lambda args: _scanFile(*args), toScan))
+        else:
+            rows = []
+
+        for row in rows:
+            if row['error'] is not None:
+                counts['failed'] += 1
+            elif row['path'] in known:
+                counts['updated'] += 1
+            else:
+                counts['added'] += 1
+
+        placeholders = ', '.join('?' * len(COLUMN_NAMES))
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO records ({', '.join(COLUMN_NAMES)}) VALUES ({placeholders})",
+                [[row[name] for name in COLUMN_NAMES] for row in rows])
+            self.connection.executemany("DELETE FROM records WHERE path = ?",
+                                        [(path,) for path in removed])
+
+        log.info(f"Catalogue {self.dbFileName} scan of {rootDir}: {counts}")
+        return counts
+
+    def records(self, startTime: datetime = None, endTime: datetime = None,
+                includeFailed: bool = False) -> list[dict]:
+        """
+        Query the catalogued records, ordered by startTime
+
+        :param startTime: return only records ending after this time
+        :param endTime: return only records starting before this time
+        :param includeFailed: include files which failed to parse
+        :return: list of dicts column name -> value, times as datetime
+        """
+        conditions = []
+        parameters = []
+        if not includeFailed:
+            conditions.append("error IS NULL")
+        if startTime is not None:
+            conditions.append("endTime > ?")
+            parameters.append(startTime.isoformat())
+        if endTime is not None:
+            conditions.append("startTime < ?")
+            parameters.append(endTime.isoformat())
+        query = "SELECT * FROM records"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY startTime, path"
+
+        result = []
+        for row in self.connection.execute(query, parameters):
+            record = dict(row)
+            for name in TIME_COLUMNS:
+                if record[name] is not None:
+                    record[name] = datetime.fromisoformat(record[name])
+            result.append(record)
+        return result
+
+    def fileInfos(self, startTime: datetime = None,
+                  endTime: datetime = None) -> list[rawdat.RAWFileInfo]:
+        """
+        Query the catalogued records as RAWFileInfo, ordered by startTime
+
+        :param startTime: return only records ending after this time
+        :param endTime: return only records starting before this time
+        :return: list of RAWFileInfo
+        """
+        return [rowToInfo(record) for record in self.records(startTime, endTime)]
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
@@ -0,0 +1,237 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import numpy
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Final
+
+from . import rawdat
+from . import catalogue
+
+log = logging.getLogger('IMOSPATools')
+
+# header/footer times are UTC, without time zone (see rawdat.convertHeaderTime())
+EPOCH: Final[datetime] = datetime(1970, 1, 1)
+NS_PER_SECOND: Final[int] = 1000000000
+
+# columns of the table, times as int64 ns since EPOCH,
+# the path column is added with the length of the longest path
+_COLUMNS: Final[list] = [
+    ('setID', numpy.int32),
+    ('schedule', numpy.int64),
+    ('startTime', numpy.int64),
+    ('endTime', numpy.int64),
+    ('sampleRate', numpy.int32),
+    ('duration', numpy.int32),
+    ('numChannels', numpy.int8),
+    ('filter0PGain', numpy.int16),
+    ('filter0Gain', numpy.int16),
+    ('filter1PGain', numpy.int16),
+    ('filter1Gain', numpy.int16),
+    ('dataOffset', numpy.int64),
+    ('numSamples', numpy.int64),
+    ('fileSize', numpy.int64),
+]
+TIME_COLUMNS: Final[list] = ['schedule', 'startTime', 'endTime']
+
+
+class IMOSAcousticHeaderTableException(Exception):
+    pass
+
+
+def datetimeToNs(dateTime: datetime) -> int:
+    """
+    :param dateTime: UTC time without time zone, as read from RAW files
+    :return: ns since EPOCH
+    """
+    return (dateTime - EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def nsToDatetime(ns: int) -> datetime:
+    """
+    :param ns: ns since EPOCH
+    :return: UTC time without time zone (microsecond resolution)
+    """
+    return EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+
+def headerTableDtype(pathLength: int) -> numpy.dtype:
+    """
+    :param pathLength: max number of characters of the file paths
+    :return: dtype of the structured array of the table
+    """
+    return numpy.dtype([('path', f'U{max(1, pathLength)}')] + _COLUMNS)
+
+
+def infoToTuple(info: rawdat.RAWFileInfo) -> tuple:
+    """
+    Flatten RAWFileInfo into a row of the table
+
+    :param info: header/footer/layout information of the file
+    :return: tuple of values in the order of headerTableDtype()
+    """
+    header = info.header
+    return (info.fileName, header.setID,
+            datetimeToNs(header.schedule),
+            datetimeToNs(info.footer.startTime),
+            datetimeToNs(info.footer.endTime),
+            header.sampleRate, header.duration,
+            rawdat.countChannels(header),
+            header.filter0.pGain, header.filter0.gain,
+            header.filter1.pGain, header.filter1.gain,
+            info.dataOffset, info.numSamples, info.fileSize)
+
+
+def _readInfo(path: str) -> rawdat.RAWFileInfo:
+    # runs in a worker thread, never raises - failed files are None
+    try:
+        return rawdat.readRawFileInfo(path)
+    except (rawdat.IMOSAcousticRAWReadException, IOError, OSError) as e:
+        log.warning(f"Failed to read header/footer of {path}: {e}")
+        return None
+
+
+class HeaderTable:
+    """
+    Headers and footers of many RAW (.DAT) files as columns of a numpy
+    structured array, one row per file - setID, schedule, startTime,
+    endTime (int64 ns since EPOCH), sampleRate, duration, filter gains,
+    data offset and number of samples.
+
+    Filtering, sorting, gap and drift analysis are vectorised array
+    operations, no Python object per file. Only the headers and footers
+    are read (see rawdat.readRawFileInfo()), never the audio data.
+    """
+
+    def __init__(self, records: numpy.ndarray):
+        """
+        :param records: structured array of headerTableDtype()
+        """
+        missing = [name for name, _ in _COLUMNS if name not in (records.dtype.names or ())]
+        if missing:
+            raise IMOSAcousticHeaderTableException(f"Header table is missing columns {missing}")
+        self.records = records
+
+    @classmethod
+    def fromFiles(cls, paths: list[str], numWorkers: int = 8) -> HeaderTable:
+        """
+        Read headers and footers of RAW files in parallel threads,
+        files which fail to parse are left out (with a warning)
+
+        :param paths: RAW (.DAT) file names
+        :param numWorkers: number of threads reading headers/footers
+        :return: HeaderTable, rows in the order of paths
+        """
+        if paths:
+            with ThreadPoolExecutor(max_workers=max(1, numWorkers)) as executor:
+                infos = [info for info in executor.map(_readInfo, paths) if info is not None]
+        else:
+            infos = []
+        dtype = headerTableDtype(max((len(info.fileName) for info in infos), default=1))
+        return cls(numpy.array([infoToTuple(info) for info in infos], dtype=dtype))
+
+    @classmethod
+    def fromDirectory(cls, rootDir: str, numWorkers: int = 8) -> HeaderTable:
+        """
+        Read headers and footers of all the RAW files under the directory tree
+
+        :param rootDir: root directory of the tree (eg deployment or archive)
+        :param numWorkers: number of threads reading headers/footers
+        :return: HeaderTable, rows in the order of paths
+        """
+        return cls.fromFiles(sorted(catalogue.findDatFiles(rootDir)), numWorkers)
+
+    @classmethod
+    def load(cls, fileName: str) -> HeaderTable:
+        """
+        :param fileName: .npy file written by save()
+        :return: HeaderTable
+        """
+        try:
+            records = numpy.load(fileName, allow_pickle=False)
+        except (IOError, OSError, ValueError) as e:
+            logMsg = f"Error loading header table {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticHeaderTableException(logMsg)
+        return cls(records)
+
+    def save(self, fileName: str) -> None:
+        """
+        :param fileName: .npy file
+        """
+        try:
+            numpy.save(fileName, self.records, allow_pickle=False)
+        except (IOError, OSError) as e:
+            logMsg = f"Error saving header table {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticHeaderTableException(logMsg)
+
+    def __len__(self) -> int:
+        return self.records.size
+
+    def __getitem__(self, key):
+        """
+        :param key: column name - returns the column as numpy array,
+                    otherwise index/slice/mask - returns HeaderTable
+        """
+        if isinstance(key, str):
+            return self.records[key]
+        return HeaderTable(numpy.atleast_1d(self.records[key]))
+
+    def filter(self, mask: numpy.ndarray) -> HeaderTable:
+        """
+        :param mask: boolean array, eg table['sampleRate'] == 6000
+        :return: HeaderTable of the rows where mask is True
+        """
+        return HeaderTable(self.records[mask])
+
+    def sortBy(self, *columns: str) -> HeaderTable:
+        """
+        :param columns: column names, the first one is the primary key
+        :return: HeaderTable sorted by the columns (stable)
+        """
+        return HeaderTable(numpy.sort(self.records, order=list(columns), kind='stable'))
+
+    def between(self, startTime: datetime = None, endTime: datetime = None) -> HeaderTable:
+        """
+        :param startTime: return only records ending after this time
+        :param endTime: return only records starting before this time
+        :return: HeaderTable of the records overlapping the time window
+        """
+        mask = numpy.ones(len(self), dtype=bool)
+        if startTime is not None:
+            mask &= self.records['endTime'] > datetimeToNs(startTime)
+        if endTime is not None:
+            mask &= self.records['startTime'] < datetimeToNs(endTime)
+        return self.filter(mask)
+
+    def durations(self) -> numpy.ndarray:
+        """
+        :return: duration of the records in seconds, from the number of samples
+        """
+        return self.records['numSamples'] / self.records['sampleRate']
+
+    def gaps(self) -> numpy.ndarray:
+        """
+        Time from the end of each record to the start of the next one,
+        in the order of the table (sort by startTime first)
+
+        :return: gaps in seconds, positive gap, negative overlap,
+                 one less than the number of records
+        """
+        return (self.records['startTime'][1:] - self.records['endTime'][:-1]) / NS_PER_SECOND
+
+    def drift(self) -> numpy.ndarray:
+        """
+        :return: start of the recording relative to its schedule in seconds
+        """
+        return (self.records['startTime'] - self.records['schedule']) / NS_PER_SECOND
+
+    def sampleRateCounts(self) -> dict:
+        """
+        :return: dict sample rate -> number of records
+        """
+        rates, counts = numpy.unique(self.records['sampleRate'], return_counts=True)
+        return {int(rate): int(count) for rate, count in zip(rates, counts)}
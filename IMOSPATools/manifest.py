@@ -0,0 +1,217 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import json
+import logging
+import tempfile
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from typing import Final
+
+from . import __version__
+from . import calibcache
+
+log = logging.getLogger('IMOSPATools')
+
+# bump when the layout of the manifest changes, older manifests are then ignored
+MANIFEST_FORMAT_VERSION: Final[int] = 1
+MANIFEST_FILE_NAME: Final[str] = 'imospatools_manifest.json'
+
+
+class IMOSAcousticManifestException(Exception):
+    pass
+
+
+def conversionParams(calibFileName: str = None, cnl: float = None, hs: float = None,
+                     fileFormat: str = 'wav', setID: int = 0,
+                     generateFileName: bool = False, outputDir: str = None,
+                     dtype: numpy.dtype = numpy.float64,
+                     fftFastLength: bool = False,
+                     spectralHighPass: bool = False,
+                     streaming: bool = False,
+                     scaleFactor: float = None) -> dict:
+    """
+    Everything besides the raw file which determines the output file,
+    an output is up to date only if these are unchanged
+
+    :param calibFileName: calibration file name, None means no calibration
+    :param cnl: calibration noise level (dB re V^2/Hz)
+    :param hs: hydrophone sensitivity (dB re V/uPa)
+    :param fileFormat: output format ('wav' or 'flac')
+    :param setID: data set ID stored in the metadata
+    :param generateFileName: generate output file names from set ID and start time
+    :param outputDir: output directory, None means next to the input files
+    :param dtype: numpy.float64 or numpy.float32 (single precision calibration)
+    :param fftFastLength: zero-pad the FFT to a fast length
+    :param spectralHighPass: apply the high-pass filter in the frequency domain
+    :param streaming: calibrated block by block (see streamcalib.calibrateRawToFile())
+    :param scaleFactor: fixed scale factor of the streamed output, None means computed
+    :return: dict of the parameters, JSON serialisable
+    """
+    return {'calibSha256': calibcache.hashFileContent(calibFileName) if calibFileName is not None else None,
+            'cnl': float(cnl) if cnl is not None else None,
+            'hs': float(hs) if hs is not None else None,
+            'format': fileFormat.lower(),
+            'setID': setID,
+            'generateFileName': generateFileName,
+            'outputDir': os.path.abspath(outputDir) if outputDir is not None else None,
+            'dtype': numpy.dtype(dtype).name,
+            'fftFastLength': fftFastLength,
+            'spectralHighPass': spectralHighPass,
+            'streaming': streaming,
+            'scaleFactor': float(scaleFactor) if scaleFactor is not None else None,
+            'version': __version__}
+
+
+class Manifest:
+    """
+    Record of the converted raw (.DAT) files - per source file its size,
+    modification time, content hash (SHA-256), the conversion parameters
+    (see conversionParams()) and the output file. Stored as JSON next to
+    the outputs.
+
+    Content hashes are computed only for new files or files with changed
+    size or modification time, as the catalogue does, so checking an
+    unchanged deployment reads no audio data.
+    """
+
+    def __init__(self, fileName: str):
+        """
+        :param fileName: manifest file name (JSON)
+        """
+        self.fileName = fileName
+        # absolute source path -> entry dict
+        self.entries = {}
+
+    @classmethod
+    def load(cls, fileName: str) -> Manifest:
+        """
+        :param fileName: manifest file name, an empty manifest if it does not exist
+        :return: Manifest
+        """
+        manifest = cls(fileName)
+        if not os.path.exists(fileName):
+            return manifest
+        try:
+            with open(fileName, 'r') as file:
+                content = json.load(file)
+        except (IOError, OSError, ValueError) as e:
+            logMsg = f"Error reading manifest {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticManifestException(logMsg)
+        if content.get('formatVersion') != MANIFEST_FORMAT_VERSION:
+            log.warning(f"Manifest {fileName} format version {content.get('formatVersion')} "
+                        f"differs from {MANIFEST_FORMAT_VERSION}, all the files are converted again")
+        else:
+            manifest.entries = content.get('entries', {})
+        return manifest
+
+    def save(self) -> None:
+        """
+        Write the manifest, atomically (temporary file renamed)
+        """
+        dirName = os.path.dirname(os.path.abspath(self.fileName))
+        os.makedirs(dirName, exist_ok=True)
+        try:
+            fd, tmpName = tempfile.mkstemp(dir=dirName, suffix='.tmp')
+            with os.fdopen(fd, 'w') as file:
+                json.dump({'formatVersion': MANIFEST_FORMAT_VERSION,
+                           'entries': self.entries}, file, indent=1, sort_keys=True)
+            os.replace(tmpName, self.fileName)
+        except (IOError, OSError) as e:
+            logMsg = f"Error writing manifest {self.fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticManifestException(logMsg)
+
+    def _sourceState(self, path: str) -> dict:
+        # runs in a worker thread, never raises - unreadable files are None
+        try:
+            stat = os.stat(path)
+            entry = self.entries.get(os.path.abspath(path))
+            if entry is not None and (entry['size'], entry['mtimeNs']) == (stat.st_size, stat.st_mtime_ns):
+                sha256 = entry['sha256']
+            else:
+                sha256 = calibcache.hashFileContent(path)
+        except (IOError, OSError) as e:
+            log.warning(f"Failed to hash {path}: {e}")
+            return None
+        return {'size': stat.st_size, 'mtimeNs': stat.st_mtime_ns, 'sha256': sha256}
+
+    def sourceStates(self, paths: list[str], numWorkers: int = 8) -> dict:
+        """
+        Size, modification time and content hash of the source files,
+        hashed in parallel threads only if new or changed
+
+        :param paths: raw (.DAT) file names
+        :param numWorkers: number of threads hashing files
+        :return: dict path -> {'size', 'mtimeNs', 'sha256'}, None if not readable
+        """
+        if not paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, numWorkers)) as executor:
+            return dict(zip(paths, executor.map(self._sourceState, paths)))
+
+    def isUpToDate(self, path: str, state: dict, params: dict) -> bool:
+        """
+        :param path: raw (.DAT) file name
+        :param state: source state as returned by sourceStates()
+        :param params: conversion parameters (see conversionParams())
+        :return: True if the file was converted from the same content
+                 with the same parameters and the output still exists
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        return state is not None and entry is not None and \
+            entry['sha256'] == state['sha256'] and entry['params'] == params and \
+            os.path.exists(entry['output'])
+
+    def outputOf(self, path: str) -> str:
+        """
+        :param path: raw (.DAT) file name
+        :return: output file name recorded for the file, None if not recorded
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        return entry['output'] if entry is not None else None
+
+    def record(self, path: str, state: dict, params: dict,
+               outputFileName: str, duplicateOf: str = None) -> None:
+        """
+        Record a converted file
+
+        :param path: raw (.DAT) file name
+        :param state: source state as returned by sourceStates()
+        :param params: conversion parameters (see conversionParams())
+        :param outputFileName: output file name
+        :param duplicateOf: raw file with the same content, which was converted instead
+        """
+        entry = dict(state, params=params, output=outputFileName)
+        if duplicateOf is not None:
+            entry['duplicateOf'] = os.path.abspath(duplicateOf)
+        self.entries[os.path.abspath(path)] = entry
+
+    def forget(self, path: str) -> None:
+        """
+        :param path: raw (.DAT) file name, eg one which failed to convert
+        """
+        self.entries.pop(os.path.abspath(path), None)
+
+
+def findDuplicates(states: dict) -> dict:
+    """
+    Find files with the same content, eg the same record copied into
+    more deployment folders
+
+    :param states: dict path -> source state (see Manifest.sourceStates())
+    :return: dict path of duplicate -> path of the first file (in sorted
+             order) with the same content, which is the one to convert
+    """
+    first = {}
+    duplicates = {}
+    for path in sorted(states):
+        state = states[path]
+        if state is None:
+            continue
+        original = first.setdefault(state['sha256'], path)
+        if original != path:
+            duplicates[path] = original
+    return duplicates
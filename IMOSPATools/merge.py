@@ -0,0 +1,274 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import numpy
+import logging
+import collections
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from typing import Final
+
+from . import rawdat
+from . import calibration
+from . import audiofile
+from . import asyncwriter
+
+log = logging.getLogger('IMOSPATools')
+
+# number of samples of silence written at once into gaps between records
+GAP_BLOCK_SIZE: Final[int] = 1 << 20
+# grouping of the records into output files (see groupRecords())
+MERGE_PERIODS: Final[dict] = {'hour': 3600, 'day': 86400}
+
+
+class IMOSAcousticMergeException(Exception):
+    pass
+
+
+@dataclass
+class MergeRecord:
+    info: rawdat.RAWFileInfo
+    # samples skipped at the start of the record (overlap with the previous one)
+    firstSample: int = 0
+    # position of the first written sample in the merged output
+    outputOffset: int = 0
+    # startTime minus footer endTime of the previous record in seconds,
+    # positive is a gap, negative is an overlap (0 for the first record)
+    gapSeconds: float = 0.0
+
+
+@dataclass
+class MergeResult:
+    outputFileName: str
+    numRecords: int = 0
+    numSamples: int = 0
+    numGapSamples: int = 0
+    # samples of the records beyond the scale factor, clipped to full scale
+    numClipped: int = 0
+    scaleFactor: float = 1.0
+    metadata: audiofile.MetadataMerged = None
+
+
+def planMerge(infos: list[rawdat.RAWFileInfo],
+              fillGaps: bool = True) -> list[MergeRecord]:
+    """
+    Order records by footer startTime and work out where each of them
+    goes into the merged output, using only header/footer information
+
+    :param infos: header/footer information of the records
+    :param fillGaps: place the records at their start time and fill gaps
+                     with silence, otherwise just append them
+    :return: list of MergeRecord in the output order
+    """
+    plan = []
+    sampleRate = None
+    outputEnd = 0
+    previous = None
+    for info in sorted(infos, key=lambda i: i.footer.startTime):
+        if sampleRate is None:
+            sampleRate = info.header.sampleRate
+            firstStartTime = info.footer.startTime
+        elif info.header.sampleRate != sampleRate:
+            logMsg = f"Sample rate {info.header.sampleRate} of {info.fileName} " \
+                     f"differs from {sampleRate} of the previous records"
+            log.error(logMsg)
+            raise IMOSAcousticMergeException(logMsg)
+
+        gapSeconds = 0.0
+        if previous is not None:
+            gapSeconds = (info.footer.startTime - previous.footer.endTime).total_seconds()
+
+        if fillGaps:
+            recordOffset = int(round((info.footer.startTime - firstStartTime).total_seconds() * sampleRate))
+        else:
+            recordOffset = outputEnd
+        # overlapping samples are taken from the previous record
+        firstSample = max(0, outputEnd - recordOffset)
+        if firstSample >= info.numSamples:
+            log.warning(f"Record {info.fileName} is completely overlapped by the previous record, skipped")
+            continue
+
+        plan.append(MergeRecord(info, firstSample, recordOffset + firstSample, gapSeconds))
+        outputEnd = recordOffset + info.numSamples
+        previous = info
+
+    return plan
+
+
+def groupRecords(infos: list[rawdat.RAWFileInfo],
+                 periodSeconds: int) -> list[list[rawdat.RAWFileInfo]]:
+    """
+    Group records by the period (eg hour or day, UTC) of their footer startTime
+
+    :param infos: header/footer information of the records
+    :param periodSeconds: length of the period in seconds
+    :return: list of groups of records, ordered by time
+    """
+    groups = {}
+    epoch = datetime(1970, 1, 1)
+    for info in infos:
+        period = int((info.footer.startTime - epoch).total_seconds() // periodSeconds)
+        groups.setdefault(period, []).append(info)
+    return [sorted(groups[period], key=lambda i: i.footer.startTime) for period in sorted(groups)]
+
+
+def mergeMetadata(plan: list[MergeRecord], numSamples: int,
+                  setID: int = 0, cnl: float = None,
+                  hs: float = None) -> audiofile.MetadataMerged:
+    """
+    Metadata of the merged output, known before any audio is decoded
+
+    :param plan: merge plan as returned by planMerge()
+    :param numSamples: total number of samples of the merged output
+    :param setID: data set ID
+    :param cnl: calibration noise level, None if not calibrated
+    :param hs: hydrophone sensitivity, None if not calibrated
+    :return: MetadataMerged
+    """
+    first = plan[0].info
+    sampleRate = first.header.sampleRate
+    metadata = audiofile.MetadataMerged(
+        setID=setID,
+        schedule=first.header.schedule,
+        numChannels=1,
+        sampleRate=sampleRate,
+        durationHeader=sum(r.info.header.duration for r in plan),
+        durationFile=numSamples / sampleRate,
+        startTime=first.footer.startTime,
+        endTime=first.footer.startTime + timedelta(seconds=numSamples / sampleRate),
+        numRecords=len(plan),
+        numGapSamples=numSamples - sum(r.info.numSamples - r.firstSample for r in plan),
+        # stored as JSON array of [record, startTime, gap seconds]
+        gaps=[[os.path.basename(r.info.fileName),
+               r.info.footer.startTime.isoformat(),
+               round(r.gapSeconds, 6)] for r in plan[1:]],
+    )
+    if cnl is not None:
+        metadata.calibNoiseLevel = cnl
+    if hs is not None:
+        metadata.hydrophoneSensitivity = hs
+    return metadata
+
+
+def _calibrateRecord(record: MergeRecord,
+                     transfer: calibration.CalibrationTransfer,
+                     dtype: numpy.dtype) -> numpy.ndarray:
+    info = record.info
+    binData = rawdat.readRawSampleRange(info, 0, info.numSamples)
+    signal = calibration.toVolts(binData, dtype=dtype)
+    if transfer is not None:
+        signal = transfer.calibrateReal(signal, dtype)
+    return signal[record.firstSample:]
+
+
+def mergeRecords(infos: list[rawdat.RAWFileInfo], outputFileName: str,
+                 transfer: calibration.CalibrationTransfer = None,
+                 fileFormat: str = 'wav', setID: int = 0,
+                 cnl: float = None, hs: float = None,
+                 scaleFactor: float = None, fillGaps: bool = True,
+                 dtype: numpy.dtype = numpy.float64,
+                 asyncWrite: bool = False) -> MergeResult:
+    """
+    Calibrate consecutive records and append them one by one into
+    a single WAV/FLAC file - only one record is held in memory.
+
+    All the records share one scale factor. If it is not provided, it is
+    derived from the max abs amplitude of all the records (as
+    calibration.scale() does), found in a first pass calibrating each
+    record, as the metadata is written before the audio data. Samples
+    beyond a given scale factor are clipped to full scale, their number
+    is counted in the first pass and stored in the metadata (numClipped).
+
+    :param infos: header/footer information of the records
+    :param outputFileName: output audio file name
+    :param transfer: calibration transfer function, None means no calibration
+    :param fileFormat: 'wav' or 'flac'
+    :param setID: data set ID stored in the metadata
+    :param cnl: calibration noise level stored in the metadata
+    :param hs: hydrophone sensitivity stored in the metadata
+    :param scaleFactor: scale factor of the output, see above
+    :param fillGaps: fill gaps between the records with silence, so
+                     the output time is continuous, otherwise just append
+    :param dtype: numpy.float64 or numpy.float32 (single precision calibration)
+    :param asyncWrite: encode a record on a writer thread while the next one
+                       is calibrated (see asyncwriter.AsyncWriter), then up to
+                       three records are held in memory
+    :return: MergeResult
+    """
+    plan = planMerge(infos, fillGaps)
+    if not plan:
+        logMsg = f"No records to merge into {outputFileName}"
+        log.error(logMsg)
+        raise IMOSAcousticMergeException(logMsg)
+    if transfer is not None and plan[0].info.header.sampleRate != transfer.fSample:
+        raise calibration.IMOSAcousticCalibException(
+            "Sample rate is different between the audio record and calibration file.")
+
+    last = plan[-1]
+    numSamples = last.outputOffset + last.info.numSamples - last.firstSample
+    metadata = mergeMetadata(plan, numSamples, setID,
+                             cnl if transfer is not None else None,
+                             hs if transfer is not None else None)
+
+    # the scale factor and the number of clipped samples go into
+    # the metadata written before the audio data
+    maxAbs = 0.0
+    numClipped = 0
+    for record in plan:
+        signal = _calibrateRecord(record, transfer, dtype)
+        maxAbs = max(maxAbs, float(calibration.maxAbsOf(signal)))
+        if scaleFactor is not None:
+            clipped = int(numpy.count_nonzero(numpy.abs(signal) > scaleFactor))
+            if clipped > 0:
+                log.warning(f"{clipped} samples of {record.info.fileName} beyond scale factor "
+                            f"{scaleFactor}, clipped")
+                numClipped += clipped
+    del signal
+    if scaleFactor is None:
+        scaleFactor = calibration.scaleFactorOf(None, maxAbs)
+    metadata.scaleFactor = scaleFactor
+    metadata.numClipped = numClipped
+
+    result = MergeResult(outputFileName, len(plan), numSamples,
+                         metadata.numGapSamples, numClipped, scaleFactor, metadata)
+    position = 0
+    # a single writer thread keeps the order of the blocks
+    writer = asyncwriter.AsyncWriter(1) if asyncWrite else None
+    pending = collections.deque()
+    with audiofile.openMono16bit(outputFileName, metadata, fileFormat.upper()) as sf:
+
+        def write(block: numpy.ndarray):
+            if writer is None:
+                sf.write(block)
+                return
+            # report write errors as soon as they are known
+            while pending and pending[0].done():
+                pending.popleft().result()
+            pending.append(writer.submit(sf.write, block))
+
+        try:
+            for record in plan:
+                signal = _calibrateRecord(record, transfer, dtype)
+                # silence in the gap before the record
+                while position < record.outputOffset:
+                    n = min(GAP_BLOCK_SIZE, record.outputOffset - position)
+                    write(numpy.zeros(n, dtype=dtype))
+                    position += n
+
+                signal /= scaleFactor
+                # counted in the first pass
+                numpy.clip(signal, -1.0, 1.0, out=signal)
+                write(signal)
+                position += signal.size
+                log.debug(f"Merged {record.info.fileName} at sample {record.outputOffset}")
+        finally:
+            # all the blocks are written before the file is closed
+            if writer is not None:
+                writer.close()
+        while pending:
+            pending.popleft().result()
+
+    log.info(f"Written {outputFileName} merged from {len(plan)} records, "
+             f"{result.numGapSamples} samples of gaps")
+    return result
@@ -0,0 +1,108 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import csv
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from typing import Final
+
+from . import audiofile
+
+log = logging.getLogger('IMOSPATools')
+
+AUDIO_FILE_EXTS: Final[tuple] = ('.wav', '.flac')
+# columns of every row, followed by the metadata fields
+FILE_COLUMNS: Final[list] = ['path', 'format', 'error']
+METADATA_COLUMNS: Final[list] = [f.name for f in fields(audiofile.MetadataMerged)]
+
+
+class IMOSAcousticMetaTableException(Exception):
+    pass
+
+
+def findAudioFiles(rootDir: str) -> list[str]:
+    """
+    Find all the WAV and FLAC files under the directory tree
+
+    :param rootDir: root directory of the tree (eg output archive)
+    :return: sorted list of paths
+    """
+    paths = []
+    for dirPath, dirNames, fileNames in os.walk(rootDir):
+        dirNames.sort()
+        for fileName in sorted(fileNames):
+            if fileName.lower().endswith(AUDIO_FILE_EXTS):
+                paths.append(os.path.join(dirPath, fileName))
+    return paths
+
+
+def readMetadataRow(path: str) -> dict:
+    """
+    Read IMOS metadata of an audio file into a table row, only the
+    file header is read (see audiofile.readComment()).
+    Never raises - errors are recorded in the row.
+
+    :param path: WAV or FLAC file name
+    :return: dict column name -> value, metadata values as stored (strings)
+    """
+    row = {'path': path, 'format': None, 'error': None}
+    try:
+        row['format'], comment = audiofile.readComment(path)
+        if comment is None or not comment.lstrip().startswith('{'):
+            row['error'] = "No IMOS metadata"
+        else:
+            row.update(json.loads(comment))
+            # nested values (eg gaps of merged files) as JSON text
+            for key, value in row.items():
+                if isinstance(value, (list, dict)):
+                    row[key] = json.dumps(value)
+    except audiofile.IMOSAcousticAudioFileException as e:
+        row['error'] = str(e)
+    except ValueError as e:
+        row['error'] = f"Invalid metadata json: {e}"
+    if row['error'] is not None:
+        log.warning(f"Failed to read metadata of {path}: {row['error']}")
+    return row
+
+
+def readMetadataTable(paths: list[str], numWorkers: int = 8) -> list[dict]:
+    """
+    Read IMOS metadata of many audio files in parallel. The reading is
+    I/O bound on the file headers, so threads are enough.
+
+    :param paths: WAV or FLAC file names
+    :param numWorkers: number of threads reading file headers
+    :return: list of rows (see readMetadataRow()) in the order of paths
+    """
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, numWorkers)) as executor:
+        return list(executor.map(readMetadataRow, paths))
+
+
+def tableColumns(rows: list[dict]) -> list[str]:
+    """
+    Columns of the table - file columns, IMOS metadata fields,
+    then any other keys found in the rows in alphabetical order
+
+    :param rows: table rows
+    :return: list of column names
+    """
+    known = FILE_COLUMNS + METADATA_COLUMNS
+    present = set(FILE_COLUMNS).union(*rows)
+    return [c for c in known if c in present] + sorted(present - set(known))
+
+
+def writeCsv(rows: list[dict], file) -> None:
+    """
+    Write the table as CSV
+
+    :param rows: table rows
+    :param file: open text file (eg sys.stdout)
+    """
+    writer = csv.DictWriter(file, fieldnames=tableColumns(rows), restval='')
+    writer.writeheader()
+    writer.writerows(rows)
@@ -0,0 +1,111 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import logging
+import collections
+import concurrent.futures
+from typing import Final
+
+from . import rawdat
+from . import profiling
+
+log = logging.getLogger('IMOSPATools')
+
+# number of records read ahead of the one being processed
+DEFAULT_PREFETCH_DEPTH: Final[int] = 2
+
+
+def adviseWillNeed(fileName: str) -> None:
+    """
+    Hint the kernel to start reading the whole file sequentially
+    (posix_fadvise WILLNEED/SEQUENTIAL), no-op where not available,
+    eg on Windows and macOS
+
+    :param fileName: file name
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(fileName, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        # only a hint, the read reports real errors
+        log.debug(f"posix_fadvise of {fileName} failed: {e}")
+
+
+def readRecord(fileName: str) -> rawdat.RawDatRecord:
+    """
+    Read RAW record with the samples in memory (not mapped),
+    so that no page-in is left for the consumer
+
+    :param fileName: RAW (.DAT) file name
+    :return: RawDatRecord with the samples read
+    """
+    adviseWillNeed(fileName)
+    record = rawdat.RawDatRecord(fileName, mapped=False)
+    record.samples
+    return record
+
+
+class Prefetcher:
+    """
+    Reads RAW records ahead on a background thread, so the reading of
+    the next records overlaps with the processing (calibration, writing)
+    of the current one. The file reads release the GIL.
+
+    Iterating yields (fileName, future of RawDatRecord) in the order of
+    the files - future.result() waits for the record and raises its read
+    error. At most depth records are read ahead of the one being
+    processed, so at most depth + 1 records are held in memory.
+    """
+
+    def __init__(self, fileNames: list[str], depth: int = DEFAULT_PREFETCH_DEPTH):
+        """
+        :param fileNames: RAW (.DAT) file names, in the order of processing
+        :param depth: number of records read ahead
+        """
+        if depth < 1:
+            raise ValueError(f"Invalid prefetch depth {depth}")
+        self.fileNames = list(fileNames)
+        self.depth = depth
+
+    def __iter__(self):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                   thread_name_prefix='IMOSPATools-prefetch') as executor:
+            pending = collections.deque()
+            remaining = iter(self.fileNames)
+
+            def submitNext():
+                fileName = next(remaining, None)
+                if fileName is not None:
+                    pending.append((fileName, executor.submit(readRecord, fileName)))
+
+            # the first record and depth records ahead of it
+            for _ in range(self.depth + 1):
+                submitNext()
+            try:
+                while pending:
+                    fileName, future = pending.popleft()
+                    yield fileName, future
+                    # done with the record, read one more ahead
+                    submitNext()
+            finally:
+                # records not consumed (the iteration stopped early) are dropped
+                for _, future in pending:
+                    future.cancel()
+
+
+def waitRecord(future: concurrent.futures.Future) -> rawdat.RawDatRecord:
+    """
+    Wait for a prefetched record, timed as stage 'prefetch.wait'
+
+    :param future: future of the record as yielded by Prefetcher
+    :return: RawDatRecord
+    """
+    with profiling.stage('prefetch.wait'):
+        return future.result()
@@ -0,0 +1,304 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import logging
+import functools
+import threading
+import contextlib
+from datetime import datetime, timezone
+from typing import Final
+
+log = logging.getLogger('IMOSPATools')
+
+# name of the pseudo-stage with the time of the file not spent in any stage
+OTHER_STAGE: Final[str] = 'other'
+
+# Profiling is switched off by default. When off, the instrumented
+# functions only check this flag - no timer, no allocation.
+_enabled = False
+_sink = None
+_ownSink = False
+_sinkLock = threading.Lock()
+# id of the run (eg batch) written into each record, None means no id
+_runID = None
+# profile of the file being processed, per thread
+_local = threading.local()
+
+
+class IMOSAcousticProfilingException(Exception):
+    pass
+
+
+class FileProfile:
+    """
+    Timing of the processing stages of one file
+    """
+    __slots__ = ('fileName', 'runID', 'startTime', 'timeStart', 'stages', 'calls')
+
+    def __init__(self, fileName: str, runID: str = None):
+        self.fileName = fileName
+        self.runID = runID
+        self.startTime = datetime.now(timezone.utc)
+        self.timeStart = time.perf_counter()
+        self.stages = {}
+        self.calls = {}
+
+    def add(self, stageName: str, seconds: float) -> None:
+        self.stages[stageName] = self.stages.get(stageName, 0.0) + seconds
+        self.calls[stageName] = self.calls.get(stageName, 0) + 1
+
+    def toDict(self, **extra) -> dict:
+        total = time.perf_counter() - self.timeStart
+        record = {'file': self.fileName,
+                  'startTime': self.startTime.isoformat(),
+                  'pid': os.getpid(),
+                  'total': total,
+                  'stages': dict(self.stages),
+                  'calls': dict(self.calls)}
+        if self.runID is not None:
+            record['run'] = self.runID
+        record['stages'][OTHER_STAGE] = max(0.0, total - sum(self.stages.values()))
+        record.update(extra)
+        return record
+
+
+class _Stage:
+    # Nested stages (eg reading the calibration file inside
+    # loadPrepCalibFile) are subtracted from the enclosing stage,
+    # so the times of the stages of a file add up to its total.
+    __slots__ = ('name', 'timeStart', 'childSeconds', 'parent')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.childSeconds = 0.0
+        self.parent = getattr(_local, 'stage', None)
+        _local.stage = self
+        self.timeStart = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        elapsed = time.perf_counter() - self.timeStart
+        _local.stage = self.parent
+        if self.parent is not None:
+            self.parent.childSeconds += elapsed
+        profile = getattr(_local, 'profile', None)
+        if profile is not None:
+            profile.add(self.name, elapsed - self.childSeconds)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def newRunID() -> str:
+    """
+    :return: unique id of a run, to tell its records apart in a shared profile file
+    """
+    return uuid.uuid4().hex
+
+
+def enable(fileName: str = None, stream=None, runID: str = None) -> None:
+    """
+    Switch profiling on - per file timing records are written
+    as JSON lines (one JSON object per processed file)
+
+    :param fileName: JSON lines file, appended to (safe to share
+                     between worker processes - one write per record)
+    :param stream: open text stream to write into instead of a file
+    :param runID: id of the run written into each record as 'run'
+                  (see newRunID(), readProfile()), None means no id
+    """
+    global _enabled, _sink, _ownSink, _runID
+    disable()
+    if fileName is not None:
+        try:
+            _sink = open(fileName, 'a', buffering=1)
+        except (IOError, OSError) as e:
+            logMsg = f"Error opening profile file {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticProfilingException(logMsg)
+        _ownSink = True
+    else:
+        _sink = stream
+        _ownSink = False
+    _runID = runID
+    _enabled = True
+
+
+def disable() -> None:
+    """
+    Switch profiling off and close the profile file
+    """
+    global _enabled, _sink, _ownSink, _runID
+    _enabled = False
+    _runID = None
+    if _ownSink and _sink is not None:
+        _sink.close()
+    _sink = None
+    _ownSink = False
+
+
+def isEnabled() -> bool:
+    return _enabled
+
+
+def stage(stageName: str):
+    """
+    Context manager timing a stage of the file being processed,
+    eg 'with profiling.stage("calibration.fft"): ...'
+    Returns a shared no-op context manager when profiling is off.
+
+    :param stageName: name of the stage, module.function
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(stageName)
+
+
+def timed(stageName: str):
+    """
+    Decorator timing every call of the function as a stage
+
+    :param stageName: name of the stage, module.function
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(stageName):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def beginFile(fileName: str) -> None:
+    """
+    Start timing the processing of a file (in this thread),
+    the stages are accumulated until endFile()
+
+    :param fileName: name of the processed file
+    """
+    if _enabled:
+        _local.profile = FileProfile(fileName, _runID)
+
+
+def detachFile() -> FileProfile:
+    """
+    Take the profile of the file being processed off this thread,
+    to be finished on another thread (see attachFile(), endFile()),
+    eg once the file is written asynchronously
+
+    :return: FileProfile, None if profiling is off
+    """
+    profile = getattr(_local, 'profile', None)
+    _local.profile = None
+    return profile
+
+
+@contextlib.contextmanager
+def attachFile(profile: FileProfile):
+    """
+    Context manager timing the stages of this thread into a profile
+    detached from another thread (see detachFile())
+
+    :param profile: FileProfile, None means not timed
+    """
+    previous = getattr(_local, 'profile', None)
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = previous
+
+
+def endFile(profile: FileProfile = None, **extra) -> dict:
+    """
+    Finish timing the processing of the file and write the record
+
+    :param profile: detached profile of the file (see detachFile()),
+                    None means the file being processed in this thread
+    :param extra: additional fields of the record, eg numSamples
+    :return: the record as dict, None if profiling is off
+    """
+    if profile is None:
+        profile = detachFile()
+    if not _enabled or profile is None:
+        return None
+    record = profile.toDict(**extra)
+    if _sink is not None:
+        line = json.dumps(record) + '\n'
+        with _sinkLock:
+            _sink.write(line)
+            _sink.flush()
+    return record
+
+
+def readProfile(fileName: str, runID: str = None) -> list[dict]:
+    """
+    Read the per file timing records written by the profiling
+
+    :param fileName: JSON lines file
+    :param runID: read only the records of this run (see enable()),
+                  None means all the records
+    :return: list of records
+    """
+    records = []
+    with open(fileName, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                if runID is None or record.get('run') == runID:
+                    records.append(record)
+    return records
+
+
+def aggregateProfile(records: list[dict]) -> dict:
+    """
+    Aggregate per file timing records, eg across a batch
+
+    :param records: list of records (see readProfile())
+    :return: dict stage name -> {'seconds', 'calls', 'fraction'} sorted
+             by time descending, fraction is relative to the total time
+    """
+    total = sum(r['total'] for r in records)
+    stages = {}
+    for r in records:
+        for stageName, seconds in r['stages'].items():
+            entry = stages.setdefault(stageName, {'seconds': 0.0, 'calls': 0, 'fraction': 0.0})
+            entry['seconds'] += seconds
+            entry['calls'] += r['calls'].get(stageName, 0)
+    for entry in stages.values():
+        entry['fraction'] = entry['seconds'] / total if total > 0 else 0.0
+    return dict(sorted(stages.items(), key=lambda item: -item[1]['seconds']))
+
+
+def summariseProfile(records: list[dict]) -> str:
+    """
+    Format aggregated timing of the stages
+
+    :param records: list of records (see readProfile())
+    :return: summary as multi-line string
+    """
+    lines = [f"{'stage':32s} {'seconds':>10s} {'calls':>7s} {'share':>7s}"]
+    for stageName, entry in aggregateProfile(records).items():
+        lines.append(f"{stageName:32s} {entry['seconds']:10.3f} {entry['calls']:7d} {entry['fraction']:7.1%}")
+    lines.append(f"{len(records)} files, {sum(r['total'] for r in records):.3f}s total")
+    return "\n".join(lines)
@@ -0,0 +1,100 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import numpy
+import scipy
+import logging
+from numpy.lib.stride_tricks import sliding_window_view
+
+log = logging.getLogger('IMOSPATools')
+
+
+class IMOSAcousticPSDException(Exception):
+    pass
+
+
+class StreamingWelch:
+    """
+    Welch power spectral density estimate accumulated incrementally
+    from blocks of signal of any size, memory bounded by the block size.
+
+    The result is the same as (up to floating point rounding)
+        scipy.signal.welch(signal, fs, window=window)
+    of the whole signal - segments of len(window) samples overlapping
+    by half, constant detrend of each segment, one-sided density,
+    mean of the periodograms. Samples after the last complete segment
+    are ignored, as by scipy.signal.welch().
+    """
+
+    def __init__(self, fs: float, window: numpy.ndarray):
+        """
+        :param fs: sampling frequency
+        :param window: window of the segments, its size is the segment length
+        """
+        self.fs = fs
+        self.window = numpy.asarray(window, dtype=numpy.float64)
+        self.nperseg = self.window.size
+        self.noverlap = self.nperseg // 2
+        self.step = self.nperseg - self.noverlap
+        self.scale = 1.0 / (fs * numpy.sum(self.window * self.window))
+        self.numSegments = 0
+        self._sum = numpy.zeros(self.nperseg // 2 + 1)
+        # samples not yet consumed by a complete segment
+        self._pending = numpy.empty(0)
+
+    def update(self, signal: numpy.ndarray) -> None:
+        """
+        Add next block of the signal
+
+        :param signal: block of the signal, any size
+        """
+        data = numpy.concatenate((self._pending, signal))
+        numSegments = (data.size - self.noverlap) // self.step if data.size >= self.nperseg else 0
+        if numSegments > 0:
+            segments = sliding_window_view(data, self.nperseg)[::self.step][:numSegments]
+            # detrend='constant', then window
+            segments = segments - numpy.mean(segments, axis=-1, keepdims=True)
+            segments *= self.window
+            spec = scipy.fft.rfft(segments, axis=-1)
+            # |spec|^2 without complex temporaries
+            power = numpy.square(spec.real)
+            power += numpy.square(spec.imag)
+            self._sum += numpy.sum(power, axis=0)
+            self.numSegments += numSegments
+        self._pending = data[numSegments * self.step:].copy()
+
+    def psd(self) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Power spectral density of the signal so far
+
+        :return: frequencies as numpy array
+        :return: power spectral density as numpy array
+        """
+        if self.numSegments == 0:
+            logMsg = f"Signal shorter than one segment of {self.nperseg} samples, no PSD estimate"
+            log.error(logMsg)
+            raise IMOSAcousticPSDException(logMsg)
+        spec = self._sum * self.scale
+        # one-sided, double all but DC (and Nyquist for even segment length)
+        if self.nperseg % 2 == 0:
+            spec[1:-1] *= 2
+        else:
+            spec[1:] *= 2
+        spec /= self.numSegments
+        freq = numpy.fft.rfftfreq(self.nperseg, 1.0 / self.fs)
+        return freq, spec
+
+
+def runningMedian(signal: numpy.ndarray, size: int) -> numpy.ndarray:
+    """
+    Running median of odd size, the ends padded with zeros.
+    Same result as scipy.signal.medfilt(signal, size), without its
+    conversions and checks (ndimage selection, not a full sort per window)
+
+    :param signal: 1-D signal
+    :param size: odd size of the median window
+    :return: filtered signal
+    """
+    if size % 2 == 0:
+        raise ValueError(f"Median window size must be odd, not {size}")
+    return scipy.ndimage.median_filter(signal, size, mode='constant', cval=0.0)
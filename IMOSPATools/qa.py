@@ -0,0 +1,154 @@
+import numpy
+import logging
+from typing import Final
+from dataclasses import dataclass
+
+from . import calibration
+from . import audiofile
+from . import profiling
+
+log = logging.getLogger('IMOSPATools')
+
+# minimal number of identical consecutive samples considered a flat line
+# (stuck A/D converter or data dropout)
+FLATLINE_MIN_SAMPLES: Final[int] = 16
+# number of samples processed at once, bounds the size of temporaries
+QA_BLOCK_SIZE: Final[int] = 1 << 20
+
+
+@dataclass
+class SignalQA:
+    numSamples: int = 0
+    # samples outside OVERLOAD_LOWER_BOUND..OVERLOAD_UPPER_BOUND (clipped)
+    numOverloaded: int = 0
+    longestOverloadRun: int = 0
+    minCount: int = 0
+    maxCount: int = 0
+    # mean of the raw A/D counts, the DC offset removed by toVolts()
+    meanCount: float = 0.0
+    # runs of at least FLATLINE_MIN_SAMPLES identical samples
+    numFlatRuns: int = 0
+    longestFlatRun: int = 0
+    numFlatSamples: int = 0
+
+
+class _RunTracker:
+    # Accumulates statistics of runs of True values in a boolean mask
+    # processed block by block - a run can continue across blocks.
+
+    def __init__(self, minLength: int = 1, extra: int = 0):
+        # runs shorter than minLength (after adding extra) are ignored
+        self.minLength = minLength
+        self.extra = extra
+        self.carry = 0
+        self.numRuns = 0
+        self.longest = 0
+        self.total = 0
+
+    def _add(self, lengths: numpy.ndarray) -> None:
+        lengths = lengths + self.extra
+        lengths = lengths[lengths >= self.minLength]
+        if lengths.size > 0:
+            self.numRuns += lengths.size
+            self.longest = max(self.longest, int(lengths.max()))
+            self.total += int(lengths.sum())
+
+    def _close(self) -> None:
+        if self.carry > 0:
+            self._add(numpy.array([self.carry]))
+            self.carry = 0
+
+    def update(self, mask: numpy.ndarray) -> None:
+        if mask.size == 0:
+            return
+        edges = numpy.diff(mask.astype(numpy.int8), prepend=0, append=0)
+        starts = numpy.flatnonzero(edges == 1)
+        ends = numpy.flatnonzero(edges == -1)
+        lengths = ends - starts
+        if lengths.size == 0 or starts[0] != 0:
+            # the run carried from the previous block ended there
+            self._close()
+        elif self.carry > 0:
+            lengths[0] += self.carry
+            self.carry = 0
+        if lengths.size > 0 and ends[-1] == mask.size:
+            # the last run may continue in the next block
+            self.carry = int(lengths[-1])
+            lengths = lengths[:-1]
+        self._add(lengths)
+
+    def finish(self) -> None:
+        self._close()
+
+
+@profiling.timed('qa.signalQA')
+def computeSignalQA(binData: numpy.ndarray,
+                    flatLineMinSamples: int = FLATLINE_MIN_SAMPLES,
+                    blockSize: int = QA_BLOCK_SIZE) -> SignalQA:
+    """
+    Compute signal QA statistics of raw audio data in a single
+    vectorised pass, block by block (works well with numpy.memmap)
+
+    :param binData: raw audio data (A/D counts)
+    :param flatLineMinSamples: min number of identical consecutive
+                               samples considered a flat line
+    :param blockSize: number of samples processed at once
+    :return: SignalQA - QA statistics
+    """
+    qa = SignalQA(numSamples=int(binData.size))
+    if binData.size == 0:
+        return qa
+
+    overloadRuns = _RunTracker()
+    # a run of N equal neighbours is a flat line of N+1 samples
+    flatRuns = _RunTracker(minLength=flatLineMinSamples, extra=1)
+    total = 0
+    minCount = None
+    maxCount = None
+    previous = None
+
+    for blockStart in range(0, binData.size, blockSize):
+        block = numpy.asarray(binData[blockStart:blockStart + blockSize])
+
+        overloaded = (block < calibration.OVERLOAD_LOWER_BOUND) | (block > calibration.OVERLOAD_UPPER_BOUND)
+        qa.numOverloaded += int(numpy.count_nonzero(overloaded))
+        overloadRuns.update(overloaded)
+
+        blockMin = int(block.min())
+        blockMax = int(block.max())
+        minCount = blockMin if minCount is None else min(minCount, blockMin)
+        maxCount = blockMax if maxCount is None else max(maxCount, blockMax)
+        total += int(block.sum(dtype=numpy.int64))
+
+        if previous is None:
+            flatRuns.update(block[1:] == block[:-1])
+        else:
+            flatRuns.update(block == numpy.concatenate(([previous], block[:-1])))
+        previous = block[-1]
+
+    overloadRuns.finish()
+    flatRuns.finish()
+
+    qa.longestOverloadRun = overloadRuns.longest
+    qa.minCount = minCount
+    qa.maxCount = maxCount
+    qa.meanCount = total / binData.size
+    qa.numFlatRuns = flatRuns.numRuns
+    qa.longestFlatRun = flatRuns.longest
+    qa.numFlatSamples = flatRuns.total
+
+    log.debug(f"Signal QA: {qa}")
+    return qa
+
+
+def storeInMetadata(signalQA: SignalQA, metadata: audiofile.MetadataFull) -> None:
+    """
+    Store the overload and flat line statistics in the metadata of the output file
+
+    :param signalQA: QA statistics of the raw data
+    :param metadata: metadata of the output file
+    """
+    metadata.numOverloaded = signalQA.numOverloaded
+    metadata.longestOverloadRun = signalQA.longestOverloadRun
+    metadata.numFlatRuns = signalQA.numFlatRuns
+    metadata.longestFlatRun = signalQA.longestFlatRun
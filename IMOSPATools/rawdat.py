@@ -11,6 +11,8 @@ import logging
 from typing import Final
 from dataclasses import dataclass, field
 
+from . import profiling
+
 # --- Example header ---
 #   Record Header-       E24 set# 3444
 #   Schedule 1 2016/10/02 00:00:01 - 48836
@@ -28,6 +30,10 @@ NUM_LINES_HEADER: Final[int] = 5
 #   Data block size = 0065536
 # Note: some older files have only the first 4 lines of the footer
 NUM_LINES_FOOTER: Final[int] = 4
+# The footer is at most 6 lines shorter than 64 bytes each (see imos_read.h),
+# so it is always found within this many bytes from the end of the file
+FOOTER_MAX_BYTES: Final[int] = 512
+FOOTER_MARKER: Final[bytes] = b"Record Marker"
 
 # err codes
 # ERR_FooterNotFound = -2
@@ -38,6 +44,14 @@ REGEXP_DATETIME: Final[str] = r'(\d{4}/\d{2}/\d{2}) (\d{2}:\d{2}:\d{2})'
 REGEXP_SUBSECONDS: Final[str] = r'(\d{5})$'
 REGEXP_SAMPLE_RATE: Final[str] = r"Sample Rate (\d+) Duration (\d+)"
 REGEXP_FILTER: Final[str] = r"Filter [0,1] C[0-3]=(\d+) C[0-3]=(\d+)"
+REGEXP_FILTER_FULL: Final[str] = r"Filter [0,1] C[0-3]=(\d+) C[0-3]=(\d+) LF=(\d+) HF=(\d+) PG=(\d+) G=(\d+)"
+REGEXP_RECORD_HEADER: Final[str] = r"Record Header-\s*(.*)$"
+REGEXP_SET_ID: Final[str] = r"set#\s*(\d+)"
+REGEXP_DATA_VALIDITY: Final[str] = r"Data Validity\s*-\s*(.*)$"
+REGEXP_DATA_TO_RAM: Final[str] = r"Data to RAM\s*=\s*(\d+)"
+REGEXP_DATA_BLOCK_SIZE: Final[str] = r"Data block size\s*=\s*(\d+)"
+# max number of footer lines, newer files have 6, older 4
+NUM_LINES_FOOTER_MAX: Final[int] = 6
 
 # Raw DAT files are uint16 big-endian
 IMOS_DAT_FILE_DTYPE: Final[str] = '>u2'
@@ -75,6 +89,21 @@ class RAWFileFooter:
     dataBlockSize: int = 65536
 
 
+@dataclass
+class RAWFileInfo:
+    # everything known about the RAW file without reading the audio data
+    fileName: str = ""
+    fileSize: int = 0
+    # file offset of the first sample
+    dataOffset: int = 0
+    # file offset of the footer ("Record Marker")
+    footerOffset: int = 0
+    # number of samples including the tail beyond the header duration
+    numSamples: int = 0
+    header: RAWFileHeader = field(default_factory=RAWFileHeader)
+    footer: RAWFileFooter = field(default_factory=RAWFileFooter)
+
+
 log = logging.getLogger('IMOSPATools')
 
 
@@ -82,6 +111,18 @@ class IMOSAcousticRAWReadException(Exception):
     pass
 
 
+def countChannels(header: RAWFileHeader) -> int:
+    """
+    Number of recorded channels, C0/C1 of the filter 0 line
+    and C2/C3 of the filter 1 line of the header
+
+    :param header: RAW file header
+    :return: number of channels enabled in the header
+    """
+    return int(header.filter0.channelA) + int(header.filter0.channelB) + \
+        int(header.filter1.channelA) + int(header.filter1.channelB)
+
+
 def convertHeaderTime(line: str, timeLabel: str) -> datetime:
     """
     Convert time string found in RAW file header into datetime class
@@ -96,7 +137,7 @@ def convertHeaderTime(line: str, timeLabel: str) -> datetime:
         dateTime = datetime.strptime(f"{date_str} {time_str}", "%Y/%m/%d %H:%M:%S")
         log.debug(f"\'{timeLabel}\' timestamp without sub-seconds is: {dateTime}")
     else:
-        logMsg = f"\'{timeLabel}\' timestamp not found in Footer of file {file.name}. File corrupted?"
+        logMsg = f"\'{timeLabel}\' timestamp not found in line \'{line.strip()}\'. File corrupted?"
         log.error(logMsg)
         raise IMOSAcousticRAWReadException(logMsg)
         return False
@@ -105,7 +146,7 @@ def convertHeaderTime(line: str, timeLabel: str) -> datetime:
         dateTime += timedelta(seconds=float(match[1])/(float)(1 << 16))
         log.info(f"\'{timeLabel}\' timestamp is: {dateTime}")
     else:
-        logMsg = f"\'{timeLabel}\' timestamp sub-seconds not found in Footer of file {file.name}. File corrupted?"
+        logMsg = f"\'{timeLabel}\' timestamp sub-seconds not found in line \'{line.strip()}\'. File corrupted?"
         log.error(logMsg)
         raise IMOSAcousticRAWReadException(logMsg)
         return False
@@ -174,76 +215,67 @@ def readRawHeaderEssentials(file: _io.BufferedReader) -> tuple[int, float, float
 
 def readRawBinData(file: _io.BufferedReader,
                    sampleRate: float,
-                   durationHeader: float) -> numpy.ndarray:
+                   durationHeader: float,
+                   footerOffset: int = None) -> numpy.ndarray:
     """
     Read binary data block (audio recording) from RAW file
-    Assumes file is already open!
+    Assumes file is already open and positioned at the start
+    of the binary data (just after the header)!
 
     :param file: already open file
-    :return: sampling rate
-    :return: record duration as read from the header
-        (in reality little longer, need to scan for footer marker to figure out)
+    :param sampleRate: sampling rate
+    :param durationHeader: record duration as read from the header
+        (in reality little longer, the data ends where the footer starts)
+    :param footerOffset: file offset of the footer, located
+        by findFooterOffset() if not provided
     :return: audio data as numpy array
     """
     numSamplesHeader = int(sampleRate * durationHeader)
     log.debug(f'numSamplesHeader is {numSamplesHeader}')
 
-    # read the nominal chunk of sound record as numpy array of int16
-    binData = numpy.frombuffer(file.read(numSamplesHeader * numpy.dtype(IMOS_DAT_FILE_DTYPE).itemsize), dtype=IMOS_DAT_FILE_DTYPE)
-    log.debug(f'Size of read bin data as per header numpy array is {binData.size}')
-
-    # store the position where the binary data tail begins
-    binDataTailPos = file.tell()
-    log.debug(f'File position after bin data as per header is {binDataTailPos}')
-
-    fileDataTail = file.read()
-    match = re.search(b"Record Marker", fileDataTail)
-    if match:
-        footerPos = match.start()
-    else:
-        logMsg = "Footer (Record Marker) not found in file " + file.name + ". File corrupted?"
+    # store the position where the binary data begins
+    binDataPos = file.tell()
+    log.debug(f'File position of bin data is {binDataPos}')
+
+    if footerOffset is None:
+        footerOffset = findFooterOffset(file, binDataPos)
+
+    # the footer is preceded by a new line character
+    sampleSize = numpy.dtype(IMOS_DAT_FILE_DTYPE).itemsize
+    numSamples = (footerOffset - binDataPos - 1) // sampleSize
+    log.debug(f'Extra samples in bin data tail beyond header duration: {numSamples - numSamplesHeader}')
+
+    # read the complete sound record (nominal chunk and the extra tail)
+    # at once, directly into the numpy array of uint16 big-endian
+    binData = numpy.empty(max(numSamples, 0), dtype=IMOS_DAT_FILE_DTYPE)
+    file.seek(binDataPos, os.SEEK_SET)
+    numBytesRead = file.readinto(memoryview(binData).cast('B'))
+    if numBytesRead != binData.nbytes:
+        logMsg = f"Binary data truncated in file {file.name}. File corrupted?"
         log.error(logMsg)
         raise IMOSAcousticRAWReadException(logMsg)
-        return False
-
-    # rewind the file to the position where the binary data tail begins
-    file.seek(binDataTailPos, os.SEEK_SET)
 
-    pos = file.tell()
-    log.debug(f'file position before read bin data tail is {pos}')
-
-    # read the extra sound record as numpy array of int16
-    extraSamplesInBinDataTail = (footerPos - 1) // 2
-    binDataTail = numpy.frombuffer(file.read(extraSamplesInBinDataTail * numpy.dtype(IMOS_DAT_FILE_DTYPE).itemsize), dtype=IMOS_DAT_FILE_DTYPE)
-    log.debug(f'Size of extra bin data tail numpy array is {binDataTail.size}')
-
-    binData = numpy.append(binData, binDataTail)
-    log.info(f'Size of complete data is {binData.size} samples {binData.size * numpy.dtype(IMOS_DAT_FILE_DTYPE).itemsize} bytes')
+    log.info(f'Size of complete data is {binData.size} samples {binData.nbytes} bytes')
 
     return binData
 
 
 def readRawTimesFromFooter(file: _io.BufferedReader,
-                           fileOffset: int = 0) -> Tuple[datetime, datetime]:
+                           fileOffset: int = 0,
+                           footerOffset: int = None) -> Tuple[datetime, datetime]:
     """
-    Read  from RAW file
+    Read record start and end time from the footer of RAW file
     Assumes file is already open!
 
     :param file: already open file
+    :param fileOffset: file offset where to start searching for the footer
+    :param footerOffset: file offset of the footer, located
+        by findFooterOffset() if not provided
     :return: record start time and end time from the footer, as datetime class
     """
-    file.seek(fileOffset, os.SEEK_SET)
-    fileDataTail = file.read()
-    match = re.search(b"Record Marker", fileDataTail)
-    if match:
-        footerPos = match.start()
-    else:
-        logMsg = "Footer (Record Marker) not found in file " + file.name + ". File corrupted?"
-        log.error(logMsg)
-        raise IMOSAcousticRAWReadException(logMsg)
+    if footerOffset is None:
+        footerOffset = findFooterOffset(file, fileOffset)
 
-    footerOffset = fileOffset + footerPos
-    log.debug(f'footer position = {footerOffset}')
     # fast forward to the footer offset
     file.seek(footerOffset, os.SEEK_SET)
 
@@ -260,6 +292,384 @@ def readRawTimesFromFooter(file: _io.BufferedReader,
     return startTime, endTime
 
 
+def findFooterOffset(file: _io.BufferedReader, searchOffset: int = 0) -> int:
+    """
+    Find the footer ("Record Marker") of RAW file
+    Assumes file is already open!
+
+    The footer is at the very end of the file, so only the last
+    FOOTER_MAX_BYTES bytes are read, instead of the whole data tail.
+
+    :param file: already open file
+    :param searchOffset: file offset where the footer can start at the earliest
+        (typically start of the binary data)
+    :return: file offset of the footer
+    """
+    fileSize = file.seek(0, os.SEEK_END)
+    tailOffset = max(searchOffset, fileSize - FOOTER_MAX_BYTES)
+    file.seek(tailOffset, os.SEEK_SET)
+    footerPos = file.read(fileSize - tailOffset).rfind(FOOTER_MARKER)
+
+    if footerPos < 0 and tailOffset > searchOffset:
+        # not a well formed file - fall back to search the whole data tail
+        log.warning(f"Footer not found in last {FOOTER_MAX_BYTES} bytes of file {file.name}, searching whole file.")
+        tailOffset = searchOffset
+        file.seek(tailOffset, os.SEEK_SET)
+        footerPos = file.read().rfind(FOOTER_MARKER)
+
+    if footerPos < 0:
+        logMsg = "Footer (Record Marker) not found in file " + file.name + ". File corrupted?"
+        log.error(logMsg)
+        raise IMOSAcousticRAWReadException(logMsg)
+
+    footerOffset = tailOffset + footerPos
+    log.debug(f'footer position = {footerOffset}')
+    return footerOffset
+
+
+def parseFilterLine(line: str, fileName: str) -> RAWFileFilterLine:
+    """
+    Parse filter line of RAW file header
+    eg 'Filter 0 C0=1 C1=0 LF=008 HF=02800 PG=010 G=001'
+
+    :param line: filter line of the header
+    :param fileName: file name for log prints
+    :return: RAWFileFilterLine
+    """
+    match = re.match(REGEXP_FILTER_FULL, line)
+    if not match:
+        logMsg = f"Filter line \'{line.strip()}\' not recognised in header of file {fileName}"
+        log.error(logMsg)
+        raise IMOSAcousticRAWReadException(logMsg)
+    values = [int(v) for v in match.groups()]
+    return RAWFileFilterLine(channelA=bool(values[0]), channelB=bool(values[1]),
+                             lowFreq=values[2], highFreq=values[3],
+                             pGain=values[4], gain=values[5])
+
+
+def readRawHeader(file: _io.BufferedReader) -> RAWFileHeader:
+    """
+    Read and parse all the fields of RAW file header
+    Assumes file is already open and positioned at its beginning!
+
+    :param file: already open file
+    :return: RAWFileHeader
+    """
+    header = []
+    for lineNum in range(0, NUM_LINES_HEADER):
+        header.append(file.readline().decode("utf-8", errors="replace"))
+
+    rawHeader = RAWFileHeader()
+    match = re.match(REGEXP_RECORD_HEADER, header[0].rstrip())
+    if match:
+        rawHeader.recordHeader = match.group(1).strip()
+    # set ID is not included in all the headers
+    match = re.search(REGEXP_SET_ID, header[0])
+    if match:
+        rawHeader.setID = int(match.group(1))
+
+    rawHeader.schedule = convertHeaderTime(header[1], 'Schedule')
+
+    match = re.match(REGEXP_SAMPLE_RATE, header[2])
+    if not match:
+        logMsg = "\'Sample Rate\' or \'Duration\' not found in header of file " + file.name
+        log.error(logMsg)
+        raise IMOSAcousticRAWReadException(logMsg)
+    rawHeader.sampleRate = int(match.group(1))
+    rawHeader.duration = int(match.group(2))
+
+    rawHeader.filter0 = parseFilterLine(header[3], file.name)
+    rawHeader.filter1 = parseFilterLine(header[4], file.name)
+
+    return rawHeader
+
+
+def readRawFooter(file: _io.BufferedReader, footerOffset: int) -> RAWFileFooter:
+    """
+    Read and parse all the fields of RAW file footer
+    (4 lines in older files, 6 lines in newer)
+    Assumes file is already open!
+
+    :param file: already open file
+    :param footerOffset: file offset of the footer, see findFooterOffset()
+    :return: RAWFileFooter
+    """
+    file.seek(footerOffset, os.SEEK_SET)
+    footer = file.read(FOOTER_MAX_BYTES).decode("utf-8", errors="replace").splitlines()
+    footer = footer[:NUM_LINES_FOOTER_MAX]
+    if len(footer) < 3:
+        logMsg = f"Footer of file {file.name} is incomplete. File corrupted?"
+        log.error(logMsg)
+        raise IMOSAcousticRAWReadException(logMsg)
+
+    rawFooter = RAWFileFooter(recordHeader=footer[0].strip())
+    rawFooter.startTime = convertHeaderTime(footer[1], 'First Data')
+    rawFooter.endTime = convertHeaderTime(footer[2], 'Finalised')
+    for line in footer[3:]:
+        match = re.match(REGEXP_DATA_VALIDITY, line)
+        if match:
+            rawFooter.dataValidity = match.group(1).strip()
+        match = re.match(REGEXP_DATA_TO_RAM, line)
+        if match:
+            rawFooter.dataToRAM = bool(int(match.group(1)))
+        match = re.match(REGEXP_DATA_BLOCK_SIZE, line)
+        if match:
+            rawFooter.dataBlockSize = int(match.group(1))
+
+    return rawFooter
+
+
+def readRawFileInfo(fileName: str) -> RAWFileInfo:
+    """
+    Read header, footer and layout of RAW file, without reading audio data
+
+    :param fileName: file name (can be relative/full path)
+    :return: RAWFileInfo
+    """
+    info = RAWFileInfo(fileName=fileName)
+    with open(fileName, 'rb') as file:
+        try:
+            info.header = readRawHeader(file)
+            info.dataOffset = file.tell()
+            info.footerOffset = findFooterOffset(file, info.dataOffset)
+            info.footer = readRawFooter(file, info.footerOffset)
+            info.fileSize = file.seek(0, os.SEEK_END)
+        except (IMOSAcousticRAWReadException, IndexError, ValueError) as e:
+            logMsg = f"Error reading header or footer from {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticRAWReadException(logMsg)
+
+    # the footer is preceded by a new line character
+    info.numSamples = max(0, (info.footerOffset - info.dataOffset - 1) // numpy.dtype(IMOS_DAT_FILE_DTYPE).itemsize)
+    return info
+
+
+class RawDatRecord:
+    """
+    RAW (.DAT) file record read lazily. Only the header is parsed on
+    construction, the footer (times, number of samples) on the first
+    access to any of its fields, and the audio data only when samples
+    is touched. Record timing and rate (eg to name the output file) are
+    available without reading any audio bytes.
+
+    __slots__ keep the instances small, eg records of a whole archive.
+    """
+    __slots__ = ('fileName', 'header', 'dataOffset', 'mapped',
+                 '_footer', '_footerOffset', '_fileSize', '_samples')
+
+    def __init__(self, fileName: str, mapped: bool = True):
+        """
+        :param fileName: file name (can be relative/full path)
+        :param mapped: samples as read-only numpy.memmap of the file,
+                       otherwise read into a numpy array
+        """
+        self.fileName = fileName
+        self.mapped = mapped
+        self._footer = None
+        self._footerOffset = None
+        self._fileSize = None
+        self._samples = None
+        try:
+            with open(fileName, 'rb') as file:
+                self.header = readRawHeader(file)
+                self.dataOffset = file.tell()
+        except (IMOSAcousticRAWReadException, IndexError, ValueError) as e:
+            logMsg = f"Error reading header from {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticRAWReadException(logMsg)
+
+    def _readFooter(self) -> None:
+        try:
+            with open(self.fileName, 'rb') as file:
+                footerOffset = findFooterOffset(file, self.dataOffset)
+                self._footer = readRawFooter(file, footerOffset)
+                self._fileSize = file.seek(0, os.SEEK_END)
+                self._footerOffset = footerOffset
+        except (IMOSAcousticRAWReadException, IndexError, ValueError) as e:
+            logMsg = f"Error reading footer from {self.fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticRAWReadException(logMsg)
+
+    @property
+    def footer(self) -> RAWFileFooter:
+        if self._footer is None:
+            self._readFooter()
+        return self._footer
+
+    @property
+    def footerOffset(self) -> int:
+        if self._footerOffset is None:
+            self._readFooter()
+        return self._footerOffset
+
+    @property
+    def fileSize(self) -> int:
+        if self._fileSize is None:
+            self._readFooter()
+        return self._fileSize
+
+    @property
+    def numSamples(self) -> int:
+        # the footer is preceded by a new line character
+        return max(0, (self.footerOffset - self.dataOffset - 1) // numpy.dtype(IMOS_DAT_FILE_DTYPE).itemsize)
+
+    @property
+    def numChannels(self) -> int:
+        return countChannels(self.header)
+
+    @property
+    def sampleRate(self) -> float:
+        # float, as returned by readRawFile()
+        return float(self.header.sampleRate)
+
+    @property
+    def durationHeader(self) -> float:
+        return float(self.header.duration)
+
+    @property
+    def setID(self) -> int:
+        return self.header.setID
+
+    @property
+    def schedule(self) -> datetime:
+        return self.header.schedule
+
+    @property
+    def startTime(self) -> datetime:
+        return self.footer.startTime
+
+    @property
+    def endTime(self) -> datetime:
+        return self.footer.endTime
+
+    @property
+    def samples(self) -> numpy.ndarray:
+        """
+        Audio data as big-endian uint16, read (or mapped) on first access
+        """
+        if self._samples is None:
+            self._samples = self._readSamples()
+        return self._samples
+
+    @profiling.timed('rawdat.read')
+    def _readSamples(self) -> numpy.ndarray:
+        # same assumption as readRawHeaderEssentials()
+        if self.numChannels != 1:
+            logMsg = f"Unexpected number of channels ({self.numChannels}) in file {self.fileName}"
+            log.error(logMsg)
+            raise IMOSAcousticRAWReadException(logMsg)
+        numSamples = self.numSamples
+        if self.mapped and numSamples > 0:
+            return numpy.memmap(self.fileName, dtype=IMOS_DAT_FILE_DTYPE, mode='r',
+                                offset=self.dataOffset, shape=(numSamples,))
+        return readRawSampleRange(self.info(), 0, numSamples)
+
+    def releaseSamples(self) -> None:
+        """
+        Drop the audio data (or the mapping), it is read again on next access
+        """
+        self._samples = None
+
+    def info(self) -> RAWFileInfo:
+        """
+        :return: RAWFileInfo of the record, as readRawFileInfo()
+        """
+        return RAWFileInfo(fileName=self.fileName, fileSize=self.fileSize,
+                           dataOffset=self.dataOffset, footerOffset=self.footerOffset,
+                           numSamples=self.numSamples, header=self.header, footer=self.footer)
+
+    def __repr__(self) -> str:
+        return f"RawDatRecord({self.fileName!r})"
+
+
+@profiling.timed('rawdat.read')
+def readRawSampleRange(info: RAWFileInfo, firstSample: int,
+                       numSamples: int) -> numpy.ndarray:
+    """
+    Read only a range of samples from RAW file, using the file layout
+    from readRawFileInfo() - no header/footer parsing, no full read
+
+    :param info: layout of the file as returned by readRawFileInfo()
+    :param firstSample: index of the first sample to read
+    :param numSamples: number of samples to read
+    :return: audio data as numpy array of big-endian uint16
+    """
+    if firstSample < 0 or numSamples < 0 or firstSample + numSamples > info.numSamples:
+        logMsg = f"Sample range {firstSample}+{numSamples} outside of {info.numSamples} " \
+                 f"samples in file {info.fileName}"
+        log.error(logMsg)
+        raise IMOSAcousticRAWReadException(logMsg)
+
+    binData = numpy.empty(numSamples, dtype=IMOS_DAT_FILE_DTYPE)
+    with open(info.fileName, 'rb') as file:
+        file.seek(info.dataOffset + firstSample * binData.itemsize, os.SEEK_SET)
+        numBytesRead = file.readinto(memoryview(binData).cast('B'))
+    if numBytesRead != binData.nbytes:
+        logMsg = f"Binary data truncated in file {info.fileName}. File corrupted?"
+        log.error(logMsg)
+        raise IMOSAcousticRAWReadException(logMsg)
+    return binData
+
+
+@profiling.timed('rawdat.read')
+def readRawFileMapped(fileName: str,
+                      nativeEndian: bool = False) -> tuple[numpy.ndarray, int, float, float, datetime, datetime, datetime]:
+    """
+    Read RAW file without copying the audio data - the samples are
+    returned as a read-only numpy.memmap view of the file.
+    The footer is located first, so the sample region is known
+    before the audio data is touched.
+
+    :param fileName: file name (can be relative/full path)
+    :param nativeEndian: convert samples from big-endian uint16 into
+                         a native-endian in-memory array (copy)
+
+    :return: audio data as numpy.memmap of big-endian uint16
+             (or numpy array of native uint16, if nativeEndian)
+    :return: number of channels, sampling rate,
+    :return: record duration as read from the header
+    :return: record start time and end time from the footer, as datetime class
+    """
+    log.debug(f'Attempting to map raw DAT audio file {fileName}')
+
+    with open(fileName, 'rb') as file:
+        try:
+            numChannels, sampleRate, durationHeader, \
+                scheduleTime = readRawHeaderEssentials(file)
+        except IMOSAcousticRAWReadException as e:
+            logMsg = f"Error reading header from {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticRAWReadException(logMsg)
+
+        dataOffset = file.tell()
+        sampleSize = numpy.dtype(IMOS_DAT_FILE_DTYPE).itemsize
+
+        try:
+            footerOffset = findFooterOffset(file, dataOffset)
+            startTime, endTime = readRawTimesFromFooter(file, footerOffset=footerOffset)
+        except IMOSAcousticRAWReadException as e:
+            logMsg = f"Error reading footer from {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticRAWReadException(logMsg)
+
+    # the footer is preceded by a new line character,
+    # same number of samples as readRawBinData()
+    numSamples = (footerOffset - dataOffset - 1) // sampleSize
+    log.info(f'Size of complete data is {numSamples} samples {numSamples * sampleSize} bytes')
+
+    if numSamples > 0:
+        binData = numpy.memmap(fileName, dtype=IMOS_DAT_FILE_DTYPE, mode='r',
+                               offset=dataOffset, shape=(numSamples,))
+    else:
+        binData = numpy.empty(0, dtype=IMOS_DAT_FILE_DTYPE)
+
+    if nativeEndian:
+        binData = binData.astype(numpy.uint16)
+
+    return binData, numChannels, sampleRate, durationHeader, startTime, endTime, scheduleTime
+
+
+@profiling.timed('rawdat.read')
 def readRawFile(fileName: str) -> tuple[numpy.ndarray, int, float, float, datetime, datetime, datetime]:
     """
     Read RAW file
@@ -285,21 +695,30 @@ def readRawFile(fileName: str) -> tuple[numpy.ndarray, int, float, float, dateti
             log.error(logMsg + f"\nException {e}")
             raise IMOSAcousticRAWReadException(logMsg)
 
+        # locate the footer only once, it determines
+        # both the size of binary data and position of the times
+        dataOffset = file.tell()
+        try:
+            footerOffset = findFooterOffset(file, dataOffset)
+        except IMOSAcousticRAWReadException as e:
+            logMsg = f"Error locating footer in {fileName}"
+            log.error(logMsg + f"\nException {e}")
+            raise IMOSAcousticRAWReadException(logMsg)
+        file.seek(dataOffset, os.SEEK_SET)
+
         # !@#$%^&* Warning: assuming single channel only,
         # eg: C0=1 C1=0 C2=0 C3=0 in the header.
         # as Sasha Gavrilov suggested there are no data files
         # with more than one channel
         try:
-            binData = readRawBinData(file, sampleRate, durationHeader)
+            binData = readRawBinData(file, sampleRate, durationHeader, footerOffset)
         except IMOSAcousticRAWReadException as e:
             logMsg = f"Error binary data from {fileName}"
             log.error(logMsg + f"\nException {e}")
             raise IMOSAcousticRAWReadException(logMsg)
 
-        fileTailOffset = file.tell()
-
         try:
-            startTime, endTime = readRawTimesFromFooter(file, fileTailOffset)
+            startTime, endTime = readRawTimesFromFooter(file, footerOffset=footerOffset)
         except IMOSAcousticRAWReadException as e:
             logMsg = f"Error binary data from {fileName}"
             log.error(logMsg + f"\nException {e}")
@@ -0,0 +1,304 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import numpy
+import scipy
+import logging
+import soundfile
+from typing import Final, Iterator
+
+from . import calibration
+from . import audiofile
+from . import profiling
+
+log = logging.getLogger('IMOSPATools')
+
+# Duration of the calibration FIR filter in seconds. It has to be long
+# enough to resolve the 5 Hz high-pass and the calibration spectrum.
+FIR_DURATION: Final[float] = 10.0
+# Default number of samples fed into the calibrator at once
+STREAM_BLOCK_SIZE: Final[int] = 1 << 18
+# Documented accuracy of the chunked calibration compared to
+# calibration.calibrateReal(): max abs difference relative to the max
+# abs amplitude of the calibrated signal, excluding the first and last
+# STREAM_EDGE_SECONDS of the record. calibrateReal() uses a circular FFT
+# convolution over the whole record, so the record edges differ more.
+STREAM_REL_TOLERANCE: Final[float] = 5e-4
+STREAM_EDGE_SECONDS: Final[float] = 2.0
+
+
+def designCalibrationFIR(transfer: calibration.CalibrationTransfer,
+                         firDuration: float = FIR_DURATION) -> numpy.ndarray:
+    """
+    Design zero-phase (symmetric) FIR filter equivalent to the calibration
+    done by calibrateReal() - the calibration correction 1/sqrt(calSpecInt)
+    multiplied by the magnitude response of the forward-backward
+    Butterworth high-pass filter.
+
+    :param transfer: calibration transfer function
+    :param firDuration: duration of the filter impulse response in seconds
+    :return: FIR filter coefficients, odd length, delay is len//2 samples
+    """
+    # even FFT size, power of 2 for speed
+    nfft = 1 << int(numpy.ceil(numpy.log2(firDuration * transfer.fSample)))
+    half = nfft // 2
+
+    response = transfer.correction(nfft)
+    if not transfer.spectralHighPass:
+        # forward-backward filtering applies the squared magnitude response
+        response = response * transfer.highPassResponse(nfft)
+
+    # zero-phase impulse response is circularly centred at sample 0,
+    # make it causal by shifting it by half, then taper the ends
+    impulse = numpy.fft.irfft(response, nfft)
+    fir = numpy.concatenate((impulse[-half:], impulse[:half + 1]))
+    fir *= scipy.signal.windows.hann(fir.size)
+    log.debug(f"Calibration FIR filter designed with {fir.size} taps")
+    return fir
+
+
+class StreamingCalibrator:
+    """
+    Calibration of an audio record processed in blocks of arbitrary size,
+    using overlap-save FFT convolution with the calibration FIR filter
+    (designCalibrationFIR()), which also includes the zero-phase
+    high-pass filter.
+    Peak memory is bounded by the FFT size, not by the record length.
+    The output matches calibrateReal() within STREAM_REL_TOLERANCE.
+    """
+
+    def __init__(self, transfer: calibration.CalibrationTransfer,
+                 firDuration: float = FIR_DURATION, fftSize: int = None):
+        """
+        :param transfer: calibration transfer function
+        :param firDuration: duration of the FIR filter in seconds
+        :param fftSize: FFT size of the overlap-save, by default
+                        the smallest power of 2 >= 4 * number of taps
+        """
+        self.fir = designCalibrationFIR(transfer, firDuration)
+        self.numTaps = self.fir.size
+        self.delay = self.numTaps // 2
+        if fftSize is None:
+            fftSize = 1 << int(numpy.ceil(numpy.log2(4 * self.numTaps)))
+        if fftSize <= self.numTaps:
+            raise calibration.IMOSAcousticCalibException(
+                f"FFT size {fftSize} must be greater than number of FIR taps {self.numTaps}")
+        self.fftSize = fftSize
+        # number of new output samples per FFT
+        self.step = fftSize - self.numTaps + 1
+        self._firSpec = numpy.fft.rfft(self.fir, fftSize)
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Start a new record, keeping the FIR filter design
+        """
+        # [history of numTaps-1 input samples | up to step new samples]
+        self._segment = numpy.zeros(self.fftSize)
+        self._fill = 0
+        # output samples to discard to compensate for the FIR delay
+        self._skip = self.delay
+        self.numSamplesIn = 0
+        self.numSamplesOut = 0
+        # max abs amplitude of the output so far, to know the scale factor
+        self.maxAbs = 0.0
+
+    def _convolve(self, numValid: int) -> numpy.ndarray:
+        history = self.numTaps - 1
+        # zero the stale samples of a partially filled segment
+        self._segment[history + self._fill:] = 0.0
+        out = numpy.fft.irfft(numpy.fft.rfft(self._segment) * self._firSpec,
+                              self.fftSize)[history:history + numValid]
+        self._segment[:history] = self._segment[self.step:]
+        self._fill = 0
+        return out
+
+    def _feed(self, volts: numpy.ndarray) -> list:
+        history = self.numTaps - 1
+        outBlocks = []
+        pos = 0
+        while pos < volts.size:
+            n = min(self.step - self._fill, volts.size - pos)
+            self._segment[history + self._fill:history + self._fill + n] = volts[pos:pos + n]
+            self._fill += n
+            pos += n
+            if self._fill == self.step:
+                outBlocks.append(self._convolve(self.step))
+        return outBlocks
+
+    def _emit(self, outBlocks: list, limit: int) -> numpy.ndarray:
+        if not outBlocks:
+            return numpy.empty(0)
+        out = numpy.concatenate(outBlocks) if len(outBlocks) > 1 else outBlocks[0]
+        if self._skip > 0:
+            skip = min(self._skip, out.size)
+            out = out[skip:]
+            self._skip -= skip
+        out = out[:max(0, limit - self.numSamplesOut)]
+        self.numSamplesOut += out.size
+        if out.size > 0:
+            self.maxAbs = max(self.maxAbs, float(numpy.max(numpy.abs(out))))
+        return out
+
+    def process(self, volts: numpy.ndarray) -> numpy.ndarray:
+        """
+        Feed next block of the audio signal in Volts
+
+        :param volts: block of audio signal in Volts
+        :return: calibrated samples available so far (may be empty)
+        """
+        self.numSamplesIn += volts.size
+        return self._emit(self._feed(volts), self.numSamplesIn)
+
+    def flush(self) -> numpy.ndarray:
+        """
+        Finish the record - push the remaining samples through the filter
+
+        :return: the remaining calibrated samples
+        """
+        outBlocks = self._feed(numpy.zeros(self.delay))
+        if self._fill > 0:
+            outBlocks.append(self._convolve(self._fill))
+        return self._emit(outBlocks, self.numSamplesIn)
+
+
+def iterCalibrateRaw(binData: numpy.ndarray,
+                     transfer: calibration.CalibrationTransfer,
+                     meanCount: float = None,
+                     blockSize: int = STREAM_BLOCK_SIZE,
+                     calibrator: StreamingCalibrator = None) -> Iterator[numpy.ndarray]:
+    """
+    Calibrate raw audio data (eg numpy.memmap from rawdat.readRawFileMapped())
+    block by block, converting to Volts on the fly
+
+    :param binData: raw audio data
+    :param transfer: calibration transfer function
+    :param meanCount: mean of raw audio data (eg from qa.computeSignalQA()),
+                      computed if not provided
+    :param blockSize: number of raw samples converted at once
+    :param calibrator: streaming calibrator to use (reusable FIR design),
+                       a new one is made if not provided
+    :return: iterator of blocks of calibrated audio signal
+    """
+    if meanCount is None:
+        meanCount = float(numpy.mean(binData, dtype=numpy.float64))
+    if calibrator is None:
+        calibrator = StreamingCalibrator(transfer)
+
+    for blockStart in range(0, binData.size, blockSize):
+        volts = calibration.toVolts(binData[blockStart:blockStart + blockSize], meanCount)
+        out = calibrator.process(volts)
+        if out.size > 0:
+            yield out
+    out = calibrator.flush()
+    if out.size > 0:
+        yield out
+
+
+def calibrateChunked(volts: numpy.ndarray,
+                     transfer: calibration.CalibrationTransfer,
+                     blockSize: int = STREAM_BLOCK_SIZE) -> numpy.ndarray:
+    """
+    Calibrate audio signal in blocks, equivalent of calibrateReal()
+    within STREAM_REL_TOLERANCE (excluding record edges).
+    The whole calibrated signal is returned, see calibrateRawToFile()
+    for bounded memory.
+
+    :param volts: audio data/signal in Volts
+    :param transfer: calibration transfer function
+    :param blockSize: number of samples fed into the calibrator at once
+    :return: calibrated audio signal
+    """
+    if numpy.isnan(volts).any():
+        logMsg = "Audio signal in volts contains NaN value(s)"
+        log.error(logMsg)
+        raise calibration.IMOSAcousticCalibException(logMsg)
+
+    calibrator = StreamingCalibrator(transfer)
+    calibratedSignal = numpy.empty(volts.size)
+    pos = 0
+    for blockStart in range(0, volts.size, blockSize):
+        out = calibrator.process(volts[blockStart:blockStart + blockSize])
+        calibratedSignal[pos:pos + out.size] = out
+        pos += out.size
+    out = calibrator.flush()
+    calibratedSignal[pos:pos + out.size] = out
+
+    return calibratedSignal
+
+
+def _iterSignal(binData: numpy.ndarray, calibrator: StreamingCalibrator,
+                meanCount: float, blockSize: int) -> Iterator[numpy.ndarray]:
+    # blocks of the signal in Volts, calibrated unless calibrator is None
+    if calibrator is None:
+        for blockStart in range(0, binData.size, blockSize):
+            yield calibration.toVolts(binData[blockStart:blockStart + blockSize], meanCount)
+    else:
+        calibrator.reset()
+        yield from iterCalibrateRaw(binData, None, meanCount, blockSize, calibrator)
+
+
+@profiling.timed('streamcalib.calibrateToFile')
+def calibrateRawToFile(binData: numpy.ndarray,
+                       transfer: calibration.CalibrationTransfer,
+                       fileName: str,
+                       metadata: audiofile.MetadataFull,
+                       fileFormat: str = 'WAV',
+                       meanCount: float = None,
+                       scaleFactor: float = None,
+                       blockSize: int = STREAM_BLOCK_SIZE) -> float:
+    """
+    Calibrate raw audio data (eg numpy.memmap from rawdat.RawDatRecord)
+    block by block and write each block into the audio file, so the
+    calibrated signal is never held in memory as a whole.
+
+    The metadata (incl. the scale factor) is written before the audio
+    data, so unless scaleFactor is given, the record is calibrated twice -
+    the first pass only finds the max abs amplitude. Samples beyond
+    the given scale factor are clipped.
+
+    :param binData: raw audio data
+    :param transfer: calibration transfer function, None means
+                     no calibration (the signal in Volts is written)
+    :param fileName: output audio file name
+    :param metadata: metadata of the output file, durationFile and
+                     scaleFactor are filled in here
+    :param fileFormat: 'WAV' or 'FLAC'
+    :param meanCount: mean of raw audio data (eg from qa.computeSignalQA()),
+                      computed if not provided
+    :param scaleFactor: scale factor normalising the signal into -1..1,
+                        None means computed in a first pass
+    :param blockSize: number of raw samples processed at once
+    :return: the scale factor
+    """
+    if meanCount is None:
+        meanCount = float(numpy.mean(binData, dtype=numpy.float64))
+    calibrator = StreamingCalibrator(transfer) if transfer is not None else None
+
+    if scaleFactor is None:
+        maxAbs = 0.0
+        for block in _iterSignal(binData, calibrator, meanCount, blockSize):
+            maxAbs = max(maxAbs, float(calibration.maxAbsOf(block)))
+        scaleFactor = calibration.scaleFactorOf(None, maxAbs)
+        log.info(f"Scale factor to reconstruct normalised signal is: {scaleFactor}")
+
+    metadata.scaleFactor = scaleFactor
+    metadata.durationFile = binData.size / metadata.sampleRate
+
+    numClipped = 0
+    sf = audiofile.openMono16bit(fileName, metadata, fileFormat)
+    try:
+        with sf:
+            for block in _iterSignal(binData, calibrator, meanCount, blockSize):
+                block /= scaleFactor
+                numClipped += int(numpy.count_nonzero(numpy.abs(block) > 1.0))
+                sf.write(numpy.clip(block, -1.0, 1.0, out=block))
+    except (IOError, OSError, soundfile.LibsndfileError) as e:
+        logMsg = f"Error writing audio file {fileName}"
+        log.error(logMsg + f"\nException {e}")
+        raise audiofile.IMOSAcousticAudioFileException(logMsg)
+
+    if numClipped > 0:
+        log.warning(f"{numClipped} samples clipped by scale factor {scaleFactor} in {fileName}")
+    log.info(f"Written {fileName} with meta data.")
+    return scaleFactor
@@ -0,0 +1,231 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import os
+import numpy
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Final
+
+from . import rawdat
+
+log = logging.getLogger('IMOSPATools')
+
+# mid-scale of the unsigned 16-bit A/D converter
+MID_SCALE_COUNT: Final[int] = 1 << (rawdat.BITS_PER_SAMPLE - 1)
+# delays observed in the real records: first data after the schedule time,
+# finalised after the last sample
+FIRST_DATA_DELAY: Final[float] = 0.015
+FINALISED_DELAY: Final[float] = 0.2
+# extra samples beyond the nominal duration, as in the real records
+# (the logger keeps recording until the data block is written)
+DEFAULT_TAIL_SECONDS: Final[float] = 7.0
+CALIB_FILE_DIR: Final[str] = 'Calib_file'
+CALIB_PARAMS_FILE_NAME: Final[str] = 'Calib_data.TXT'
+
+
+def formatRawTime(dateTime: datetime) -> str:
+    """
+    Format time as in RAW file header/footer, eg '2016/11/30 09:00:00 - 34676'
+    (sub-seconds in 1/65536 s)
+
+    :param dateTime: time to format
+    :return: time string
+    """
+    subSeconds = min(int(round(dateTime.microsecond / 1e6 * (1 << 16))), (1 << 16) - 1)
+    return f"{dateTime.strftime('%Y/%m/%d %H:%M:%S')} - {subSeconds:05d}"
+
+
+def makeRawHeader(schedule: datetime, sampleRate: int = 6000, duration: int = 300,
+                  recordHeader: str = 'SYNTH', setID: int = None,
+                  lowFreq: int = 8, highFreq: int = 2800,
+                  pGain: int = 10, gain: int = 1) -> bytes:
+    """
+    Make RAW file header (5 lines) of a single channel record
+
+    :param schedule: schedule time of the record
+    :param sampleRate: sampling rate
+    :param duration: nominal duration of the record in seconds
+    :param recordHeader: text of the 'Record Header' line, eg deployment name
+    :param setID: data set ID included in the header, None means not included
+    :param lowFreq: low frequency of the filter
+    :param highFreq: high frequency of the filter
+    :param pGain: pre-amplifier gain
+    :param gain: gain
+    :return: header as bytes
+    """
+    if setID is not None:
+        recordHeader += f" set# {setID}"
+    lines = [f"Record Header-       {recordHeader}",
+             f"Schedule 1 {formatRawTime(schedule)}",
+             f"Sample Rate {sampleRate:05d} Duration {duration:010d}",
+             f"Filter 0 C0=1 C1=0 LF={lowFreq:03d} HF={highFreq:05d} PG={pGain:03d} G={gain:03d}",
+             f"Filter 1 C2=0 C3=0 LF={lowFreq:03d} HF={highFreq:05d} PG={pGain:03d} G={gain:03d}"]
+    return ''.join(line + '\n' for line in lines).encode('ascii')
+
+
+def makeRawFooter(startTime: datetime, endTime: datetime,
+                  numLines: int = 6, dataValidity: str = 'data is ok',
+                  dataBlockSize: int = 65536) -> bytes:
+    """
+    Make RAW file footer, 4 lines (older loggers) or 6 lines (newer loggers)
+
+    :param startTime: time of the first data
+    :param endTime: time the record was finalised
+    :param numLines: 4 or 6
+    :param dataValidity: text of the 'Data Validity' line
+    :param dataBlockSize: data block size in the 6 line footer
+    :return: footer as bytes (incl. the new line preceding it)
+    """
+    if numLines not in (4, 6):
+        raise ValueError(f"Footer has 4 or 6 lines, not {numLines}")
+    lines = ["Record Marker",
+             f"First Data-{formatRawTime(startTime)}",
+             f"Finalised -{formatRawTime(endTime)}",
+             f"Data Validity - {dataValidity} "]
+    if numLines == 6:
+        lines += ["Data to RAM = 0",
+                  f"Data block size = {dataBlockSize:07d}"]
+    # the footer is preceded by a new line character after the samples
+    return ('\n' + ''.join(line + '\n' for line in lines)).encode('ascii')
+
+
+def synthesizeSignal(numSamples: int, sampleRate: int, seed: int = 0,
+                     noiseAmplitude: float = 200.0, toneFreq: float = 100.0,
+                     toneAmplitude: float = 1000.0) -> numpy.ndarray:
+    """
+    Synthesize raw audio data - white noise plus a tone around mid-scale
+
+    :param numSamples: number of samples
+    :param sampleRate: sampling rate
+    :param seed: seed of the random generator
+    :param noiseAmplitude: standard deviation of the noise in A/D counts
+    :param toneFreq: frequency of the tone in Hz
+    :param toneAmplitude: amplitude of the tone in A/D counts, 0 means no tone
+    :return: raw audio data as numpy array of big-endian uint16
+    """
+    rng = numpy.random.default_rng(seed)
+    signal = rng.normal(MID_SCALE_COUNT, noiseAmplitude, numSamples)
+    if toneAmplitude != 0.0:
+        signal += toneAmplitude * numpy.sin(2 * numpy.pi * toneFreq / sampleRate * numpy.arange(numSamples))
+    numpy.clip(numpy.round(signal, out=signal), 0, (1 << rawdat.BITS_PER_SAMPLE) - 1, out=signal)
+    return signal.astype(rawdat.IMOS_DAT_FILE_DTYPE)
+
+
+def writeRawFile(fileName: str, schedule: datetime,
+                 sampleRate: int = 6000, duration: int = 300,
+                 tailSeconds: float = DEFAULT_TAIL_SECONDS,
+                 setID: int = None, footerLines: int = 6,
+                 recordHeader: str = 'SYNTH', binData: numpy.ndarray = None,
+                 seed: int = 0) -> int:
+    """
+    Write a synthetic RAW (.DAT) file in the format read by rawdat
+
+    :param fileName: file name of the RAW file
+    :param schedule: schedule time of the record
+    :param sampleRate: sampling rate
+    :param duration: nominal duration of the record in seconds (header)
+    :param tailSeconds: duration of the samples beyond the nominal duration
+    :param setID: data set ID included in the header, None means not included
+    :param footerLines: 4 or 6 line footer
+    :param recordHeader: text of the 'Record Header' line
+    :param binData: raw audio data to write (big-endian uint16),
+                    synthesized by synthesizeSignal() if not provided
+    :param seed: seed of the synthesized signal
+    :return: number of samples written
+    """
+    if binData is None:
+        numSamples = int(round((duration + tailSeconds) * sampleRate))
+        binData = synthesizeSignal(numSamples, sampleRate, seed)
+    startTime = schedule + timedelta(seconds=FIRST_DATA_DELAY)
+    endTime = startTime + timedelta(seconds=binData.size / sampleRate + FINALISED_DELAY)
+
+    with open(fileName, 'wb') as file:
+        file.write(makeRawHeader(schedule, sampleRate, duration, recordHeader, setID))
+        file.write(binData.astype(rawdat.IMOS_DAT_FILE_DTYPE, copy=False).tobytes())
+        file.write(makeRawFooter(startTime, endTime, footerLines))
+    log.debug(f"Written synthetic RAW file {fileName} with {binData.size} samples")
+    return binData.size
+
+
+def rawFileNameFor(schedule: datetime) -> str:
+    """
+    RAW file name as made by the logger - hex of the unix time of the record
+
+    :param schedule: schedule time of the record
+    :return: file name, eg 502DB01D.DAT
+    """
+    unixTime = int(schedule.replace(tzinfo=timezone.utc).timestamp())
+    return f"{unixTime:08X}.DAT"
+
+
+def writeCalibration(deploymentDir: str, schedule: datetime,
+                     sampleRate: int = 6000, duration: int = 300,
+                     cnl: float = -90.0, hs: float = -196.0, setID: int = 0,
+                     footerLines: int = 6, seed: int = 1) -> str:
+    """
+    Write a synthetic calibration file (white noise record) into
+    the Calib_file sub-directory of the deployment, along with
+    the calibration parameters (Calib_data.TXT)
+
+    :param deploymentDir: directory of the deployment
+    :param schedule: schedule time of the calibration record
+    :param sampleRate: sampling rate
+    :param duration: nominal duration of the record in seconds
+    :param cnl: calibration noise level (dB re V^2/Hz)
+    :param hs: hydrophone sensitivity (dB re V/uPa)
+    :param setID: data set ID
+    :param footerLines: 4 or 6 line footer
+    :param seed: seed of the synthesized signal
+    :return: calibration file name
+    """
+    calibDir = os.path.join(deploymentDir, CALIB_FILE_DIR)
+    os.makedirs(calibDir, exist_ok=True)
+    numSamples = int(round((duration + DEFAULT_TAIL_SECONDS) * sampleRate))
+    binData = synthesizeSignal(numSamples, sampleRate, seed, noiseAmplitude=2000.0, toneAmplitude=0.0)
+    calibFileName = os.path.join(calibDir, rawFileNameFor(schedule))
+    writeRawFile(calibFileName, schedule, sampleRate, duration, footerLines=footerLines,
+                 binData=binData)
+    with open(os.path.join(calibDir, CALIB_PARAMS_FILE_NAME), 'w') as file:
+        file.write(f"Cal level: {cnl:g} dB\nHydrophone sensitivity: {hs:g}\nSet ID: {setID}\n")
+    return calibFileName
+
+
+def writeDeployment(deploymentDir: str, numFiles: int, startTime: datetime,
+                    interval: float = 900.0, sampleRate: int = 6000,
+                    duration: int = 300, tailSeconds: float = DEFAULT_TAIL_SECONDS,
+                    setID: int = None, footerLines: int = 6,
+                    cnl: float = -90.0, hs: float = -196.0,
+                    seed: int = 0) -> list[str]:
+    """
+    Write a synthetic deployment - numFiles RAW files scheduled every
+    interval seconds, and the calibration file recorded before them
+
+    :param deploymentDir: directory of the deployment, created if needed
+    :param numFiles: number of RAW files
+    :param startTime: schedule time of the first record
+    :param interval: seconds between the schedule times of the records
+    :param sampleRate: sampling rate
+    :param duration: nominal duration of the records in seconds
+    :param tailSeconds: duration of the samples beyond the nominal duration
+    :param setID: data set ID included in the headers, None means not included
+    :param footerLines: 4 or 6 line footers
+    :param cnl: calibration noise level written into Calib_data.TXT
+    :param hs: hydrophone sensitivity written into Calib_data.TXT
+    :param seed: seed of the synthesized signals, each file gets seed + index
+    :return: list of the RAW file names (without the calibration file)
+    """
+    os.makedirs(deploymentDir, exist_ok=True)
+    recordHeader = os.path.basename(os.path.normpath(deploymentDir)) or 'SYNTH'
+    writeCalibration(deploymentDir, startTime - timedelta(days=1), sampleRate, duration,
+                     cnl, hs, setID if setID is not None else 0, footerLines)
+
+    fileNames = []
+    for i in range(numFiles):
+        schedule = startTime + timedelta(seconds=i * interval)
+        fileName = os.path.join(deploymentDir, rawFileNameFor(schedule))
+        writeRawFile(fileName, schedule, sampleRate, duration, tailSeconds,
+                     setID, footerLines, recordHeader, seed=seed + i)
+        fileNames.append(fileName)
+    log.info(f"Written synthetic deployment {deploymentDir} with {numFiles} files")
+    return fileNames
@@ -0,0 +1,194 @@
+# This is needed for python 3.8 - 3.9+ is okay
+from __future__ import annotations
+
+import numpy
+import logging
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from typing import Final
+
+from . import rawdat
+from . import calibration
+from . import audiofile
+
+log = logging.getLogger('IMOSPATools')
+
+# Extra audio read around the window on each side (within the record),
+# so the high-pass filter and the FFT calibration settle before the
+# window starts and the window edges match the whole record calibration.
+WINDOW_PAD_SECONDS: Final[float] = 2.0
+
+
+class IMOSAcousticTimeWindowException(Exception):
+    pass
+
+
+@dataclass
+class WindowSegment:
+    # part of one RAW record covering (part of) the time window
+    info: rawdat.RAWFileInfo
+    # first sample of the record in the window and number of samples
+    firstSample: int = 0
+    numSamples: int = 0
+    # position of the first sample in the stitched output
+    outputOffset: int = 0
+
+
+@dataclass
+class TimeWindow:
+    startTime: datetime
+    endTime: datetime
+    sampleRate: int = 0
+    # calibrated (or just converted to Volts) stitched audio signal,
+    # samples not covered by any record are zero
+    signal: numpy.ndarray = None
+    segments: list = field(default_factory=list)
+    # number of samples covered by the records
+    numCovered: int = 0
+
+
+def planWindow(infos: list[rawdat.RAWFileInfo],
+               startTime: datetime, endTime: datetime) -> list[WindowSegment]:
+    """
+    Work out which records and sample ranges cover the time window,
+    using only the header/footer information (rawdat.readRawFileInfo()
+    or catalogue.Catalogue.fileInfos()).
+    Sample i of a record is at footer startTime + i / sampleRate.
+    Where records overlap, the earlier record is used.
+
+    :param infos: header/footer information of the candidate records
+    :param startTime: window start (UTC)
+    :param endTime: window end (UTC)
+    :return: list of WindowSegment ordered by time
+    """
+    if endTime <= startTime:
+        logMsg = f"Time window end {endTime} is not after its start {startTime}"
+        log.error(logMsg)
+        raise IMOSAcousticTimeWindowException(logMsg)
+
+    segments = []
+    sampleRate = None
+    outputEnd = 0
+    for info in sorted(infos, key=lambda i: i.footer.startTime):
+        recordSeconds = info.numSamples / info.header.sampleRate
+        if info.footer.startTime >= endTime or \
+                info.footer.startTime + timedelta(seconds=recordSeconds) <= startTime:
+            continue
+        if sampleRate is None:
+            sampleRate = info.header.sampleRate
+            numOutput = int(round((endTime - startTime).total_seconds() * sampleRate))
+        elif info.header.sampleRate != sampleRate:
+            logMsg = f"Sample rate {info.header.sampleRate} of {info.fileName} " \
+                     f"differs from {sampleRate} of the other records in the window"
+            log.error(logMsg)
+            raise IMOSAcousticTimeWindowException(logMsg)
+
+        # output index of the first sample of the record
+        recordOffset = int(round((info.footer.startTime - startTime).total_seconds() * sampleRate))
+        first = max(0, -recordOffset, outputEnd - recordOffset)
+        last = min(info.numSamples, numOutput - recordOffset)
+        if last <= first:
+            continue
+        if recordOffset + first > outputEnd and segments:
+            log.info(f"Gap of {recordOffset + first - outputEnd} samples before {info.fileName}")
+        segments.append(WindowSegment(info, first, last - first, recordOffset + first))
+        outputEnd = recordOffset + last
+
+    return segments
+
+
+def readSegmentVolts(segment: WindowSegment,
+                     padSamples: int = 0,
+                     dtype: numpy.dtype = numpy.float64) -> (numpy.ndarray, int):
+    """
+    Read the samples of the segment (plus padding within the record)
+    and convert them to Volts
+
+    :param segment: segment of the record
+    :param padSamples: number of extra samples read on each side
+    :param dtype: numpy.float64 or numpy.float32
+    :return: audio signal in Volts
+    :return: number of padding samples before the segment
+    """
+    first = max(0, segment.firstSample - padSamples)
+    last = min(segment.info.numSamples, segment.firstSample + segment.numSamples + padSamples)
+    binData = rawdat.readRawSampleRange(segment.info, first, last - first)
+    return calibration.toVolts(binData, dtype=dtype), segment.firstSample - first
+
+
+def extractWindow(infos: list[rawdat.RAWFileInfo],
+                  startTime: datetime, endTime: datetime,
+                  transfer: calibration.CalibrationTransfer = None,
+                  padSeconds: float = WINDOW_PAD_SECONDS,
+                  dtype: numpy.dtype = numpy.float64) -> TimeWindow:
+    """
+    Extract calibrated audio of the time window across records.
+    Only the sample ranges covering the window (plus padSeconds) are read.
+    The DC offset is removed using the mean of the read samples, not
+    of the whole record - it is removed by the high-pass filter anyway.
+
+    :param infos: header/footer information of the candidate records
+    :param startTime: window start (UTC)
+    :param endTime: window end (UTC)
+    :param transfer: calibration transfer function, None means no calibration
+    :param padSeconds: extra audio read around the window within each record
+    :param dtype: numpy.float64 or numpy.float32 (single precision calibration)
+    :return: TimeWindow - stitched audio signal and the segments used
+    """
+    segments = planWindow(infos, startTime, endTime)
+    if not segments:
+        logMsg = f"No records cover the time window {startTime} - {endTime}"
+        log.error(logMsg)
+        raise IMOSAcousticTimeWindowException(logMsg)
+
+    sampleRate = segments[0].info.header.sampleRate
+    if transfer is not None and sampleRate != transfer.fSample:
+        raise calibration.IMOSAcousticCalibException(
+            "Sample rate is different between the audio record and calibration file.")
+
+    window = TimeWindow(startTime, endTime, sampleRate, segments=segments)
+    window.signal = numpy.zeros(int(round((endTime - startTime).total_seconds() * sampleRate)), dtype=dtype)
+    padSamples = int(padSeconds * sampleRate)
+    for segment in segments:
+        volts, offset = readSegmentVolts(segment, padSamples, dtype)
+        if transfer is not None:
+            volts = transfer.calibrateReal(volts, dtype)
+        window.signal[segment.outputOffset:segment.outputOffset + segment.numSamples] = \
+            volts[offset:offset + segment.numSamples]
+        window.numCovered += segment.numSamples
+        log.debug(f"Window samples {segment.outputOffset}+{segment.numSamples} "
+                  f"from {segment.info.fileName} sample {segment.firstSample}")
+
+    if window.numCovered < window.signal.size:
+        log.warning(f"{window.signal.size - window.numCovered} samples of the time window "
+                    f"{startTime} - {endTime} are not covered by any record")
+    return window
+
+
+def windowMetadata(window: TimeWindow, setID: int = 0,
+                   cnl: float = None, hs: float = None) -> audiofile.MetadataFull:
+    """
+    Metadata of the extracted time window for the output audio file
+
+    :param window: extracted time window
+    :param setID: data set ID
+    :param cnl: calibration noise level, None if not calibrated
+    :param hs: hydrophone sensitivity, None if not calibrated
+    :return: MetadataFull
+    """
+    durationWindow = (window.endTime - window.startTime).total_seconds()
+    metadata = audiofile.MetadataFull(
+        setID=setID,
+        schedule=window.segments[0].info.header.schedule,
+        numChannels=1,
+        sampleRate=window.sampleRate,
+        durationHeader=durationWindow,
+        durationFile=window.signal.size / window.sampleRate,
+        startTime=window.startTime,
+        endTime=window.endTime,
+    )
+    if cnl is not None:
+        metadata.calibNoiseLevel = cnl
+    if hs is not None:
+        metadata.hydrophoneSensitivity = hs
+    return metadata
@@ -5,6 +5,7 @@ from datetime import datetime, timezone
 from dataclasses import dataclass, asdict
 
 from . import rawdat
+from . import profiling
 
 log = logging.getLogger('IMOSPATools')
 
@@ -38,6 +39,7 @@ def deriveWavFileName(rawFileName: str) -> str:
     return wavFileName
 
 
+@profiling.timed('wav.quantise')
 def scaleSignalFloatTo16bitPCM(signal: numpy.ndarray) -> numpy.ndarray:
     bitsPerSample = 16
     signalMin = numpy.min(signal)
@@ -57,6 +59,7 @@ def scaleSignalFloatTo16bitPCM(signal: numpy.ndarray) -> numpy.ndarray:
     return scaledSignalInt16
 
 
+@profiling.timed('wav.write')
 def writeMono16bit(wavFileName: str,
                    sampleRate: float,
                    binData: numpy.ndarray):
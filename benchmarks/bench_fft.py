@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+import json
+import logging
+import numpy
+import scipy
+
+from IMOSPATools import calibration
+from bench_pipeline import DEPLOYMENTS, measure, environment
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+# record lengths (number of samples) of the bundled test records,
+# a prime length and a 2-3-5 smooth length for reference
+DEFAULT_LENGTHS = [1842224, 1842318, 2045960, 1842011, 1800000]
+# (name, FFT workers, zero-pad to fast length)
+BACKENDS = [('numpy', 1, False),
+            ('fastLength', 1, True),
+            ('fastLength+workers', -1, True)]
+
+
+def parseArgs():
+    descText = "Benchmark of the calibration FFT on awkward record lengths, results as JSON."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    parser.add_argument('--data', '-D', default='tests/data',
+                        help='Directory with the bundled test deployments')
+    parser.add_argument('--deployment', '-p', choices=sorted(DEPLOYMENTS), default='Rottnest_3154',
+                        help='Deployment the calibration file is taken from (default Rottnest_3154)')
+    parser.add_argument('--lengths', '-l', type=int, nargs='+', default=DEFAULT_LENGTHS,
+                        help='Record lengths in samples (default lengths of the bundled records, '
+                             'a prime and a smooth length)')
+    parser.add_argument('--workers', '-w', type=int, default=-1,
+                        help='FFT threads of the fastLength+workers backend (default -1, all CPU cores)')
+    parser.add_argument('--repeat', '-r', type=int, default=3,
+                        help='Number of repetitions, the fastest one is reported (default 3)')
+    parser.add_argument('--output', '-o',
+                        help='JSON output file (default stdout)')
+    args = parser.parse_args()
+    return args
+
+
+def largestPrimeFactor(n: int) -> int:
+    largest = 1
+    factor = 2
+    while factor * factor <= n:
+        while n % factor == 0:
+            largest = factor
+            n //= factor
+        factor += 1
+    return max(largest, n) if n > 1 else largest
+
+
+def benchmarkLength(transfer: calibration.CalibrationTransfer, numSamples: int,
+                    backends: list, repeat: int) -> list:
+    """
+    Benchmark the FFT round trip and calibrateReal() of one record length
+
+    :return: list of dicts, one per backend and stage
+    """
+    volts = numpy.random.default_rng(0).normal(0.0, 0.01, numSamples)
+    results = []
+    for name, workers, fastLength in backends:
+        calibration.setFFTBackend(workers, fastLength)
+        numFFT = calibration.fftLength(numSamples)
+        # prepare the correction of the FFT length outside of the timing
+        transfer.correction(numFFT)
+        stages = {'rfft+irfft': lambda: calibration.irfft(calibration.rfft(volts, numFFT), numFFT),
+                  'calibrateReal': lambda: transfer.calibrateReal(volts)}
+        for stage, func in stages.items():
+            seconds, peakBytes, _ = measure(func, repeat)
+            results.append({'numSamples': numSamples,
+                            'largestPrimeFactor': largestPrimeFactor(numSamples),
+                            'backend': name,
+                            'fftLength': numFFT,
+                            'stage': stage,
+                            'seconds': seconds,
+                            'peakBytes': int(peakBytes)})
+            log.info(f"{numSamples} {name} {stage}: {seconds:.3f}s")
+    calibration.setFFTBackend()
+    return results
+
+
+def summarise(results: list) -> str:
+    """
+    Speedup of the backends relative to numpy.fft of the same length and stage
+    """
+    baseline = {(r['numSamples'], r['stage']): r['seconds'] for r in results if r['backend'] == 'numpy'}
+    lines = [f"{'samples':>9s} {'prime':>6s} {'stage':14s} {'backend':20s} {'seconds':>8s} {'speedup':>8s}"]
+    for r in results:
+        speedup = baseline[(r['numSamples'], r['stage'])] / r['seconds']
+        lines.append(f"{r['numSamples']:9d} {r['largestPrimeFactor']:6d} {r['stage']:14s} "
+                     f"{r['backend']:20s} {r['seconds']:8.3f} {speedup:8.2f}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.WARNING
+
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    rawName, calibName, cnl, hs = DEPLOYMENTS[args.deployment]
+    calibFileName = os.path.join(args.data, args.deployment, calibName)
+    if not os.path.exists(calibFileName):
+        log.error(f"Deployment {args.deployment} not found in {args.data}")
+        sys.exit(-1)
+    transfer = calibration.CalibrationTransfer(*calibration.loadPrepCalibFile(calibFileName, cnl, hs),
+                                               maxCachedLengths=2 * len(args.lengths))
+
+    backends = [(name, args.workers if workers != 1 else 1, fastLength)
+                for name, workers, fastLength in BACKENDS]
+    report = {'environment': environment(),
+              'repeat': args.repeat,
+              'results': []}
+    for numSamples in args.lengths:
+        report['results'] += benchmarkLength(transfer, numSamples, backends, args.repeat)
+
+    reportJson = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            file.write(reportJson + '\n')
+    else:
+        print(reportJson)
+    print(summarise(report['results']), file=sys.stderr)
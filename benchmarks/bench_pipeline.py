@@ -0,0 +1,284 @@
+import argparse
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+import numpy
+import scipy
+import soundfile
+
+import IMOSPATools
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import audiofile
+from IMOSPATools import wav
+from IMOSPATools import synthetic
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+# (raw record, calibration file, cnl, hs) of the bundled test deployments
+DEPLOYMENTS = {
+    'KI_3501': ('583E9500.DAT', 'Calib_file/5809C515.DAT', -90.0, -198.1),
+    'Portland_3092': ('4F480851.DAT', 'Calib_file/4FEACA92.DAT', -90.0, -197.5),
+    'Rottnest_3154': ('502DB01D.DAT', 'Calib_file/501E9BF5.DAT', -90.0, -197.8),
+}
+STAGES = ['readRawFile', 'loadPrepCalibFile', 'calibrate', 'calibrateReal', 'scale',
+          'wav.writeMono16bit', 'audiofile.writeMono16bit.WAV', 'audiofile.writeMono16bit.FLAC']
+
+
+def parseArgs():
+    descText = "Benchmark of the read -> calibrate -> write pipeline, results as JSON."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    parser.add_argument('--data', '-D', default='tests/data',
+                        help='Directory with the bundled test deployments')
+    parser.add_argument('--deployment', '-p', choices=sorted(DEPLOYMENTS), default='Rottnest_3154',
+                        help='Deployment the records are made from (default Rottnest_3154)')
+    parser.add_argument('--durations', '-t', type=float, nargs='+', default=[10.0, 300.0, 3600.0],
+                        help='Record durations in seconds, made by tiling the bundled record '
+                             '(default 10 300 3600), 0 means the bundled record as is')
+    parser.add_argument('--synthetic', action='store_true',
+                        help='Use synthetic records and calibration file (IMOSPATools.synthetic) '
+                             'instead of the bundled deployment')
+    parser.add_argument('--stages', '-s', nargs='+', choices=STAGES, default=STAGES,
+                        help='Stages to benchmark (default all)')
+    parser.add_argument('--repeat', '-r', type=int, default=3,
+                        help='Number of repetitions, the fastest one is reported (default 3)')
+    parser.add_argument('--output', '-o',
+                        help='JSON output file (default stdout)')
+    parser.add_argument('--compare', '-c',
+                        help='JSON output of a previous run (eg previous release) to compare with')
+    args = parser.parse_args()
+    return args
+
+
+def makeRawFile(templateFileName: str, outputFileName: str, durationSeconds: float) -> int:
+    """
+    Make a RAW file of the given duration by tiling the samples
+    of a bundled record, with the header and footer of the record
+
+    :param templateFileName: bundled RAW (.DAT) file
+    :param outputFileName: RAW (.DAT) file to make
+    :param durationSeconds: duration of the record, 0 means a copy of the template
+    :return: number of samples of the record
+    """
+    if durationSeconds <= 0:
+        shutil.copyfile(templateFileName, outputFileName)
+        return rawdat.readRawFileInfo(outputFileName).numSamples
+
+    info = rawdat.readRawFileInfo(templateFileName)
+    numSamples = int(durationSeconds * info.header.sampleRate)
+    template = rawdat.readRawSampleRange(info, 0, info.numSamples)
+    with open(templateFileName, 'rb') as file:
+        header = file.read(info.dataOffset)
+        file.seek(info.footerOffset - 1)
+        footer = file.read()
+    with open(outputFileName, 'wb') as file:
+        file.write(header)
+        for blockStart in range(0, numSamples, template.size):
+            file.write(template[:min(template.size, numSamples - blockStart)].tobytes())
+        file.write(footer)
+    return numSamples
+
+
+def measure(func, repeat: int) -> (float, int, object):
+    """
+    Run the function repeatedly, measure the fastest wall clock time
+    and the peak of memory allocated by python and numpy
+
+    :param func: function to run, without parameters
+    :param repeat: number of repetitions
+    :return: time in seconds, peak memory in bytes, result of the function
+    """
+    seconds = None
+    peakBytes = 0
+    result = None
+    for _ in range(max(1, repeat)):
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        timeStart = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - timeStart
+        peakBytes = max(peakBytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds, peakBytes, result
+
+
+def benchmarkRecord(rawFileName: str, calibFileName: str, cnl: float, hs: float,
+                    stages: list, repeat: int, outputDir: str) -> list:
+    """
+    Benchmark the pipeline stages on one record
+
+    :return: list of dicts, one per stage
+    """
+    results = []
+
+    def report(stage, numSamples, seconds, peakBytes):
+        results.append({'stage': stage,
+                        'numSamples': int(numSamples),
+                        'seconds': seconds,
+                        'samplesPerSecond': numSamples / seconds if seconds > 0 else None,
+                        'peakBytes': int(peakBytes)})
+        log.info(f"{stage}: {numSamples} samples in {seconds:.3f}s")
+
+    # the output of each stage is the input of the next one, it is
+    # computed (not timed) when the stage itself is not benchmarked
+    seconds, peakBytes, raw = measure(lambda: rawdat.readRawFile(rawFileName),
+                                      repeat if 'readRawFile' in stages else 1)
+    binData, numChannels, sampleRate, durationHeader, startTime, endTime, scheduleTime = raw
+    numSamples = binData.size
+    if 'readRawFile' in stages:
+        report('readRawFile', numSamples, seconds, peakBytes)
+
+    seconds, peakBytes, prep = measure(lambda: calibration.loadPrepCalibFile(calibFileName, cnl, hs),
+                                       repeat if 'loadPrepCalibFile' in stages else 1)
+    calSpec, calFreq, calSampleRate = prep
+    if 'loadPrepCalibFile' in stages:
+        # the calibration file is processed, not the record
+        report('loadPrepCalibFile', rawdat.readRawFileInfo(calibFileName).numSamples, seconds, peakBytes)
+
+    volts = calibration.toVolts(binData)
+    calibratedSignal = None
+    if 'calibrate' in stages:
+        seconds, peakBytes, calibratedSignal = measure(
+            lambda: calibration.calibrate(volts, cnl, hs, calSpec, calFreq, sampleRate), repeat)
+        report('calibrate', numSamples, seconds, peakBytes)
+    if 'calibrateReal' in stages or calibratedSignal is None:
+        calibratedSignal = None
+        seconds, peakBytes, calibratedSignal = measure(
+            lambda: calibration.calibrateReal(volts, cnl, hs, calSpec, calFreq, sampleRate),
+            repeat if 'calibrateReal' in stages else 1)
+        if 'calibrateReal' in stages:
+            report('calibrateReal', numSamples, seconds, peakBytes)
+
+    seconds, peakBytes, scaled = measure(lambda: calibration.scale(calibratedSignal),
+                                         repeat if 'scale' in stages else 1)
+    scaledSignal, scaleFactor = scaled
+    if 'scale' in stages:
+        report('scale', numSamples, seconds, peakBytes)
+
+    metadata = audiofile.MetadataFull(setID=0, schedule=scheduleTime, numChannels=numChannels,
+                                      sampleRate=sampleRate, durationHeader=durationHeader,
+                                      startTime=startTime, endTime=endTime,
+                                      calibNoiseLevel=cnl, hydrophoneSensitivity=hs,
+                                      scaleFactor=scaleFactor)
+
+    if 'wav.writeMono16bit' in stages:
+        outputFileName = os.path.join(outputDir, 'bench_wave.wav')
+        seconds, peakBytes, _ = measure(
+            lambda: wav.writeMono16bit(outputFileName, sampleRate, wav.scaleSignalFloatTo16bitPCM(scaledSignal)),
+            repeat)
+        report('wav.writeMono16bit', numSamples, seconds, peakBytes)
+    for fileFormat in ['WAV', 'FLAC']:
+        stage = 'audiofile.writeMono16bit.' + fileFormat
+        if stage in stages:
+            outputFileName = os.path.join(outputDir, 'bench_audiofile.' + fileFormat.lower())
+            seconds, peakBytes, _ = measure(
+                lambda: audiofile.writeMono16bit(outputFileName, scaledSignal, metadata, fileFormat),
+                repeat)
+            report(stage, numSamples, seconds, peakBytes)
+
+    return results
+
+
+def compareReports(baseline: dict, report: dict) -> str:
+    """
+    Compare throughput of two benchmark reports
+
+    :param baseline: previous benchmark report
+    :param report: current benchmark report
+    :return: comparison table as text, ratio > 1 means faster than baseline
+    """
+    previous = {(r['recordSeconds'], r['stage']): r for r in baseline['results']}
+    lines = [f"{'record [s]':>10s} {'stage':32s} {'samples/s':>12s} {'baseline':>12s} {'ratio':>6s} "
+             f"{'peak MB':>8s} {'baseline':>8s}"]
+    for r in report['results']:
+        b = previous.get((r['recordSeconds'], r['stage']))
+        if b is None or not b['samplesPerSecond'] or not r['samplesPerSecond']:
+            continue
+        lines.append(f"{r['recordSeconds']:10.0f} {r['stage']:32s} {r['samplesPerSecond']:12.4g} "
+                     f"{b['samplesPerSecond']:12.4g} {r['samplesPerSecond'] / b['samplesPerSecond']:6.2f} "
+                     f"{r['peakBytes'] / 1e6:8.1f} {b['peakBytes'] / 1e6:8.1f}")
+    return '\n'.join(lines)
+
+
+def environment() -> dict:
+    return {'IMOSPATools': IMOSPATools.__version__,
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'scipy': scipy.__version__,
+            'soundfile': soundfile.__version__,
+            'libsndfile': soundfile.__libsndfile_version__,
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'processor': platform.processor(),
+            'cpuCount': os.cpu_count()}
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.WARNING
+
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    rawName, calibName, cnl, hs = DEPLOYMENTS[args.deployment]
+    deploymentDir = os.path.join(args.data, args.deployment)
+    templateFileName = os.path.join(deploymentDir, rawName)
+    calibFileName = os.path.join(deploymentDir, calibName)
+    if not args.synthetic and (not os.path.exists(templateFileName) or not os.path.exists(calibFileName)):
+        log.error(f"Deployment {args.deployment} not found in {args.data}")
+        sys.exit(-1)
+
+    report = {'environment': environment(),
+              'deployment': 'synthetic' if args.synthetic else args.deployment,
+              'repeat': args.repeat,
+              'results': []}
+    with tempfile.TemporaryDirectory() as tmpDir:
+        schedule = datetime(2020, 1, 1)
+        if args.synthetic:
+            calibFileName = synthetic.writeCalibration(tmpDir, schedule, cnl=cnl, hs=hs)
+        for duration in args.durations:
+            rawFileName = os.path.join(tmpDir, 'bench.DAT')
+            if args.synthetic:
+                # 0 means the duration of a typical record
+                duration = duration if duration > 0 else 300.0 + synthetic.DEFAULT_TAIL_SECONDS
+                numSamples = synthetic.writeRawFile(rawFileName, schedule, duration=int(duration),
+                                                    tailSeconds=duration - int(duration))
+            else:
+                numSamples = makeRawFile(templateFileName, rawFileName, duration)
+            log.info(f"Benchmarking record of {duration}s, {numSamples} samples")
+            for result in benchmarkRecord(rawFileName, calibFileName, cnl, hs,
+                                          args.stages, args.repeat, tmpDir):
+                result['recordSeconds'] = duration
+                report['results'].append(result)
+
+    reportJson = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            file.write(reportJson + '\n')
+    else:
+        print(reportJson)
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+        print(compareReports(baseline, report), file=sys.stderr)
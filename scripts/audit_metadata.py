@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import logging
+
+from IMOSPATools import metatable
+
+log = logging.getLogger('IMOSPATools')
+
+
+def parseArgs():
+    descText = "Extract IMOS metadata of all the WAV and FLAC files under directory trees " \
+               "into a CSV table, reading only the file headers."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='Enable verbose mode')
+    parser.add_argument('--workers', '-w', type=int, default=8,
+                        help='Number of threads reading file headers (default 8)')
+    parser.add_argument('--output', '-o',
+                        help='CSV output file (default stdout)')
+    parser.add_argument('--errors', '-e', action='store_true',
+                        help='Output only the files without valid IMOS metadata')
+    parser.add_argument('paths', nargs='+',
+                        help='Directory trees or WAV/FLAC files')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.ERROR
+
+    if args.verbose:
+        logLevel = logging.INFO
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    fileNames = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            fileNames += metatable.findAudioFiles(path)
+        elif os.path.exists(path):
+            fileNames.append(path)
+        else:
+            log.error(f"{path} not found!")
+            sys.exit(-1)
+
+    rows = metatable.readMetadataTable(fileNames, args.workers)
+    numFailed = sum(1 for row in rows if row['error'] is not None)
+    if args.errors:
+        rows = [row for row in rows if row['error'] is not None]
+
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as file:
+            metatable.writeCsv(rows, file)
+    else:
+        metatable.writeCsv(rows, sys.stdout)
+    print(f"{len(fileNames)} files, {numFailed} without valid metadata", file=sys.stderr)
+    sys.exit(1 if numFailed > 0 else 0)
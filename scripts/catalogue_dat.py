@@ -0,0 +1,60 @@
+import argparse
+import sys
+import logging
+
+from IMOSPATools import catalogue
+
+log = logging.getLogger('IMOSPATools')
+
+
+def parseArgs():
+    descText = "Catalogue headers and footers of all the RAW (.DAT) files under a directory tree " \
+               "into a SQLite database, updated incrementally."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='Enable verbose mode')
+    parser.add_argument('--db', '-c', required=True,
+                        help='SQLite catalogue file (created if it does not exist)')
+    parser.add_argument('--workers', '-w', type=int, default=8,
+                        help='Number of threads reading headers/footers (default 8)')
+    parser.add_argument('--list', '-l', action='store_true',
+                        help='List the catalogued records after the scan')
+    parser.add_argument('dirs', nargs='*',
+                        help='Directory trees to scan (eg deployments)')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.WARNING
+
+    if args.verbose:
+        logLevel = logging.INFO
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    try:
+        with catalogue.Catalogue(args.db) as cat:
+            for rootDir in args.dirs:
+                counts = cat.scan(rootDir, args.workers)
+                print(f"{rootDir}: " + ", ".join(f"{n} {k}" for k, n in counts.items()))
+            if args.list:
+                for r in cat.records(includeFailed=True):
+                    if r['error'] is not None:
+                        print(f"{r['path']}  ERROR {r['error']}")
+                    else:
+                        print(f"{r['path']}  {r['startTime']} - {r['endTime']}  "
+                              f"{r['sampleRate']} Hz  {r['numSamples']} samples  set {r['setID']}")
+    except catalogue.IMOSAcousticCatalogueException as e:
+        log.error(f"Catalogue scan failed: {e}")
+        sys.exit(1)
@@ -10,6 +10,12 @@ from IMOSPATools import rawdat
 from IMOSPATools import wav
 from IMOSPATools import calibration
 from IMOSPATools import audiofile
+from IMOSPATools import batch
+from IMOSPATools import calibcache
+from IMOSPATools import qa
+from IMOSPATools import profiling
+from IMOSPATools import manifest
+from IMOSPATools import streamcalib
 
 log = logging.getLogger('IMOSPATools')
 calibration.doWriteIntermediateResults = False
@@ -20,8 +26,12 @@ def parseArgs():
     parser = argparse.ArgumentParser(description=descText)
     parser.add_argument('--debug', '-d', action='store_true',
                         help='Enable debug mode')
-    parser.add_argument('--input', '-i',
-                        help='The name of the input raw audio .DAT file to process.')
+    inGroup = parser.add_mutually_exclusive_group(required=True)
+    inGroup.add_argument('--input', '-i',
+                         help='The name of the input raw audio .DAT file to process.')
+    inGroup.add_argument('--batch', '-b', nargs='+',
+                         help='Batch mode - directories, glob patterns or file lists '
+                              '(@list.txt) of raw audio .DAT files to process.')
 
     exGroup = parser.add_mutually_exclusive_group()
     exGroup.add_argument('--generate-filename', '-g', action='store_true',
@@ -44,6 +54,46 @@ def parseArgs():
                         help='Data set ID')
     parser.add_argument('--intermediate', '-m', action='store_true',
                         help='Write intermediate results as single column text file')
+    parser.add_argument('--float32', action='store_true',
+                        help='Calibrate in single precision (float32), half the memory traffic')
+    parser.add_argument('--calib-cache', '-C',
+                        help='Directory of the on-disk cache of pre-processed calibration files')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Batch mode - number of worker processes (default: all CPU cores)')
+    parser.add_argument('--fft-workers', type=int, default=1,
+                        help='Number of threads of the calibration FFT (scipy.fft), '
+                             '-1 means all CPU cores (default 1, in batch mode per worker process)')
+    parser.add_argument('--fast-fft', action='store_true',
+                        help='Zero-pad the calibration FFT to a fast length and crop the result, '
+                             'predictable FFT time for any record length, the first and last '
+                             f'{calibration.EDGE_EFFECT_SECONDS:g}s of the record differ from '
+                             'the unpadded calibration')
+    parser.add_argument('--spectral-highpass', action='store_true',
+                        help='Apply the DC removal high-pass filter in the frequency domain along with '
+                             'the calibration, instead of forward-backward IIR filtering')
+    parser.add_argument('--writer-threads', type=int, default=0,
+                        help='Batch mode - number of encoder threads per worker process, encoding '
+                             'of a file overlaps with calibration of the next one (default 0, synchronous)')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='Batch mode - number of raw files read ahead per worker process by a '
+                             'background thread, reading overlaps with calibration (default 0, no read-ahead)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Calibrate the memory mapped record block by block and write each block '
+                             'into the output file, memory bounded by the block size instead of the record '
+                             'length, the record is calibrated twice unless --scale-factor is given')
+    parser.add_argument('--scale-factor', type=float,
+                        help='With --streaming - fixed scale factor normalising the output signal '
+                             'into -1..1, samples beyond it are clipped (default: computed per record)')
+    parser.add_argument('--manifest', '-M', nargs='?', const='',
+                        help='Batch mode - manifest of the converted files (JSON), only new or changed '
+                             'files are converted, duplicate files once (default file name '
+                             f'{manifest.MANIFEST_FILE_NAME} in the output directory)')
+    parser.add_argument('--profile', '-P',
+                        help='Append per file stage timing (JSON lines) into this file, '
+                             'in batch mode also print the timing aggregated across the batch')
+    parser.add_argument('--output-dir', '-O',
+                        help='Batch mode - directory of the output audio files '
+                             '(default: next to the input files)')
 
     args = parser.parse_args()
 
@@ -52,6 +102,36 @@ def parseArgs():
         log.error("Parameter --setID (-I) is required when --generate-filename (-g) is used.")
         parser.error("Parameter --setID (-I) is required when --generate-filename (-g) is used.")
 
+    if args.writer_threads < 0:
+        parser.error("Parameter --writer-threads must not be negative.")
+
+    if args.prefetch < 0:
+        parser.error("Parameter --prefetch must not be negative.")
+
+    if args.scale_factor is not None:
+        if not args.streaming:
+            parser.error("Parameter --scale-factor requires --streaming.")
+        if args.scale_factor <= 0:
+            parser.error("Parameter --scale-factor must be positive.")
+
+    if args.streaming and args.intermediate:
+        parser.error("Parameter --intermediate (-m) cannot be used with --streaming.")
+
+    if args.fft_workers == 0 or args.fft_workers < -1:
+        parser.error("Parameter --fft-workers must be a positive number or -1 (all CPU cores).")
+
+    if args.batch is not None:
+        if args.output is not None:
+            parser.error("Parameter --output (-o) cannot be used in batch mode, use --output-dir (-O).")
+        if args.intermediate:
+            parser.error("Parameter --intermediate (-m) cannot be used in batch mode.")
+        if args.manifest == '':
+            if args.output_dir is None:
+                parser.error("Parameter --manifest (-M) without file name requires --output-dir (-O).")
+            args.manifest = os.path.join(args.output_dir, manifest.MANIFEST_FILE_NAME)
+    elif args.manifest is not None:
+        parser.error("Parameter --manifest (-M) can be used in batch mode only.")
+
     return args
 
 
@@ -69,11 +149,6 @@ if __name__ == "__main__":
                         #  seconds resolution is good enough for logging timestamp
                         datefmt='%Y-%m-%d %H:%M:%S')
 
-    rawFileName = args.input
-    if not os.path.exists(rawFileName):
-        log.error(f'Raw dat file {rawFileName} not found!')
-        exit(-1)
-
     if args.calibrate is not None:
         calibFileName = args.calibrate
         if not os.path.exists(calibFileName):
@@ -96,8 +171,50 @@ if __name__ == "__main__":
     else:
         setID = 0
 
-    binData, numChannels, sampleRate, durationHeader, \
-        startTime, endTime, scheduleTime = rawdat.readRawFile(rawFileName)
+    dtype = numpy.float32 if args.float32 else numpy.float64
+
+    if args.batch is not None:
+        rawFileNames = batch.collectInputFiles(args.batch)
+        if not rawFileNames:
+            log.error(f'No raw dat files found in {args.batch}!')
+            exit(-1)
+        calibFileName = args.calibrate
+        runID = profiling.newRunID()
+        results = batch.runBatch(rawFileNames, args.format, args.output_dir,
+                                 calibFileName, args.noise, args.sensitivity,
+                                 setID, args.generate_filename, args.workers,
+                                 args.calib_cache, dtype, args.profile,
+                                 args.fft_workers, args.fast_fft,
+                                 args.spectral_highpass, args.writer_threads,
+                                 args.prefetch, args.manifest,
+                                 args.streaming, args.scale_factor, runID)
+        print(batch.summariseBatch(results))
+        if args.profile is not None:
+            # the profile file is appended to, summarise this batch only
+            records = profiling.readProfile(args.profile, runID)
+            print(profiling.summariseProfile(records))
+        exit(0 if all(r.success for r in results) else 1)
+
+    rawFileName = args.input
+    if not os.path.exists(rawFileName):
+        log.error(f'Raw dat file {rawFileName} not found!')
+        exit(-1)
+
+    calibration.setFFTBackend(args.fft_workers, args.fast_fft)
+
+    if args.profile is not None:
+        profiling.enable(args.profile)
+        profiling.beginFile(rawFileName)
+
+    if args.streaming:
+        # samples memory mapped, read block by block while calibrating
+        record = rawdat.RawDatRecord(rawFileName)
+        binData = record.samples
+        numChannels, sampleRate, durationHeader = record.numChannels, record.sampleRate, record.durationHeader
+        startTime, endTime, scheduleTime = record.startTime, record.endTime, record.schedule
+    else:
+        binData, numChannels, sampleRate, durationHeader, \
+            startTime, endTime, scheduleTime = rawdat.readRawFile(rawFileName)
 
     durationFile = binData.size / sampleRate
 
@@ -139,22 +256,40 @@ if __name__ == "__main__":
     else:
         outputFileName = audiofile.deriveOutputFileName(rawFileName, args.format) 
 
-    numOverloadedSamples = calibration.countOverload(binData)
-    if numOverloadedSamples > 0:
-        log.warning(f"Logger was overloaded - signal is clipped for {numOverloadedSamples} samples.")
+    signalQA = qa.computeSignalQA(binData)
+    qa.storeInMetadata(signalQA, metadata)
+    if signalQA.numOverloaded > 0:
+        log.warning(f"Logger was overloaded - signal is clipped for {signalQA.numOverloaded} samples.")
+    if signalQA.numFlatRuns > 0:
+        log.warning(f"Signal is flat (stuck or dropout) in {signalQA.numFlatRuns} runs, "
+                    f"the longest of {signalQA.longestFlatRun} samples.")
 
     # calibration
-    if args.calibrate is not None:
+    if args.streaming:
+        transfer = None
+        if args.calibrate is not None:
+            transfer = batch.loadCalibration(calibFileName, args.noise, args.sensitivity,
+                                             args.calib_cache, args.spectral_highpass)
+            if sampleRate != transfer.fSample:
+                logging.error("Sample rate is different between the audio record and calibration file.")
+        streamcalib.calibrateRawToFile(binData, transfer, outputFileName, metadata,
+                                       args.format.upper(), signalQA.meanCount, args.scale_factor)
+    elif args.calibrate is not None:
         # cnl, hs - commandline params for now, later loaded from file (csv?)
         cnl = args.noise
         hs = args.sensitivity
-        calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(calibFileName, cnl, hs)
+        if args.calib_cache is not None:
+            cache = calibcache.CalibCache(args.calib_cache)
+            calSpec, calFreq, calSampleRate = cache.loadPrepCalibFile(calibFileName, cnl, hs)
+        else:
+            calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(calibFileName, cnl, hs)
         if sampleRate != calSampleRate:
             logging.error("Sample rate is different between the audio record and calibration file.")
 
-        volts = calibration.toVolts(binData)
+        volts = calibration.toVolts(binData, signalQA.meanCount, dtype)
         # calibratedSignal = calibration.calibrate(volts, cnl, hs, calSpec, calFreq, sampleRate)
-        calibratedSignal = calibration.calibrateReal(volts, cnl, hs, calSpec, calFreq, sampleRate)
+        calibratedSignal = calibration.calibrateReal(volts, cnl, hs, calSpec, calFreq, sampleRate, dtype,
+                                                     args.spectral_highpass)
         scaledSignal, scaleFactor = calibration.scale(calibratedSignal)
         metadata.scaleFactor = scaleFactor
 
@@ -186,7 +321,7 @@ if __name__ == "__main__":
             # Cannot just save binary data blob to wave,
             # need to convert uint16 to int16
             # Steps: convert to volts, normalise and scale back to signed int16
-            volts = calibration.toVolts(binData)
+            volts = calibration.toVolts(binData, signalQA.meanCount)
             scaledSignal, scaleFactor = calibration.scale(volts)
             metadata.scaleFactor = scaleFactor
             if args.format == 'wav':
@@ -201,3 +336,7 @@ if __name__ == "__main__":
         else:
             logMsg = "Something went wrong, there is no audio signal data to write to wav file."
             log.error(logMsg)
+
+    if args.profile is not None:
+        profiling.endFile(output=outputFileName)
+        profiling.disable()
@@ -0,0 +1,153 @@
+import argparse
+import os
+import sys
+import logging
+import numpy
+from datetime import datetime, date, time, timezone, timedelta
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import audiofile
+from IMOSPATools import batch
+from IMOSPATools import calibcache
+from IMOSPATools import catalogue
+from IMOSPATools import timewindow
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def parseArgs():
+    descText = "Extract calibrated audio of a UTC time window from raw IMOS passive audio .DAT records, " \
+               "reading only the sample ranges covering the window."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    inGroup = parser.add_mutually_exclusive_group(required=True)
+    inGroup.add_argument('--input', '-i', nargs='+',
+                         help='Directories, glob patterns or file lists (@list.txt) of raw audio .DAT files')
+    inGroup.add_argument('--db', '-D',
+                         help='SQLite catalogue of the raw audio .DAT files (see catalogue_dat.py)')
+    parser.add_argument('--start', '-S', required=True,
+                        help='Window start, UTC - date and time (2012-08-17T02:45:00) '
+                             'or time of day (02:45:00) used with --day')
+    parser.add_argument('--end', '-E', required=True,
+                        help='Window end, UTC - date and time or time of day used with --day')
+    parser.add_argument('--day', nargs='+',
+                        help='Days (2012-08-17 ...) of the window, when --start/--end are times of day')
+    parser.add_argument('--format', '-f', type=str,
+                        choices=['wav', 'flac'], default="wav",
+                        help='Format of the output audio file (wav, flac)')
+    parser.add_argument('--output-dir', '-O', default='.',
+                        help='Directory of the output audio files')
+    parser.add_argument('--calibrate', '-c', required=False,
+                        help='Calibrate, using calibration file')
+    parser.add_argument('--noise', '-n', type=float, default=-90.0,
+                        help='Calibration noise level (cnl)')
+    parser.add_argument('--sensitivity', '-s', type=float, default=-196.0,
+                        help='Hydrophone sensitivity (hs)')
+    parser.add_argument('--setID', '-I', type=int, default=0,
+                        help='Data set ID')
+    parser.add_argument('--float32', action='store_true',
+                        help='Calibrate in single precision (float32)')
+    parser.add_argument('--calib-cache', '-C',
+                        help='Directory of the on-disk cache of pre-processed calibration files')
+    args = parser.parse_args()
+    return args
+
+
+def toUTC(value: datetime) -> datetime:
+    # RAW file times are naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parseWindows(start: str, end: str, days: list) -> list:
+    """
+    Make list of (startTime, endTime) windows from the commandline parameters
+
+    :param start: window start, ISO date and time or time of day
+    :param end: window end, ISO date and time or time of day
+    :param days: list of ISO dates, when start and end are times of day
+    :return: list of (startTime, endTime) as naive UTC datetime
+    """
+    if days is None:
+        return [(toUTC(datetime.fromisoformat(start)), toUTC(datetime.fromisoformat(end)))]
+
+    startOfDay = time.fromisoformat(start)
+    endOfDay = time.fromisoformat(end)
+    windows = []
+    for day in days:
+        day = date.fromisoformat(day)
+        startTime = datetime.combine(day, startOfDay)
+        endTime = datetime.combine(day, endOfDay)
+        # window across midnight
+        if endTime <= startTime:
+            endTime += timedelta(days=1)
+        windows.append((startTime, endTime))
+    return windows
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.INFO
+
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    try:
+        windows = parseWindows(args.start, args.end, args.day)
+    except ValueError as e:
+        log.error(f"Invalid time window: {e}")
+        sys.exit(-1)
+
+    transfer = None
+    if args.calibrate is not None:
+        if args.calib_cache is not None:
+            cache = calibcache.CalibCache(args.calib_cache)
+            calSpec, calFreq, calSampleRate = cache.loadPrepCalibFile(args.calibrate, args.noise, args.sensitivity)
+        else:
+            calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(args.calibrate, args.noise,
+                                                                            args.sensitivity)
+        transfer = calibration.CalibrationTransfer(calSpec, calFreq, calSampleRate)
+
+    if args.input is not None:
+        # headers and footers only, the audio data is read per window
+        infos = [rawdat.readRawFileInfo(f) for f in batch.collectInputFiles(args.input)]
+
+    dtype = numpy.float32 if args.float32 else numpy.float64
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    exitCode = 0
+    for startTime, endTime in windows:
+        if args.db is not None:
+            with catalogue.Catalogue(args.db) as cat:
+                infos = cat.fileInfos(startTime, endTime)
+        try:
+            window = timewindow.extractWindow(infos, startTime, endTime, transfer, dtype=dtype)
+        except (timewindow.IMOSAcousticTimeWindowException,
+                calibration.IMOSAcousticCalibException,
+                rawdat.IMOSAcousticRAWReadException) as e:
+            log.error(f"Window {startTime} - {endTime} not extracted: {e}")
+            exitCode = 1
+            continue
+
+        metadata = timewindow.windowMetadata(window, args.setID,
+                                             args.noise if transfer is not None else None,
+                                             args.sensitivity if transfer is not None else None)
+        scaledSignal, metadata.scaleFactor = calibration.scale(window.signal)
+        outputFileName = os.path.join(args.output_dir,
+                                      audiofile.createOutputFileName(args.setID, startTime, args.format))
+        audiofile.writeMono16bit(outputFileName, scaledSignal, metadata, args.format.upper())
+        print(f"{outputFileName}: {window.numCovered} of {window.signal.size} samples "
+              f"from {len(window.segments)} record(s)")
+
+    sys.exit(exitCode)
@@ -19,10 +19,15 @@ def parseArgs():
     parser = argparse.ArgumentParser()
     parser.add_argument('--debug', '-d', action='store_true',
                         help='Enable debug mode')
-    parser.add_argument('--filename', '-f', required=True,
-                        help='The name of the audio file to inspect.')
+    parser.add_argument('--filename', '-f', action='append', default=[],
+                        help='The name of the audio file to inspect, can be repeated.')
     parser.add_argument('--json', '-j', action='store_true',
                         help='extract and print IMOS specifci metadata as JSON.')
+    parser.add_argument('--stats', '-s', action='store_true',
+                        help='Read the signal in blocks and print max abs, RMS amplitude '
+                             'and number of clipped samples (default only the file header is read)')
+    parser.add_argument('files', nargs='*',
+                        help='More audio files to inspect')
     args = parser.parse_args()
     return args
 
@@ -41,13 +46,28 @@ if __name__ == "__main__":
                         #  seconds resolution is good enough for logging timestamp
                         datefmt='%Y-%m-%d %H:%M:%S')
 
-    fileName = args.filename
-    if not os.path.exists(fileName):
-        log.error(f'Raw dat file {fileName} not found!')
+    fileNames = args.filename + args.files
+    if not fileNames:
+        log.error('No audio file to inspect!')
         exit(-1)
 
-    audiofile.loadInspect(fileName)
+    numFailed = 0
+    for fileName in fileNames:
+        if not os.path.exists(fileName):
+            log.error(f'Audio file {fileName} not found!')
+            numFailed += 1
+            continue
 
-    if args.json:
-        mataJson = audiofile.extractMetadataJson(fileName)
-        print(f"Metadata extracted from file {fileName} as JSON:\n{mataJson}")
+        print(f"==== {fileName}")
+        try:
+            audiofile.inspectReport(fileName, args.stats)
+
+            if args.json:
+                mataJson = audiofile.extractMetadataJson(fileName)
+                print(f"Metadata extracted from file {fileName} as JSON:\n{mataJson}")
+        except audiofile.IMOSAcousticAudioFileException:
+            # already logged, continue with the next file
+            numFailed += 1
+
+    if numFailed > 0:
+        exit(1)
@@ -0,0 +1,71 @@
+import argparse
+import os
+import logging
+from datetime import datetime
+
+from IMOSPATools import synthetic
+
+log = logging.getLogger('IMOSPATools')
+
+
+def parseArgs():
+    descText = "Generator of synthetic IMOS passive audio deployments (.DAT records and calibration files) " \
+               "for scale and load testing."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    parser.add_argument('--output-dir', '-O', required=True,
+                        help='Directory the deployments are written into')
+    parser.add_argument('--deployments', '-n', type=int, default=1,
+                        help='Number of deployments (default 1)')
+    parser.add_argument('--files', '-N', type=int, default=100,
+                        help='Number of .DAT files per deployment (default 100)')
+    parser.add_argument('--start', '-S', default='2020-01-01T00:00:00',
+                        help='Schedule time of the first record (default 2020-01-01T00:00:00)')
+    parser.add_argument('--interval', type=float, default=900.0,
+                        help='Seconds between the records (default 900)')
+    parser.add_argument('--sample-rate', '-r', type=int, default=6000,
+                        help='Sampling rate (default 6000)')
+    parser.add_argument('--duration', '-t', type=int, default=300,
+                        help='Nominal record duration in seconds (default 300)')
+    parser.add_argument('--tail', type=float, default=synthetic.DEFAULT_TAIL_SECONDS,
+                        help='Seconds of samples beyond the nominal duration '
+                             f'(default {synthetic.DEFAULT_TAIL_SECONDS})')
+    parser.add_argument('--setID', '-I', type=int,
+                        help='Data set ID of the first deployment written into the headers '
+                             '(next deployments get the next IDs), not written if not provided')
+    parser.add_argument('--footer-lines', type=int, choices=[4, 6], default=6,
+                        help='Number of footer lines, 4 (older loggers) or 6 (default)')
+    parser.add_argument('--noise', type=float, default=-90.0,
+                        help='Calibration noise level (cnl) written into Calib_data.TXT')
+    parser.add_argument('--sensitivity', type=float, default=-196.0,
+                        help='Hydrophone sensitivity (hs) written into Calib_data.TXT')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the random signals')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.INFO
+
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    startTime = datetime.fromisoformat(args.start)
+    for i in range(args.deployments):
+        setID = args.setID + i if args.setID is not None else None
+        name = f"SYNTH_{setID if setID is not None else i + 1}"
+        fileNames = synthetic.writeDeployment(os.path.join(args.output_dir, name), args.files, startTime,
+                                              args.interval, args.sample_rate, args.duration, args.tail,
+                                              setID, args.footer_lines, args.noise, args.sensitivity,
+                                              args.seed + i * args.files)
+        print(f"{name}: {len(fileNames)} files")
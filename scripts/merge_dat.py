@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import logging
+import numpy
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import audiofile
+from IMOSPATools import batch
+from IMOSPATools import calibcache
+from IMOSPATools import catalogue
+from IMOSPATools import merge
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def parseArgs():
+    descText = "Merge consecutive raw IMOS passive audio .DAT records into long calibrated wav or flac files, " \
+               "ordered by record start time, with gaps and overlaps recorded in the metadata."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    inGroup = parser.add_mutually_exclusive_group(required=True)
+    inGroup.add_argument('--input', '-i', nargs='+',
+                         help='Directories, glob patterns or file lists (@list.txt) of raw audio .DAT files')
+    inGroup.add_argument('--db', '-D',
+                         help='SQLite catalogue of the raw audio .DAT files (see catalogue_dat.py)')
+    parser.add_argument('--period', '-p', choices=['hour', 'day', 'all'], default='day',
+                        help='One output file per hour, day (UTC) or all the records (default day)')
+    parser.add_argument('--format', '-f', type=str,
+                        choices=['wav', 'flac'], default="wav",
+                        help='Format of the output audio file (wav, flac)')
+    parser.add_argument('--output-dir', '-O', default='.',
+                        help='Directory of the output audio files')
+    parser.add_argument('--calibrate', '-c', required=False,
+                        help='Calibrate, using calibration file')
+    parser.add_argument('--noise', '-n', type=float, default=-90.0,
+                        help='Calibration noise level (cnl)')
+    parser.add_argument('--sensitivity', '-s', type=float, default=-196.0,
+                        help='Hydrophone sensitivity (hs)')
+    parser.add_argument('--setID', '-I', type=int, default=0,
+                        help='Data set ID')
+    parser.add_argument('--scale-factor', type=float,
+                        help='Scale factor of the output, louder samples are clipped and counted in the '
+                             'metadata (default: from the loudest record of each file, found in a first pass)')
+    parser.add_argument('--no-fill-gaps', action='store_true',
+                        help='Append the records back to back instead of filling gaps with silence')
+    parser.add_argument('--float32', action='store_true',
+                        help='Calibrate in single precision (float32)')
+    parser.add_argument('--async-write', action='store_true',
+                        help='Encode a record on a writer thread while the next one is calibrated')
+    parser.add_argument('--calib-cache', '-C',
+                        help='Directory of the on-disk cache of pre-processed calibration files')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.INFO
+
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    transfer = None
+    if args.calibrate is not None:
+        if args.calib_cache is not None:
+            cache = calibcache.CalibCache(args.calib_cache)
+            calSpec, calFreq, calSampleRate = cache.loadPrepCalibFile(args.calibrate, args.noise, args.sensitivity)
+        else:
+            calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(args.calibrate, args.noise,
+                                                                            args.sensitivity)
+        transfer = calibration.CalibrationTransfer(calSpec, calFreq, calSampleRate)
+
+    # headers and footers only, the audio data is read record by record
+    if args.db is not None:
+        with catalogue.Catalogue(args.db) as cat:
+            infos = cat.fileInfos()
+    else:
+        infos = [rawdat.readRawFileInfo(f) for f in batch.collectInputFiles(args.input)]
+    if not infos:
+        log.error("No raw dat files to merge!")
+        sys.exit(-1)
+
+    if args.period == 'all':
+        groups = [infos]
+    else:
+        groups = merge.groupRecords(infos, merge.MERGE_PERIODS[args.period])
+
+    dtype = numpy.float32 if args.float32 else numpy.float64
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    exitCode = 0
+    for group in groups:
+        startTime = min(info.footer.startTime for info in group)
+        outputFileName = os.path.join(args.output_dir,
+                                      audiofile.createOutputFileName(args.setID, startTime, args.format))
+        try:
+            result = merge.mergeRecords(group, outputFileName, transfer, args.format, args.setID,
+                                        args.noise, args.sensitivity, args.scale_factor,
+                                        not args.no_fill_gaps, dtype, args.async_write)
+        except (merge.IMOSAcousticMergeException,
+                calibration.IMOSAcousticCalibException,
+                rawdat.IMOSAcousticRAWReadException,
+                audiofile.IMOSAcousticAudioFileException) as e:
+            log.error(f"Merging into {outputFileName} failed: {e}")
+            exitCode = 1
+            continue
+        print(f"{outputFileName}: {result.numRecords} records, {result.numSamples} samples, "
+              f"{result.numGapSamples} gap samples, {result.numClipped} clipped")
+
+    sys.exit(exitCode)
@@ -0,0 +1,108 @@
+import argparse
+import os
+import glob
+import json
+import logging
+import numpy
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def parseArgs():
+    descText = "Accuracy report of single precision (float32) calibration compared to double precision (float64)."
+    parser = argparse.ArgumentParser(description=descText)
+    parser.add_argument('--debug', '-d', action='store_true',
+                        help='Enable debug mode')
+    parser.add_argument('--data', '-D', default='tests/data',
+                        help='Directory with deployments (each with .DAT files and '
+                             'Calib_file/ sub-directory with calibration .DAT and Calib_data.TXT)')
+    parser.add_argument('--json', '-j', action='store_true',
+                        help='Print the report as JSON')
+    args = parser.parse_args()
+    return args
+
+
+def readCalibParameters(fileName: str) -> dict:
+    # calibration parameters as in Calib_data.TXT, eg 'Cal level: -90 dB'
+    parameters = {}
+    with open(fileName, 'r') as file:
+        for line in file.read().splitlines():
+            parts = line.split(':')
+            if len(parts) == 2:
+                try:
+                    parameters[parts[0].strip()] = float(parts[1].split()[0])
+                except (ValueError, IndexError):
+                    pass
+    return parameters
+
+
+def compareRecord(rawFileName: str, calibFileName: str,
+                  cnl: float, hs: float) -> dict:
+    """
+    Calibrate one record in double and single precision and compare
+
+    :return: dict with the accuracy of the single precision result
+    """
+    binData, numChannels, sampleRate, durationHeader, \
+        startTime, endTime, scheduleTime = rawdat.readRawFileMapped(rawFileName)
+    calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(calibFileName, cnl, hs)
+    transfer = calibration.CalibrationTransfer(calSpec, calFreq, sampleRate)
+
+    signal64, scaleFactor64 = calibration.scale(
+        transfer.calibrateReal(calibration.toVolts(binData)))
+    signal32, scaleFactor32 = calibration.scale(
+        transfer.calibrateReal(calibration.toVolts(binData, dtype=numpy.float32),
+                               numpy.float32))
+
+    diff = numpy.abs(signal64 - signal32)
+    # 16-bit PCM as written into the output audio file
+    toInt16Factor = (1 << (rawdat.BITS_PER_SAMPLE - 1)) - 1
+    diffLSB = numpy.abs(numpy.round(signal64 * toInt16Factor) - numpy.round(signal32 * toInt16Factor))
+
+    return {'rawFileName': rawFileName,
+            'numSamples': int(binData.size),
+            'scaleFactorEqual': bool(scaleFactor64 == scaleFactor32),
+            'maxAbsDiff': float(diff.max()),
+            'rmsDiff': float(numpy.sqrt(numpy.mean(diff.astype(numpy.float64) ** 2))),
+            'maxDiffLSB': int(diffLSB.max()),
+            'numDiffSamples': int(numpy.count_nonzero(diffLSB))}
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    # default logging level
+    logLevel = logging.WARNING
+
+    if args.debug:
+        logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    report = []
+    for deploymentDir in sorted(glob.glob(os.path.join(args.data, '*', ''))):
+        calibFileNames = glob.glob(os.path.join(deploymentDir, 'Calib_file', '*.DAT'))
+        paramsFileName = os.path.join(deploymentDir, 'Calib_file', 'Calib_data.TXT')
+        if len(calibFileNames) != 1 or not os.path.exists(paramsFileName):
+            log.warning(f"Skipping {deploymentDir}, calibration file or parameters not found")
+            continue
+        params = readCalibParameters(paramsFileName)
+        for rawFileName in sorted(glob.glob(os.path.join(deploymentDir, '*.DAT'))):
+            report.append(compareRecord(rawFileName, calibFileNames[0],
+                                        params.get('Cal level', -90.0),
+                                        params.get('Hydrophone sensitivity', -196.0)))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'record':48s} {'samples':>9s} {'max abs diff':>13s} {'rms diff':>10s} {'max LSB':>8s} {'# diff':>8s}")
+        for r in report:
+            print(f"{r['rawFileName']:48s} {r['numSamples']:9d} {r['maxAbsDiff']:13.3e} "
+                  f"{r['rmsDiff']:10.3e} {r['maxDiffLSB']:8d} {r['numDiffSamples']:8d}")
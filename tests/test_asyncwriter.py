@@ -0,0 +1,81 @@
+import os
+import glob
+import logging
+import tempfile
+import threading
+import numpy
+import soundfile
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import batch
+from IMOSPATools import merge
+from IMOSPATools import asyncwriter
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def test_async_writer_backpressure():
+    release = threading.Event()
+    started = []
+
+    def slowWrite(i):
+        started.append(i)
+        release.wait(10.0)
+        return i
+
+    writer = asyncwriter.AsyncWriter(numThreads=1, maxQueued=1)
+    futures = [writer.submit(slowWrite, 0), writer.submit(slowWrite, 1)]
+
+    # the third write shall block until one of the two outstanding is done
+    blocked = threading.Thread(target=lambda: futures.append(writer.submit(slowWrite, 2)))
+    blocked.start()
+    blocked.join(0.2)
+    if not blocked.is_alive() or len(futures) != 2:
+        raise AssertionError("FAILED: submit does not block when the writer queue is full")
+
+    release.set()
+    blocked.join(10.0)
+    writer.close()
+    if [f.result() for f in futures] != [0, 1, 2] or started != [0, 1, 2]:
+        raise AssertionError(f"FAILED: writes not done in order {started}")
+
+
+def test_async_writer_batch_and_merge():
+    rawFileNames = ['tests/data/KI_3501/583E9500.DAT',
+                    'tests/data/Rottnest_3154/502DB01D.DAT']
+    with tempfile.TemporaryDirectory() as tmpDir:
+        outputs = {}
+        for writerThreads in (0, 2):
+            outputDir = os.path.join(tmpDir, f"writers{writerThreads}")
+            results = batch.runBatch(rawFileNames, 'flac', outputDir, numWorkers=1,
+                                     writerThreads=writerThreads)
+            if not all(r.success and r.elapsed > 0 for r in results):
+                raise AssertionError(f"FAILED: batch with {writerThreads} writer threads {results}")
+            outputs[writerThreads] = [soundfile.read(f)[0] for f in sorted(glob.glob(os.path.join(outputDir, '*.flac')))]
+        if len(outputs[2]) != 2 or not all(numpy.array_equal(a, b) for a, b in zip(outputs[0], outputs[2])):
+            raise AssertionError("FAILED: asynchronously written batch files differ")
+
+        # merged record by record, encoded while the next record is read
+        info = rawdat.readRawFileInfo(rawFileNames[1])
+        merged = {}
+        for asyncWrite in (False, True):
+            outputFileName = os.path.join(tmpDir, f"merged{asyncWrite}.wav")
+            merge.mergeRecords([info, info], outputFileName, fillGaps=False, asyncWrite=asyncWrite)
+            merged[asyncWrite] = soundfile.read(outputFileName)[0]
+        if merged[True].size != 2 * info.numSamples or not numpy.array_equal(merged[False], merged[True]):
+            raise AssertionError("FAILED: asynchronously written merged file differs")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_async_writer_backpressure()
+    test_async_writer_batch_and_merge()
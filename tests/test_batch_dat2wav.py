@@ -0,0 +1,161 @@
+import os
+import logging
+import shutil
+import tempfile
+
+from IMOSPATools import batch
+from IMOSPATools import calibration
+from IMOSPATools import audiofile
+from IMOSPATools import qa
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def test_batch_collect_input_files():
+    # directory input shall not descend into the Calib_file sub-directory
+    rawFileNames = batch.collectInputFiles(['tests/data/KI_3501'])
+    if rawFileNames != ['tests/data/KI_3501/583E9500.DAT']:
+        raise AssertionError(f"FAILED: unexpected files collected from directory {rawFileNames}")
+
+    rawFileNames = batch.collectInputFiles(['tests/data/*/*.DAT', 'tests/data/KI_3501'])
+    if len(rawFileNames) != 3:
+        raise AssertionError(f"FAILED: unexpected files collected from glob {rawFileNames}")
+
+
+def test_batch_dat2wav():
+    # uncalibrated conversion of all test deployments using a process pool,
+    # including one missing file that must be reported as failure
+    rawFileNames = batch.collectInputFiles(['tests/data/*/*.DAT'])
+    rawFileNames.append('tests/data/missing.DAT')
+
+    with tempfile.TemporaryDirectory() as outputDir:
+        results = batch.runBatch(rawFileNames, 'flac', outputDir, numWorkers=2)
+        print(batch.summariseBatch(results))
+
+        if [r.rawFileName for r in results] != rawFileNames:
+            raise AssertionError("FAILED: batch results are not in the order of input files")
+        for r in results[:-1]:
+            if not r.success or not os.path.exists(r.outputFileName):
+                raise AssertionError(f"FAILED: batch conversion of {r.rawFileName}: {r.errorMsg}")
+        if results[-1].success:
+            raise AssertionError("FAILED: conversion of missing file not reported as failure")
+
+
+def test_batch_calib_dat2wav():
+    # calibrated conversion, calibration file prepared once in the worker
+    rawFileNames = ['tests/data/KI_3501/583E9500.DAT']
+    cal = 'tests/data/KI_3501/Calib_file/5809C515.DAT'
+
+    with tempfile.TemporaryDirectory() as outputDir:
+        results = batch.runBatch(rawFileNames, 'wav', outputDir, cal, -90.0, -196.0,
+                                 setID=3501, generateFileName=True, numWorkers=1)
+        r = results[0]
+        if not r.success:
+            raise AssertionError(f"FAILED: batch calibration of {r.rawFileName}: {r.errorMsg}")
+        if os.path.basename(r.outputFileName) != 'Set3501_20161130_090000.wav':
+            raise AssertionError(f"FAILED: unexpected generated file name {r.outputFileName}")
+        metadata = audiofile.extractMetadataJson(r.outputFileName)
+        if float(metadata['calibNoiseLevel']) != -90.0:
+            raise AssertionError("FAILED: calibration parameters not stored in metadata")
+        if (int(metadata['numOverloaded']), int(metadata['numFlatRuns'])) != \
+                (r.signalQA.numOverloaded, r.signalQA.numFlatRuns):
+            raise AssertionError(f"FAILED: signal QA not stored in metadata {metadata}")
+
+
+def test_batch_summary_signal_qa():
+    # clipped samples and flat lines are reported in the summary
+    results = [batch.BatchFileResult('a.DAT', 'a.wav', True, signalQA=qa.SignalQA(numOverloaded=5, longestOverloadRun=3)),
+               batch.BatchFileResult('b.DAT', 'b.wav', True, signalQA=qa.SignalQA())]
+    summary = batch.summariseBatch(results).split("\n")
+    if "5 samples clipped, longest run 3" not in summary[0] or "[" in summary[1]:
+        raise AssertionError(f"FAILED: signal QA not in the summary {summary}")
+    if "1 clipped or with flat lines" not in summary[-1]:
+        raise AssertionError(f"FAILED: files with signal QA issues not counted {summary[-1]}")
+
+
+def test_batch_streaming_dat2wav():
+    # calibrated block by block straight into the output file
+    rawFileNames = ['tests/data/KI_3501/583E9500.DAT']
+    cal = 'tests/data/KI_3501/Calib_file/5809C515.DAT'
+
+    with tempfile.TemporaryDirectory() as outputDir:
+        results = batch.runBatch(rawFileNames, 'flac', outputDir, cal, -90.0, -196.0,
+                                 numWorkers=1, streaming=True)
+        r = results[0]
+        if not r.success:
+            raise AssertionError(f"FAILED: streaming batch calibration of {r.rawFileName}: {r.errorMsg}")
+        metadata = audiofile.extractMetadataJson(r.outputFileName)
+        if float(metadata['calibNoiseLevel']) != -90.0 or float(metadata['scaleFactor']) <= 0.0:
+            raise AssertionError("FAILED: calibration parameters not stored in metadata")
+
+
+def test_batch_in_process_state():
+    # converting in this process shall leave the FFT backend, logging
+    # and the worker calibration as they were for the caller
+    logLevel = log.level
+    calibration.setFFTBackend(1, False)
+    rawFileNames = ['tests/data/KI_3501/583E9500.DAT']
+    cal = 'tests/data/KI_3501/Calib_file/5809C515.DAT'
+    with tempfile.TemporaryDirectory() as outputDir:
+        results = batch.runBatch(rawFileNames, 'wav', outputDir, cal, -90.0, -196.0, numWorkers=1,
+                                 fftWorkers=2, fftFastLength=True)
+    if not results[0].success:
+        raise AssertionError(f"FAILED: batch calibration of {results[0].rawFileName}: {results[0].errorMsg}")
+    if (calibration.fftWorkers, calibration.fftFastLength) != (1, False):
+        raise AssertionError("FAILED: FFT backend of the batch left configured")
+    if log.level != logLevel or batch._workerTransfer is not None:
+        raise AssertionError("FAILED: logging or worker calibration of the batch left configured")
+
+
+def test_batch_missing_calib():
+    # calibration file failing to load shall fail the batch before
+    # starting the worker processes (failing pool initializers respawn forever)
+    rawFileNames = ['tests/data/KI_3501/583E9500.DAT']
+    try:
+        batch.runBatch(rawFileNames, 'wav', None, '/nonexistent.DAT', -90.0, -196.0,
+                       numWorkers=2)
+    except calibration.IMOSAcousticCalibException:
+        pass
+    else:
+        raise AssertionError("FAILED: missing calibration file not reported")
+
+
+def test_batch_output_collision():
+    # same named files from two folders into one output directory,
+    # the second one shall fail instead of overwriting the first output
+    with tempfile.TemporaryDirectory() as tmpDir:
+        rawFileNames = []
+        for folder in ('a', 'b'):
+            os.makedirs(os.path.join(tmpDir, folder))
+            rawFileNames.append(shutil.copy('tests/data/KI_3501/583E9500.DAT',
+                                            os.path.join(tmpDir, folder)))
+        outputDir = os.path.join(tmpDir, 'out')
+        results = batch.runBatch(rawFileNames, 'flac', outputDir, numWorkers=1)
+        print(batch.summariseBatch(results))
+
+        if [r.rawFileName for r in results] != rawFileNames:
+            raise AssertionError("FAILED: batch results are not in the order of input files")
+        if not results[0].success:
+            raise AssertionError(f"FAILED: batch conversion of {results[0].rawFileName}: {results[0].errorMsg}")
+        if results[1].success or rawFileNames[0] not in results[1].errorMsg:
+            raise AssertionError("FAILED: colliding output file not reported as failure")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_batch_collect_input_files()
+    test_batch_dat2wav()
+    test_batch_calib_dat2wav()
+    test_batch_summary_signal_qa()
+    test_batch_streaming_dat2wav()
+    test_batch_in_process_state()
+    test_batch_missing_calib()
+    test_batch_output_collision()
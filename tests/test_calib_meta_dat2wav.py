@@ -1,4 +1,5 @@
 import os
+import tempfile
 import logging
 import numpy
 import wave
@@ -59,7 +60,8 @@ def load_float_array(file_path):
 
 def calib_dat2wavflac(rawFileName: str,
                       calibFileName: str,
-                      calibParamsFileName: str) -> bool:
+                      calibParamsFileName: str,
+                      outputDir: str) -> bool:
     # test calibration of one file using regular (complex) FFT/IFFT
 
     if not os.path.exists(rawFileName):
@@ -172,14 +174,14 @@ def calib_dat2wavflac(rawFileName: str,
             outputFileName = audiofile.createOutputFileName(metadata.setID,
                                                             metadata.startTime,
                                                             'wav')
-            outputPath = os.path.dirname(rawFileName) + '/' + outputFileName
+            outputPath = os.path.join(outputDir, outputFileName)
             audiofile.writeMono16bit(outputPath, scaledSignal,
                                      metadata)
             # write calibrated flac file
             outputFileName = audiofile.createOutputFileName(metadata.setID,
                                                             metadata.startTime,
                                                             'flac')
-            outputPath = os.path.dirname(rawFileName) + '/' + outputFileName
+            outputPath = os.path.join(outputDir, outputFileName)
             audiofile.writeMono16bit(outputPath, scaledSignal,
                                      metadata, 'FLAC')
         except:
@@ -194,7 +196,8 @@ def calib_dat2wavflac(rawFileName: str,
 
 def calib_real_dat2wavflac(rawFileName: str,
                            calibFileName: str,
-                           calibParamsFileName: str) -> bool:
+                           calibParamsFileName: str,
+                           outputDir: str) -> bool:
     # test calibration of one file using real FFT/IFFT
 
     if not os.path.exists(rawFileName):
@@ -307,14 +310,14 @@ def calib_real_dat2wavflac(rawFileName: str,
             outputFileName = audiofile.createOutputFileName(metadata.setID,
                                                             metadata.startTime,
                                                             'wav')
-            outputPath = os.path.dirname(rawFileName) + '/' + outputFileName
+            outputPath = os.path.join(outputDir, outputFileName)
             audiofile.writeMono16bit(outputPath, scaledSignal,
                                      metadata)
             # write calibrated flac file
             outputFileName = audiofile.createOutputFileName(metadata.setID,
                                                             metadata.startTime,
                                                             'flac')
-            outputPath = os.path.dirname(rawFileName) + '/' + outputFileName
+            outputPath = os.path.join(outputDir, outputFileName)
             audiofile.writeMono16bit(outputPath, scaledSignal,
                                      metadata, 'FLAC')
         except:
@@ -410,9 +413,10 @@ def test_calib_dat2wavflac():
     cal3 = 'tests/data/Portland_3092/Calib_file/4FEACA92.DAT'
     par3 = 'tests/data/Portland_3092/Calib_file/Calib_data.TXT'
 
-    calib_dat2wavflac(dat1, cal1, par1)
-    calib_dat2wavflac(dat2, cal2, par2)
-    calib_dat2wavflac(dat3, cal3, par3)
+    with tempfile.TemporaryDirectory() as outputDir:
+        calib_dat2wavflac(dat1, cal1, par1, outputDir)
+        calib_dat2wavflac(dat2, cal2, par2, outputDir)
+        calib_dat2wavflac(dat3, cal3, par3, outputDir)
 
 
 def test_calib_real_dat2wavflac():
@@ -429,9 +433,10 @@ def test_calib_real_dat2wavflac():
     cal3 = 'tests/data/Portland_3092/Calib_file/4FEACA92.DAT'
     par3 = 'tests/data/Portland_3092/Calib_file/Calib_data.TXT'
 
-    calib_real_dat2wavflac(dat1, cal1, par1)
-    calib_real_dat2wavflac(dat2, cal2, par2)
-    calib_real_dat2wavflac(dat3, cal3, par3)
+    with tempfile.TemporaryDirectory() as outputDir:
+        calib_real_dat2wavflac(dat1, cal1, par1, outputDir)
+        calib_real_dat2wavflac(dat2, cal2, par2, outputDir)
+        calib_real_dat2wavflac(dat3, cal3, par3, outputDir)
 
 
 # The following 3 functions are renamed test* -> nest*
@@ -0,0 +1,75 @@
+import os
+import logging
+import tempfile
+import numpy
+
+from IMOSPATools import calibration
+from IMOSPATools import calibcache
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def test_calibcache_hit_miss():
+    cal = 'tests/data/KI_3501/Calib_file/5809C515.DAT'
+    cnl = -90.0
+    hs = -196.0
+
+    refSpec, refFreq, refSampleRate = calibration.loadPrepCalibFile(cal, cnl, hs)
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        cache = calibcache.CalibCache(cacheDir)
+        cache.loadPrepCalibFile(cal, cnl, hs)
+        calSpec, calFreq, calSampleRate = cache.loadPrepCalibFile(cal, cnl, hs)
+        if cache.stats() != {'hits': 1, 'misses': 1}:
+            raise AssertionError(f"FAILED: unexpected calibration cache statistics {cache.stats()}")
+
+        # a different calibration parameter is a different cache entry
+        cache.loadPrepCalibFile(cal, cnl, -197.8)
+        if cache.stats() != {'hits': 1, 'misses': 2}:
+            raise AssertionError(f"FAILED: unexpected calibration cache statistics {cache.stats()}")
+
+    if not (numpy.array_equal(calSpec, refSpec) and numpy.array_equal(calFreq, refFreq)
+            and calSampleRate == refSampleRate):
+        raise AssertionError("FAILED: cached calibration differs from loadPrepCalibFile()")
+
+
+def test_calibcache_eviction():
+    cal = 'tests/data/KI_3501/Calib_file/5809C515.DAT'
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        # room for a single entry only
+        cache = calibcache.CalibCache(cacheDir, maxBytes=64 * 1024)
+        cache.loadPrepCalibFile(cal, -90.0, -196.0)
+        cache.loadPrepCalibFile(cal, -90.0, -197.8)
+        entries = [f for f in os.listdir(cacheDir) if f.endswith(calibcache.CACHE_FILE_EXT)]
+        if len(entries) != 1:
+            raise AssertionError(f"FAILED: calibration cache not evicted, entries {entries}")
+
+
+def test_calibcache_failed_put():
+    calSpec = numpy.ones(8)
+    calFreq = numpy.arange(8.0)
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        cache = calibcache.CalibCache(cacheDir)
+        # a directory in place of the entry makes os.replace() fail
+        os.mkdir(cache.entryPath('blocked'))
+        cache.put('blocked', calSpec, calFreq, 6000.0)
+        tmpFiles = [f for f in os.listdir(cacheDir) if f.endswith('.tmp')]
+        if tmpFiles:
+            raise AssertionError(f"FAILED: temporary files left in the calibration cache {tmpFiles}")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_calibcache_hit_miss()
+    test_calibcache_eviction()
+    test_calibcache_failed_put()
@@ -0,0 +1,173 @@
+import logging
+import numpy
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def test_calibration_transfer():
+    # CalibrationTransfer shall produce the same result as calibrateReal()
+    dat = 'tests/data/Rottnest_3154/502DB01D.DAT'
+    cal = 'tests/data/Rottnest_3154/Calib_file/501E9BF5.DAT'
+    cnl = -90.0
+    hs = -197.8
+
+    binData, numChannels, sampleRate, durationHeader, \
+        startTime, endTime, scheduleTime = rawdat.readRawFile(dat)
+    calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(cal, cnl, hs)
+    volts = calibration.toVolts(binData)
+
+    reference = calibration.calibrateReal(volts, cnl, hs, calSpec, calFreq, sampleRate)
+
+    transfer = calibration.CalibrationTransfer(calSpec, calFreq, sampleRate,
+                                               maxCachedLengths=2)
+    calibratedSignal = transfer.calibrateReal(volts)
+    if not numpy.allclose(calibratedSignal, reference, rtol=1e-12, atol=0.0):
+        raise AssertionError("FAILED: CalibrationTransfer differs from calibrateReal()")
+
+    # same record length shall reuse the memoised correction
+    correction = transfer.correction(volts.size)
+    transfer.calibrateReal(volts)
+    if transfer.correction(volts.size) is not correction:
+        raise AssertionError("FAILED: correction not memoised per record length")
+
+    # least recently used record length shall be evicted
+    transfer.correction(volts.size - 1)
+    transfer.correction(volts.size - 2)
+    if transfer.correction(volts.size) is correction:
+        raise AssertionError("FAILED: least recently used record length not evicted")
+
+
+def test_calibration_float32():
+    # single precision calibration shall not differ from double precision
+    # by more than 1 LSB of the 16-bit output
+    dat = 'tests/data/Portland_3092/4F480851.DAT'
+    cal = 'tests/data/Portland_3092/Calib_file/4FEACA92.DAT'
+    cnl = -90.0
+    hs = -197.5
+
+    binData, numChannels, sampleRate, durationHeader, \
+        startTime, endTime, scheduleTime = rawdat.readRawFile(dat)
+    calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(cal, cnl, hs)
+
+    signal64, scaleFactor64 = calibration.scale(calibration.calibrateReal(
+        calibration.toVolts(binData), cnl, hs, calSpec, calFreq, sampleRate))
+    volts32 = calibration.toVolts(binData, dtype=numpy.float32)
+    signal32, scaleFactor32 = calibration.scale(calibration.calibrateReal(
+        volts32, cnl, hs, calSpec, calFreq, sampleRate, numpy.float32))
+
+    if volts32.dtype != numpy.float32 or signal32.dtype != numpy.float32:
+        raise AssertionError("FAILED: single precision calibration is not float32")
+    if scaleFactor32 != scaleFactor64:
+        raise AssertionError(f"FAILED: single precision scale factor {scaleFactor32} != {scaleFactor64}")
+    diffLSB = numpy.abs(numpy.round(signal64 * 32767) - numpy.round(signal32 * 32767))
+    if diffLSB.max() > 1:
+        raise AssertionError(f"FAILED: single precision calibration differs by {diffLSB.max()} LSB")
+
+
+def test_calibration_fast_fft_length():
+    # FFT zero-padded to a fast length shall match the unpadded
+    # calibration except of the record edges, for any number of workers
+    dat = 'tests/data/Rottnest_3154/502DB01D.DAT'
+    cal = 'tests/data/Rottnest_3154/Calib_file/501E9BF5.DAT'
+    cnl = -90.0
+    hs = -197.8
+
+    binData, numChannels, sampleRate, durationHeader, \
+        startTime, endTime, scheduleTime = rawdat.readRawFile(dat)
+    transfer = calibration.CalibrationTransfer(*calibration.loadPrepCalibFile(cal, cnl, hs))
+    volts = calibration.toVolts(binData)
+    reference = transfer.calibrateReal(volts)
+
+    try:
+        calibration.setFFTBackend(workers=2, fastLength=True)
+        numFFT = calibration.fftLength(volts.size)
+        calibratedSignal = transfer.calibrateReal(volts)
+    finally:
+        calibration.setFFTBackend()
+
+    if numFFT <= volts.size or calibratedSignal.size != volts.size:
+        raise AssertionError(f"FAILED: unexpected FFT length {numFFT} or signal size {calibratedSignal.size}")
+    edge = int(calibration.EDGE_EFFECT_SECONDS * sampleRate)
+    maxDiff = numpy.max(numpy.abs(calibratedSignal - reference)[edge:-edge]) / numpy.max(numpy.abs(reference))
+    if maxDiff > calibration.EDGE_EFFECT_REL_TOLERANCE:
+        raise AssertionError(f"FAILED: fast length FFT calibration differs by {maxDiff}")
+
+
+def test_calibration_spectral_highpass():
+    # high-pass applied in the frequency domain shall match the
+    # forward-backward IIR filter (sosfiltfilt) except of the record edges
+    deployments = [('tests/data/KI_3501/583E9500.DAT',
+                    'tests/data/KI_3501/Calib_file/5809C515.DAT', -198.1),
+                   ('tests/data/Portland_3092/4F480851.DAT',
+                    'tests/data/Portland_3092/Calib_file/4FEACA92.DAT', -197.5),
+                   ('tests/data/Rottnest_3154/502DB01D.DAT',
+                    'tests/data/Rottnest_3154/Calib_file/501E9BF5.DAT', -197.8)]
+    cnl = -90.0
+
+    for dat, cal, hs in deployments:
+        binData, numChannels, sampleRate, durationHeader, \
+            startTime, endTime, scheduleTime = rawdat.readRawFile(dat)
+        calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(cal, cnl, hs)
+        volts = calibration.toVolts(binData)
+
+        reference = calibration.calibrateReal(volts, cnl, hs, calSpec, calFreq, sampleRate)
+        transfer = calibration.CalibrationTransfer(calSpec, calFreq, sampleRate,
+                                                   spectralHighPass=True)
+        calibratedSignal = transfer.calibrateReal(volts)
+        moduleSignal = calibration.calibrateReal(volts, cnl, hs, calSpec, calFreq, sampleRate,
+                                                 spectralHighPass=True)
+
+        if not numpy.allclose(moduleSignal, calibratedSignal, rtol=1e-12, atol=0.0):
+            raise AssertionError(f"FAILED: spectral high-pass of calibrateReal() and "
+                                 f"CalibrationTransfer differ for {dat}")
+        edge = int(calibration.EDGE_EFFECT_SECONDS * sampleRate)
+        maxDiff = numpy.max(numpy.abs(calibratedSignal - reference)[edge:-edge]) / numpy.max(numpy.abs(reference))
+        if maxDiff > calibration.EDGE_EFFECT_REL_TOLERANCE:
+            raise AssertionError(f"FAILED: spectral high-pass differs from sosfiltfilt by {maxDiff} for {dat}")
+
+
+def test_calibration_workspace():
+    # calibration into reused buffers shall be identical to allocating
+    cal = 'tests/data/Rottnest_3154/Calib_file/501E9BF5.DAT'
+    calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(cal, -90.0, -197.8)
+    transfer = calibration.CalibrationTransfer(calSpec, calFreq, calSampleRate)
+    workspace = calibration.Workspace()
+
+    # longest record first, the shorter ones fit into its buffers
+    for dat in ['tests/data/Portland_3092/4F480851.DAT',
+                'tests/data/Rottnest_3154/502DB01D.DAT',
+                'tests/data/KI_3501/583E9500.DAT']:
+        binData = rawdat.readRawFile(dat)[0]
+        meanCount = numpy.mean(binData, dtype=numpy.float64)
+        reference, referenceScale = calibration.scale(transfer.calibrateReal(calibration.toVolts(binData, meanCount)))
+
+        numAllocations = workspace.numAllocations
+        volts = calibration.toVolts(binData, meanCount,
+                                    out=workspace.buffer('volts', binData.size, numpy.float64))
+        signal = transfer.calibrateReal(volts, workspace=workspace)
+        scaled, scaleFactor = calibration.scale(signal, signal)
+        if not numpy.array_equal(scaled, reference) or scaleFactor != referenceScale:
+            raise AssertionError(f"FAILED: calibration of {dat} in workspace differs")
+        if dat != 'tests/data/Portland_3092/4F480851.DAT' and workspace.numAllocations != numAllocations:
+            raise AssertionError(f"FAILED: workspace allocated {workspace.numAllocations - numAllocations} "
+                                 f"buffers for the shorter record {dat}")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_calibration_transfer()
+    test_calibration_float32()
+    test_calibration_fast_fft_length()
+    test_calibration_spectral_highpass()
+    test_calibration_workspace()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import logging
+import tempfile
+from datetime import datetime
+
+from IMOSPATools import rawdat
+from IMOSPATools import catalogue
+from IMOSPATools import synthetic
+
+log = logging.getLogger('IMOSPATools')
+
+
+def test_read_raw_file_info():
+    raw = 'tests/data/Portland_3092/4F480851.DAT'
+    info = rawdat.readRawFileInfo(raw)
+    binData, numChannels, sampleRate, durationHeader, \
+        startTime, endTime, scheduleTime = rawdat.readRawFile(raw)
+
+    if info.numSamples != binData.size:
+        raise AssertionError(f"FAILED: {info.numSamples} samples in info, {binData.size} read")
+    if (info.header.sampleRate, info.header.duration, info.header.schedule) != \
+            (sampleRate, durationHeader, scheduleTime):
+        raise AssertionError(f"FAILED: header {info.header} differs from readRawFile()")
+    if (info.footer.startTime, info.footer.endTime) != (startTime, endTime):
+        raise AssertionError(f"FAILED: footer {info.footer} differs from readRawFile()")
+    if info.footer.dataValidity != 'data is ok' or info.header.filter0.highFreq != 3500:
+        raise AssertionError(f"FAILED: unexpected header/footer fields {info}")
+
+
+def test_catalogue_incremental_scan():
+    with tempfile.TemporaryDirectory() as tmpDir:
+        rootDir = os.path.join(tmpDir, 'deployments')
+        for deployment in ['KI_3501', 'Rottnest_3154']:
+            shutil.copytree(os.path.join('tests/data', deployment), os.path.join(rootDir, deployment),
+                            ignore=shutil.ignore_patterns('*.wav', '*.flac'))
+        # not a RAW file, recorded as failed
+        with open(os.path.join(rootDir, 'BROKEN.DAT'), 'wb') as file:
+            file.write(b'not a record\n')
+
+        dbFileName = os.path.join(tmpDir, 'catalogue.sqlite')
+        with catalogue.Catalogue(dbFileName) as cat:
+            counts = cat.scan(rootDir)
+            if (counts['added'], counts['failed']) != (4, 1):
+                raise AssertionError(f"FAILED: unexpected first scan counts {counts}")
+            counts = cat.scan(rootDir)
+            if (counts['unchanged'], counts['added'], counts['updated']) != (5, 0, 0):
+                raise AssertionError(f"FAILED: unexpected rescan counts {counts}")
+
+        os.remove(os.path.join(rootDir, 'KI_3501', '583E9500.DAT'))
+        with catalogue.Catalogue(dbFileName) as cat:
+            counts = cat.scan(rootDir)
+            if counts['removed'] != 1 or len(cat) != 4:
+                raise AssertionError(f"FAILED: removed file still catalogued {counts}")
+
+            # the broken file is left out by default
+            records = cat.records()
+            names = [os.path.basename(r['path']) for r in records]
+            if names != ['501E9BF5.DAT', '502DB01D.DAT', '5809C515.DAT']:
+                raise AssertionError(f"FAILED: records not ordered by start time {names}")
+
+            rottnest = rawdat.readRawFileInfo('tests/data/Rottnest_3154/502DB01D.DAT')
+            window = cat.records(rottnest.footer.startTime, rottnest.footer.endTime)
+            if len(window) != 1 or window[0]['numSamples'] != rottnest.numSamples:
+                raise AssertionError(f"FAILED: time query returned {window}")
+
+
+def test_catalogue_filter1_channel():
+    # record of channel C2 (filter 1 line) instead of C0 - counted and
+    # rebuilt from the catalogue the same way as RawDatRecord does
+    with tempfile.TemporaryDirectory() as tmpDir:
+        rawFileName = os.path.join(tmpDir, 'C2.DAT')
+        synthetic.writeRawFile(rawFileName, datetime(2020, 1, 1), duration=2, tailSeconds=0.0)
+        with open(rawFileName, 'r+b') as file:
+            content = file.read().replace(b'C0=1 C1=0', b'C0=0 C1=0', 1).replace(b'C2=0', b'C2=1', 1)
+            file.seek(0)
+            file.write(content)
+
+        record = rawdat.RawDatRecord(rawFileName)
+        with catalogue.Catalogue(os.path.join(tmpDir, 'catalogue.sqlite')) as cat:
+            cat.scan(tmpDir)
+            rows = cat.records()
+        if len(rows) != 1 or rows[0]['numChannels'] != record.numChannels or record.numChannels != 1:
+            raise AssertionError(f"FAILED: channel count {rows} differs from RawDatRecord {record.numChannels}")
+        header = catalogue.rowToInfo(rows[0]).header
+        if (header.filter0, header.filter1) != (record.header.filter0, record.header.filter1):
+            raise AssertionError(f"FAILED: channels rebuilt from catalogue {header} differ from {record.header}")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_read_raw_file_info()
+    test_catalogue_incremental_scan()
+    test_catalogue_filter1_channel()
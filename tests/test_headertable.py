@@ -0,0 +1,74 @@
+import os
+import logging
+import tempfile
+import numpy
+from datetime import datetime
+
+from IMOSPATools import rawdat
+from IMOSPATools import synthetic
+from IMOSPATools import headertable
+
+log = logging.getLogger('IMOSPATools')
+
+
+def test_header_table_columns():
+    table = headertable.HeaderTable.fromDirectory('tests/data')
+    # 3 deployments, record and calibration file each
+    if len(table) != 6:
+        raise AssertionError(f"FAILED: {len(table)} records in header table of tests/data")
+    for row in table.records:
+        info = rawdat.readRawFileInfo(str(row['path']))
+        if tuple(row) != headertable.infoToTuple(info):
+            raise AssertionError(f"FAILED: header table row {row} differs from readRawFileInfo()")
+        if headertable.nsToDatetime(row['startTime']) != info.footer.startTime:
+            raise AssertionError(f"FAILED: start time of {row['path']} not exact in ns")
+        if row['numChannels'] != rawdat.RawDatRecord(str(row['path'])).numChannels:
+            raise AssertionError(f"FAILED: channel count of {row['path']} differs from RawDatRecord")
+
+    ordered = table.sortBy('startTime')
+    if not numpy.all(numpy.diff(ordered['startTime']) >= 0):
+        raise AssertionError("FAILED: header table not sorted by startTime")
+    portland = table.filter(numpy.char.find(table['path'], 'Portland_3092') >= 0)
+    if len(portland) != 2:
+        raise AssertionError(f"FAILED: filtering by path {portland['path']}")
+    recent = table.between(datetime(2016, 1, 1))
+    if not all('KI_3501' in p for p in recent['path']) or len(recent) != 2:
+        raise AssertionError(f"FAILED: records in time window {recent['path']}")
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        fileName = os.path.join(tmpDir, 'headers.npy')
+        table.save(fileName)
+        loaded = headertable.HeaderTable.load(fileName)
+        if not numpy.array_equal(loaded.records, table.records):
+            raise AssertionError("FAILED: header table differs after save/load")
+
+
+def test_header_table_gaps_and_drift():
+    with tempfile.TemporaryDirectory() as tmpDir:
+        startTime = datetime(2020, 1, 1)
+        fileNames = synthetic.writeDeployment(os.path.join(tmpDir, 'SYNTH'), 5, startTime,
+                                              interval=10.0, sampleRate=6000, duration=2,
+                                              tailSeconds=0.5, setID=7)
+        # not a RAW file, left out
+        with open(os.path.join(tmpDir, 'BROKEN.DAT'), 'wb') as file:
+            file.write(b'not a record\n')
+        table = headertable.HeaderTable.fromDirectory(tmpDir)
+        records = table.filter(numpy.isin(table['path'], fileNames)).sortBy('startTime')
+        if len(table) != 6 or len(records) != 5:
+            raise AssertionError(f"FAILED: {len(table)} records in synthetic deployment")
+
+        infos = [rawdat.readRawFileInfo(f) for f in fileNames]
+        expectedGaps = [(b.footer.startTime - a.footer.endTime).total_seconds() for a, b in zip(infos, infos[1:])]
+        if not numpy.allclose(records.gaps(), expectedGaps, atol=1e-6):
+            raise AssertionError(f"FAILED: gaps {records.gaps()} expected {expectedGaps}")
+        expectedDrift = [(i.footer.startTime - i.header.schedule).total_seconds() for i in infos]
+        if not numpy.allclose(records.drift(), expectedDrift, atol=1e-6):
+            raise AssertionError(f"FAILED: drift {records.drift()} expected {expectedDrift}")
+        if not numpy.allclose(records.durations(), 2.5, atol=1e-3) or records.sampleRateCounts() != {6000: 5}:
+            raise AssertionError(f"FAILED: durations {records.durations()} or sample rates")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    test_header_table_columns()
+    test_header_table_gaps_and_drift()
@@ -0,0 +1,65 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+
+from IMOSPATools import batch
+from IMOSPATools import manifest
+
+log = logging.getLogger('IMOSPATools')
+
+
+def test_manifest_incremental_batch():
+    with tempfile.TemporaryDirectory() as tmpDir:
+        inputs = [os.path.join(tmpDir, 'KI', '583E9500.DAT'),
+                  os.path.join(tmpDir, 'Rottnest', '502DB01D.DAT'),
+                  # the same record copied into another deployment folder
+                  os.path.join(tmpDir, 'copy', '583E9500_copy.DAT')]
+        sources = ['tests/data/KI_3501/583E9500.DAT',
+                   'tests/data/Rottnest_3154/502DB01D.DAT',
+                   'tests/data/KI_3501/583E9500.DAT']
+        for source, target in zip(sources, inputs):
+            os.makedirs(os.path.dirname(target))
+            shutil.copy(source, target)
+        outputDir = os.path.join(tmpDir, 'out')
+        manifestFileName = os.path.join(outputDir, manifest.MANIFEST_FILE_NAME)
+
+        def run(setID=0):
+            results = batch.runBatch(inputs, 'flac', outputDir, setID=setID, numWorkers=1,
+                                     manifestFileName=manifestFileName)
+            if not all(r.success for r in results):
+                raise AssertionError(f"FAILED: batch with manifest {results}")
+            return [r.skipped.split(' ')[0] for r in results]
+
+        if run() != ['', '', 'duplicate']:
+            raise AssertionError("FAILED: duplicate record converted twice")
+        outputMtime = os.stat(os.path.join(outputDir, '583E9500.flac')).st_mtime_ns
+        if run() != ['up', 'up', 'duplicate']:
+            raise AssertionError("FAILED: unchanged records converted again")
+        if os.stat(os.path.join(outputDir, '583E9500.flac')).st_mtime_ns != outputMtime:
+            raise AssertionError("FAILED: up to date output rewritten")
+
+        # touched, same content
+        os.utime(inputs[1], ns=(0, 0))
+        if run() != ['up', 'up', 'duplicate']:
+            raise AssertionError("FAILED: touched record with the same content converted again")
+        with open(manifestFileName) as file:
+            entry = json.load(file)['entries'][os.path.abspath(inputs[1])]
+        if entry['mtimeNs'] != 0 or entry['params']['version'] != manifest.__version__:
+            raise AssertionError(f"FAILED: manifest entry not refreshed {entry}")
+
+        # changed content, removed output, changed parameters
+        with open(inputs[1], 'r+b') as file:
+            file.seek(1000)
+            file.write(b'\x80\x00')
+        os.remove(os.path.join(outputDir, '583E9500.flac'))
+        if run() != ['', '', 'duplicate']:
+            raise AssertionError("FAILED: changed record or removed output not converted")
+        if run(setID=7) != ['', '', 'duplicate']:
+            raise AssertionError("FAILED: records not converted again with changed parameters")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    test_manifest_incremental_batch()
@@ -0,0 +1,121 @@
+import os
+import logging
+import tempfile
+import dataclasses
+import numpy
+import soundfile
+from datetime import timedelta
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import audiofile
+from IMOSPATools import merge
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def shiftedInfo(info: rawdat.RAWFileInfo, seconds: float) -> rawdat.RAWFileInfo:
+    # the same record pretending to be recorded later
+    footer = dataclasses.replace(info.footer,
+                                 startTime=info.footer.startTime + timedelta(seconds=seconds),
+                                 endTime=info.footer.endTime + timedelta(seconds=seconds))
+    return dataclasses.replace(info, footer=footer)
+
+
+def test_merge_gaps_and_overlaps():
+    raw = 'tests/data/Rottnest_3154/502DB01D.DAT'
+    cal = 'tests/data/Rottnest_3154/Calib_file/501E9BF5.DAT'
+    cnl = -90.0
+    hs = -197.8
+
+    info = rawdat.readRawFileInfo(raw)
+    sampleRate = info.header.sampleRate
+    recordSeconds = info.numSamples / sampleRate
+    # second record 3 s after the end of the first one,
+    # the third one overlapping the second one by 1 s
+    infos = [shiftedInfo(info, 2 * recordSeconds + 2.0), info, shiftedInfo(info, recordSeconds + 3.0)]
+
+    transfer = calibration.CalibrationTransfer(*calibration.loadPrepCalibFile(cal, cnl, hs))
+    reference, scaleFactor = calibration.scale(transfer.calibrateReal(calibration.toVolts(rawdat.readRawFile(raw)[0])))
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        outputFileName = os.path.join(tmpDir, 'merged.flac')
+        result = merge.mergeRecords(infos, outputFileName, transfer, 'flac', 3154, cnl, hs)
+        merged, mergedSampleRate = soundfile.read(outputFileName)
+        metadata = audiofile.extractMetadataJson(outputFileName)
+
+    gap = 3 * sampleRate
+    overlap = 1 * sampleRate
+    if result.numSamples != merged.size or merged.size != 3 * info.numSamples + gap - overlap:
+        raise AssertionError(f"FAILED: unexpected merged length {merged.size}")
+    if result.numGapSamples != gap or result.scaleFactor != scaleFactor or result.numClipped != 0:
+        raise AssertionError(f"FAILED: unexpected merge result {result}")
+    if numpy.any(merged[info.numSamples:info.numSamples + gap] != 0.0):
+        raise AssertionError("FAILED: gap between records is not silent")
+
+    # the overlapping start of the third record is dropped
+    thirdStart = 2 * info.numSamples + gap
+    for start, expected in [(0, reference), (info.numSamples + gap, reference),
+                            (thirdStart, reference[overlap:])]:
+        diff = numpy.max(numpy.abs(merged[start:start + expected.size] - expected))
+        if diff > 1.0 / (1 << 15):
+            raise AssertionError(f"FAILED: merged record at {start} differs by {diff}")
+
+    if int(metadata['numRecords']) != 3 or int(metadata['numClipped']) != 0:
+        raise AssertionError(f"FAILED: unexpected merged metadata {metadata}")
+    # [record, startTime, gap seconds] per record boundary - the gap is from
+    # the footer endTime of the previous record, 3 s gap then 1 s overlap
+    gaps = metadata['gaps']
+    footerSeconds = (info.footer.endTime - info.footer.startTime).total_seconds()
+    expectedGaps = [recordSeconds + 3.0 - footerSeconds, recordSeconds - 1.0 - footerSeconds]
+    if [g[0] for g in gaps] != ['502DB01D.DAT', '502DB01D.DAT'] or \
+            any(abs(g[2] - e) > 1e-5 for g, e in zip(gaps, expectedGaps)):
+        raise AssertionError(f"FAILED: unexpected gaps in merged metadata {gaps}")
+
+
+def test_merge_scale_factor():
+    # the scale factor comes from the loudest record, not the first one
+    raw = 'tests/data/Rottnest_3154/502DB01D.DAT'
+    info = rawdat.readRawFileInfo(raw)
+    binData = rawdat.readRawFile(raw)[0]
+    maxAbs = calibration.maxAbsOf(calibration.toVolts(binData))
+    # second record 10x louder (about the mean count)
+    mean = binData.mean()
+    louder = numpy.clip((binData - mean) * 10 + mean, 0, 65535).astype(rawdat.IMOS_DAT_FILE_DTYPE)
+    louderMaxAbs = calibration.maxAbsOf(calibration.toVolts(louder))
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        louderFileName = os.path.join(tmpDir, 'LOUDER.DAT')
+        with open(raw, 'rb') as file:
+            content = bytearray(file.read())
+        content[info.dataOffset:info.dataOffset + louder.nbytes] = louder.tobytes()
+        with open(louderFileName, 'wb') as file:
+            file.write(content)
+        recordSeconds = info.numSamples / info.header.sampleRate
+        infos = [info, shiftedInfo(rawdat.readRawFileInfo(louderFileName), recordSeconds)]
+
+        outputFileName = os.path.join(tmpDir, 'merged.wav')
+        result = merge.mergeRecords(infos, outputFileName)
+        if result.numClipped != 0 or result.scaleFactor != calibration.scaleFactorOf(None, louderMaxAbs) or \
+                result.scaleFactor == calibration.scaleFactorOf(None, maxAbs):
+            raise AssertionError(f"FAILED: scale factor not from the loudest record {result}")
+
+        # given scale factor of the quiet record, the louder one is clipped and counted
+        result = merge.mergeRecords(infos, outputFileName, scaleFactor=calibration.scaleFactorOf(None, maxAbs))
+        metadata = audiofile.extractMetadataJson(outputFileName)
+        if result.numClipped == 0 or int(metadata['numClipped']) != result.numClipped:
+            raise AssertionError(f"FAILED: clipped samples not stored in metadata {metadata}")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_merge_gaps_and_overlaps()
+    test_merge_scale_factor()
@@ -0,0 +1,110 @@
+import os
+import re
+import logging
+import tempfile
+import numpy
+import soundfile
+from datetime import datetime, timezone
+
+from IMOSPATools import audiofile
+from IMOSPATools import wav
+from IMOSPATools import metatable
+
+log = logging.getLogger('IMOSPATools')
+
+
+def makeMetadata(setID: int) -> audiofile.MetadataMerged:
+    return audiofile.MetadataMerged(setID=setID, sampleRate=6000, durationHeader=1.0, durationFile=1.0,
+                                    startTime=datetime(2012, 8, 17, 2, 45, 1, tzinfo=timezone.utc),
+                                    calibNoiseLevel=-90.0, numRecords=2,
+                                    gaps=[['502DB01D.DAT', '2012-08-17 02:45:01+00:00', 0.25]])
+
+
+def test_header_metadata_reader():
+    signal = (numpy.sin(numpy.arange(6000) * 0.1) * 10000).astype(numpy.int16)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for ext, fileFormat in (('wav', 'WAV'), ('flac', 'FLAC')):
+            fileName = os.path.join(tmpDir, f"record.{ext}")
+            metadata = makeMetadata(3154)
+            audiofile.writeMono16bit(fileName, signal, metadata, fileFormat)
+
+            expected = audiofile.formatMetadata(metadata)
+            if audiofile.extractMetadataStr(fileName) != expected:
+                raise AssertionError(f"FAILED: {fileFormat} metadata read from the header differs")
+            # same as the comment decoded by libsndfile
+            with soundfile.SoundFile(fileName) as sf:
+                match = re.search(r'(?:ICMT|comment)\s*:\s*({.*})', sf.extra_info)
+            if match is None or match.group(1) != expected:
+                raise AssertionError(f"FAILED: {fileFormat} metadata differs from soundfile extra_info")
+            if audiofile.extractMetadataJson(fileName)['gaps'] != metadata.gaps:
+                raise AssertionError(f"FAILED: {fileFormat} metadata json")
+
+        # wav module does not write IMOS metadata
+        fileName = os.path.join(tmpDir, "plain.wav")
+        wav.writeMono16bit(fileName, 6000, signal)
+        try:
+            audiofile.extractMetadataStr(fileName)
+            raise AssertionError("FAILED: metadata found in a file without comment")
+        except audiofile.IMOSAcousticAudioFileException:
+            pass
+
+
+def test_metadata_table():
+    signal = numpy.zeros(600, dtype=numpy.int16)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        os.makedirs(os.path.join(tmpDir, 'b'))
+        audiofile.writeMono16bit(os.path.join(tmpDir, 'a.wav'), signal, makeMetadata(1), 'WAV')
+        audiofile.writeMono16bit(os.path.join(tmpDir, 'b', 'c.flac'), signal, makeMetadata(2), 'FLAC')
+        wav.writeMono16bit(os.path.join(tmpDir, 'b', 'd.wav'), 6000, signal)
+        with open(os.path.join(tmpDir, 'b', 'e.flac'), 'wb') as file:
+            file.write(b'not an audio file')
+        with open(os.path.join(tmpDir, 'b', 'notes.txt'), 'w') as file:
+            file.write('skipped')
+
+        paths = metatable.findAudioFiles(tmpDir)
+        if [os.path.relpath(p, tmpDir) for p in paths] != ['a.wav', 'b/c.flac', 'b/d.wav', 'b/e.flac']:
+            raise AssertionError(f"FAILED: audio files found {paths}")
+        rows = metatable.readMetadataTable(paths, numWorkers=3)
+        if [r['setID'] for r in rows[:2]] != ['1', '2'] or [r['format'] for r in rows[:2]] != ['WAVE', 'FLAC']:
+            raise AssertionError(f"FAILED: metadata table rows {rows[:2]}")
+        if [r['error'] is None for r in rows] != [True, True, False, False]:
+            raise AssertionError(f"FAILED: errors in metadata table {[r['error'] for r in rows]}")
+
+        csvFileName = os.path.join(tmpDir, 'table.csv')
+        with open(csvFileName, 'w', newline='') as file:
+            metatable.writeCsv(rows, file)
+        with open(csvFileName) as file:
+            header = file.readline().strip().split(',')
+        if header[:4] != ['path', 'format', 'error', 'setID'] or header[-1] != 'gaps':
+            raise AssertionError(f"FAILED: metadata table columns {header}")
+
+
+def test_inspect_streaming_stats():
+    rng = numpy.random.default_rng(1)
+    signal = rng.integers(-20000, 20000, 10007).astype(numpy.int16)
+    signal[[5, 4096, 10006]] = [32767, -32768, 32767]
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for ext, fileFormat in (('wav', 'WAV'), ('flac', 'FLAC')):
+            fileName = os.path.join(tmpDir, f"record.{ext}")
+            metadata = makeMetadata(3154)
+            audiofile.writeMono16bit(fileName, signal, metadata, fileFormat)
+
+            info = audiofile.inspectInfo(fileName)
+            if info.numFrames != signal.size or info.sampleRate != 6000 or \
+                    info.comment != audiofile.formatMetadata(metadata):
+                raise AssertionError(f"FAILED: {fileFormat} header info {info}")
+
+            # blocks not aligned with the signal length
+            stats = audiofile.inspectStats(fileName, blockFrames=1000)
+            full = soundfile.read(fileName)[0]
+            if stats.numFrames != signal.size or stats.numClipped != 3 or \
+                    stats.maxAbs != numpy.max(numpy.abs(full)) or \
+                    not numpy.isclose(stats.rms, numpy.sqrt(numpy.mean(full ** 2)), rtol=1e-12):
+                raise AssertionError(f"FAILED: {fileFormat} block-wise stats {stats}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    test_header_metadata_reader()
+    test_metadata_table()
+    test_inspect_streaming_stats()
@@ -0,0 +1,66 @@
+import os
+import glob
+import logging
+import tempfile
+import numpy
+import soundfile
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import batch
+from IMOSPATools import prefetch
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+RAW_FILES = ['tests/data/KI_3501/583E9500.DAT',
+             'tests/data/Portland_3092/4F480851.DAT',
+             'tests/data/Rottnest_3154/502DB01D.DAT']
+
+
+def test_prefetcher_order_and_depth():
+    started = []
+    readRecord = prefetch.readRecord
+
+    def recordingRead(fileName):
+        started.append(fileName)
+        return readRecord(fileName)
+
+    prefetch.readRecord = recordingRead
+    try:
+        fileNames = RAW_FILES + ['tests/data/MISSING.DAT']
+        for i, (fileName, future) in enumerate(prefetch.Prefetcher(fileNames, depth=1)):
+            if fileName != fileNames[i]:
+                raise AssertionError(f"FAILED: prefetched {fileName} out of order")
+            # the current record and one ahead, not more
+            if len(started) > i + 2:
+                raise AssertionError(f"FAILED: {len(started)} records read ahead of record {i}")
+            if i < len(RAW_FILES):
+                record = prefetch.waitRecord(future)
+                if isinstance(record.samples, numpy.memmap) or \
+                        not numpy.array_equal(record.samples, rawdat.readRawFile(fileName)[0]):
+                    raise AssertionError(f"FAILED: prefetched samples of {fileName} differ")
+            elif not isinstance(future.exception(), (IOError, OSError)):
+                raise AssertionError("FAILED: read error of missing file not raised by the future")
+    finally:
+        prefetch.readRecord = readRecord
+
+
+def test_batch_prefetch():
+    with tempfile.TemporaryDirectory() as tmpDir:
+        outputs = {}
+        for prefetchDepth in (0, 2):
+            outputDir = os.path.join(tmpDir, f"prefetch{prefetchDepth}")
+            results = batch.runBatch(RAW_FILES + ['tests/data/MISSING.DAT'], 'flac', outputDir,
+                                     numWorkers=1, prefetchDepth=prefetchDepth, writerThreads=1)
+            if [r.success for r in results] != [True, True, True, False]:
+                raise AssertionError(f"FAILED: batch with prefetch depth {prefetchDepth} {results}")
+            outputs[prefetchDepth] = [soundfile.read(f)[0] for f in sorted(glob.glob(os.path.join(outputDir, '*.flac')))]
+        if len(outputs[2]) != 3 or not all(numpy.array_equal(a, b) for a, b in zip(outputs[0], outputs[2])):
+            raise AssertionError("FAILED: batch files converted with prefetch differ")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    test_prefetcher_order_and_depth()
+    test_batch_prefetch()
@@ -0,0 +1,99 @@
+import io
+import os
+import json
+import time
+import logging
+import tempfile
+
+from IMOSPATools import profiling
+from IMOSPATools import batch
+from IMOSPATools import calibration
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+@profiling.timed('test.outer')
+def _outer():
+    time.sleep(0.02)
+    with profiling.stage('test.inner'):
+        time.sleep(0.05)
+
+
+def test_profiling_stages():
+    # disabled - shared no-op stage, nothing recorded
+    profiling.disable()
+    profiling.beginFile('none')
+    _outer()
+    if profiling.stage('test.inner') is not profiling.stage('test.other'):
+        raise AssertionError("FAILED: disabled profiling creates stage objects")
+    if profiling.endFile() is not None:
+        raise AssertionError("FAILED: disabled profiling returned a record")
+
+    stream = io.StringIO()
+    profiling.enable(stream=stream)
+    try:
+        profiling.beginFile('test.DAT')
+        _outer()
+        record = profiling.endFile(numSamples=1)
+    finally:
+        profiling.disable()
+
+    stages = record['stages']
+    # nested stage time is excluded from the enclosing stage
+    if not (0.04 <= stages['test.inner'] and 0.015 <= stages['test.outer'] < 0.045):
+        raise AssertionError(f"FAILED: unexpected stage times {stages}")
+    if abs(sum(stages.values()) - record['total']) > 1e-6 or record['numSamples'] != 1:
+        raise AssertionError(f"FAILED: stage times do not add up to the total {record}")
+    if json.loads(stream.getvalue()) != record:
+        raise AssertionError("FAILED: written JSON line differs from the record")
+
+
+def test_profiling_batch():
+    rawFileNames = ['tests/data/Rottnest_3154/502DB01D.DAT',
+                    'tests/data/KI_3501/583E9500.DAT']
+    with tempfile.TemporaryDirectory() as tmpDir:
+        profileFileName = os.path.join(tmpDir, 'profile.jsonl')
+        results = batch.runBatch(rawFileNames, 'wav', tmpDir, numWorkers=1,
+                                 profileFileName=profileFileName)
+        if profiling.isEnabled():
+            raise AssertionError("FAILED: profiling left enabled after the batch")
+        records = profiling.readProfile(profileFileName)
+
+        # second batch into the same profile file, encoded asynchronously -
+        # the records of the batch are told apart by its run id, and closed
+        # once the files are written, with the encoding time of the writer thread
+        runID = profiling.newRunID()
+        asyncResults = batch.runBatch(rawFileNames[:1], 'wav', tmpDir, numWorkers=1,
+                                      profileFileName=profileFileName, writerThreads=1,
+                                      profileRunID=runID)
+        asyncRecords = profiling.readProfile(profileFileName, runID)
+
+    if [r['file'] for r in records] != rawFileNames or not all(r.success for r in results):
+        raise AssertionError(f"FAILED: expected one profile record per file, got {records}")
+    for stageName in ('rawdat.read', 'calibration.toVolts', 'audiofile.encode'):
+        if any(stageName not in r['stages'] for r in records):
+            raise AssertionError(f"FAILED: stage {stageName} not profiled")
+
+    aggregated = profiling.aggregateProfile(records)
+    if aggregated['rawdat.read']['calls'] != 2:
+        raise AssertionError(f"FAILED: unexpected aggregated calls {aggregated}")
+    if abs(sum(e['fraction'] for e in aggregated.values()) - 1.0) > 1e-6:
+        raise AssertionError("FAILED: stage fractions do not add up to 1")
+
+    if [r['file'] for r in asyncRecords] != rawFileNames[:1] or not asyncResults[0].success:
+        raise AssertionError(f"FAILED: expected one profile record of the run, got {asyncRecords}")
+    if not asyncRecords[0]['success'] or 'audiofile.encode' not in asyncRecords[0]['stages']:
+        raise AssertionError(f"FAILED: asynchronous write not profiled {asyncRecords[0]}")
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_profiling_stages()
+    test_profiling_batch()
@@ -0,0 +1,66 @@
+import logging
+import tracemalloc
+import numpy
+import scipy
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import psd
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def test_streaming_welch():
+    # incremental Welch estimate shall equal scipy.signal.welch() of the
+    # whole signal, for any block size and even or odd segment length
+    signal = numpy.random.default_rng(0).normal(2.5, 0.1, 100003)
+    for fs, blockSize in ((6000, 7777), (6001, 100003), (50, 1)):
+        window = scipy.signal.windows.hamming(fs)
+        refFreq, refSpec = scipy.signal.welch(signal, fs, window=window)
+
+        welch = psd.StreamingWelch(fs, window)
+        for i in range(0, signal.size, blockSize):
+            welch.update(signal[i:i + blockSize])
+        freq, spec = welch.psd()
+
+        if not numpy.array_equal(freq, refFreq) or not numpy.allclose(spec, refSpec, rtol=1e-12, atol=0.0):
+            raise AssertionError(f"FAILED: streaming Welch differs from scipy.signal.welch for fs {fs}")
+
+    spec = signal[:2001] ** 2
+    if not numpy.array_equal(psd.runningMedian(spec, 51), scipy.signal.medfilt(spec, 51)):
+        raise AssertionError("FAILED: running median differs from scipy.signal.medfilt")
+
+
+def test_load_calib_file_streaming():
+    cal = 'tests/data/Portland_3092/Calib_file/4FEACA92.DAT'
+    cnl = -90.0
+    hs = -197.5
+
+    reference = calibration.loadPrepCalibFile(cal, cnl, hs, streaming=False)
+    tracemalloc.start()
+    calSpec, calFreq, sampleRate = calibration.loadPrepCalibFile(cal, cnl, hs)
+    peakBytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if not numpy.allclose(calSpec, reference[0], rtol=1e-12, atol=0.0) or \
+            not numpy.array_equal(calFreq, reference[1]) or sampleRate != reference[2]:
+        raise AssertionError("FAILED: streaming calibration spectrum differs from the whole record one")
+    # memory bounded by the block, not by the record in Volts
+    recordBytes = rawdat.readRawFileInfo(cal).numSamples * numpy.dtype(numpy.float64).itemsize
+    if peakBytes > recordBytes / 2:
+        raise AssertionError(f"FAILED: streaming calibration peak memory {peakBytes} "
+                             f"not bounded, record is {recordBytes} bytes")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_streaming_welch()
+    test_load_calib_file_streaming()
@@ -0,0 +1,55 @@
+import logging
+import numpy
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import qa
+
+log = logging.getLogger('IMOSPATools')
+
+
+def test_signal_qa_synthetic():
+    # known overload and flat line runs, processed in small blocks
+    # so that the runs continue across block boundaries
+    binData = numpy.full(1000, 32768, dtype='>u2')
+    binData[::2] += 1
+    binData[100:130] = 65535         # overload and flat line, 30 samples
+    binData[500:505] = 0             # overload, 5 samples
+    binData[700:720] = 1000          # flat line, 20 samples
+    binData[999] = 20                # overload at the end of the record
+
+    for blockSize in [7, 64, qa.QA_BLOCK_SIZE]:
+        signalQA = qa.computeSignalQA(binData, flatLineMinSamples=16, blockSize=blockSize)
+        expected = qa.SignalQA(numSamples=1000, numOverloaded=36, longestOverloadRun=30,
+                               minCount=0, maxCount=65535,
+                               meanCount=float(numpy.mean(binData.astype(numpy.float64))),
+                               numFlatRuns=2, longestFlatRun=30, numFlatSamples=50)
+        if signalQA != expected:
+            raise AssertionError(f"FAILED: signal QA {signalQA} with block size {blockSize}, expected {expected}")
+
+
+def test_signal_qa_raw_file():
+    rawFileName = 'tests/data/KI_3501/583E9500.DAT'
+    binData = rawdat.readRawFileMapped(rawFileName)[0]
+
+    signalQA = qa.computeSignalQA(binData)
+    if signalQA.numOverloaded != calibration.countOverload(binData):
+        raise AssertionError("FAILED: signal QA overload count differs from countOverload()")
+    if signalQA.minCount != binData.min() or signalQA.maxCount != binData.max():
+        raise AssertionError("FAILED: signal QA min/max differs from numpy")
+    volts = calibration.toVolts(binData, signalQA.meanCount)
+    if not numpy.allclose(volts, calibration.toVolts(binData), rtol=0.0, atol=1e-12):
+        raise AssertionError("FAILED: toVolts() with QA mean differs")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_signal_qa_synthetic()
+    test_signal_qa_raw_file()
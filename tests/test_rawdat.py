@@ -0,0 +1,82 @@
+import logging
+import numpy
+
+from IMOSPATools import rawdat
+
+log = logging.getLogger('IMOSPATools')
+
+RAW_FILES = ['tests/data/Rottnest_3154/502DB01D.DAT',
+             'tests/data/KI_3501/583E9500.DAT',
+             'tests/data/Portland_3092/4F480851.DAT',
+             'tests/data/Portland_3092/Calib_file/4FEACA92.DAT']
+# number of samples including the tail beyond the header duration
+RAW_FILES_NUM_SAMPLES = [1842224, 1842318, 2045960, 2046235]
+
+
+def test_find_footer_offset():
+    for rawFileName, numSamples in zip(RAW_FILES, RAW_FILES_NUM_SAMPLES):
+        with open(rawFileName, 'rb') as file:
+            rawdat.readRawHeaderEssentials(file)
+            dataOffset = file.tell()
+            footerOffset = rawdat.findFooterOffset(file, dataOffset)
+            file.seek(footerOffset)
+            if not file.read(len(rawdat.FOOTER_MARKER)) == rawdat.FOOTER_MARKER:
+                raise AssertionError(f"FAILED: footer of {rawFileName} not found at {footerOffset}")
+
+        binData = rawdat.readRawFile(rawFileName)[0]
+        if binData.size != numSamples:
+            raise AssertionError(f"FAILED: {rawFileName} has {binData.size} samples, expected {numSamples}")
+
+
+def test_read_raw_file_mapped():
+    # memory mapped reader shall return the same data as readRawFile()
+    for rawFileName in RAW_FILES:
+        reference = rawdat.readRawFile(rawFileName)
+
+        mapped = rawdat.readRawFileMapped(rawFileName)
+        if not isinstance(mapped[0], numpy.memmap):
+            raise AssertionError(f"FAILED: samples of {rawFileName} are not memory mapped")
+        if not numpy.array_equal(mapped[0], reference[0]) or mapped[1:] != reference[1:]:
+            raise AssertionError(f"FAILED: memory mapped read of {rawFileName} differs from readRawFile()")
+
+        native = rawdat.readRawFileMapped(rawFileName, nativeEndian=True)
+        if not native[0].dtype.isnative or not numpy.array_equal(native[0], reference[0]):
+            raise AssertionError(f"FAILED: native endian read of {rawFileName} differs from readRawFile()")
+
+
+def test_raw_dat_record_lazy():
+    for rawFileName in RAW_FILES:
+        record = rawdat.RawDatRecord(rawFileName)
+        if hasattr(record, '__dict__'):
+            raise AssertionError("FAILED: RawDatRecord instances have __dict__")
+
+        reference = rawdat.readRawFile(rawFileName)
+        # header only
+        if (record.numChannels, record.sampleRate, record.durationHeader, record.schedule) != \
+                (reference[1], reference[2], reference[3], reference[6]) or record._footer is not None:
+            raise AssertionError(f"FAILED: header of {rawFileName} differs or footer read eagerly")
+        # footer on first access, samples not yet
+        if (record.startTime, record.endTime) != reference[4:6] or record._samples is not None:
+            raise AssertionError(f"FAILED: footer of {rawFileName} differs or samples read eagerly")
+        if record.info() != rawdat.readRawFileInfo(rawFileName):
+            raise AssertionError(f"FAILED: RawDatRecord info of {rawFileName} differs from readRawFileInfo()")
+
+        if not isinstance(record.samples, numpy.memmap) or not numpy.array_equal(record.samples, reference[0]):
+            raise AssertionError(f"FAILED: mapped samples of {rawFileName} differ from readRawFile()")
+        inMemory = rawdat.RawDatRecord(rawFileName, mapped=False).samples
+        if isinstance(inMemory, numpy.memmap) or not numpy.array_equal(inMemory, reference[0]):
+            raise AssertionError(f"FAILED: samples of {rawFileName} differ from readRawFile()")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_find_footer_offset()
+    test_read_raw_file_mapped()
+    test_raw_dat_record_lazy()
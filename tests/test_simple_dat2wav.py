@@ -1,4 +1,5 @@
 import os
+import tempfile
 import logging
 import numpy
 
@@ -11,7 +12,7 @@ log = logging.getLogger('IMOSPATools')
 calibration.doWriteIntermediateResults = False
 
 
-def simple_dat2wav(rawFileName: str) -> bool:
+def simple_dat2wav(rawFileName: str, outputDir: str) -> bool:
     """
     Test conversion from raw DAT file to MS wave
     - No calibration included.
@@ -44,7 +45,7 @@ def simple_dat2wav(rawFileName: str) -> bool:
             scaledSignalInt16 = wav.scaleSignalFloatTo16bitPCM(volts)
 
             # write normalised scaled but still raw uncalibrated data into a wav file
-            wavFileName = wav.deriveWavFileName(rawFileName)
+            wavFileName = os.path.join(outputDir, os.path.basename(wav.deriveWavFileName(rawFileName)))
             wav.writeMono16bit(wavFileName, sampleRate, scaledSignalInt16)
         except rawdat.IMOSAcousticRAWReadException:
             raise AssertionError(f"FAILED: normalise and write wave file {wavFileName}")
@@ -60,9 +61,10 @@ def test_simple_dat2wav():
     dat1 = 'tests/data/Rottnest_3154/502DB01D.DAT'
     dat2 = 'tests/data/KI_3501/583E9500.DAT'
     dat3 = 'tests/data/Portland_3092/4F480851.DAT'
-    simple_dat2wav(dat1)
-    simple_dat2wav(dat2)
-    simple_dat2wav(dat3)
+    with tempfile.TemporaryDirectory() as outputDir:
+        simple_dat2wav(dat1, outputDir)
+        simple_dat2wav(dat2, outputDir)
+        simple_dat2wav(dat3, outputDir)
 
 
 if __name__ == "__main__":
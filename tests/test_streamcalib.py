@@ -0,0 +1,96 @@
+import os
+import logging
+import tempfile
+import numpy
+import soundfile
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import streamcalib
+from IMOSPATools import audiofile
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def test_calibrate_chunked():
+    # chunked calibration shall match calibrateReal() within the documented tolerance
+    dat = 'tests/data/KI_3501/583E9500.DAT'
+    cal = 'tests/data/KI_3501/Calib_file/5809C515.DAT'
+    cnl = -90.0
+    hs = -196.0
+
+    binData, numChannels, sampleRate, durationHeader, \
+        startTime, endTime, scheduleTime = rawdat.readRawFileMapped(dat)
+    calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(cal, cnl, hs)
+    transfer = calibration.CalibrationTransfer(calSpec, calFreq, sampleRate)
+    volts = calibration.toVolts(binData)
+    reference = transfer.calibrateReal(volts)
+
+    # odd block size, so blocks do not align with the overlap-save segments
+    calibratedSignal = streamcalib.calibrateChunked(volts, transfer, blockSize=12345)
+    if calibratedSignal.size != reference.size:
+        raise AssertionError(f"FAILED: chunked calibration returned {calibratedSignal.size} samples")
+
+    edge = int(sampleRate * streamcalib.STREAM_EDGE_SECONDS)
+    maxDiff = numpy.max(numpy.abs(calibratedSignal[edge:-edge] - reference[edge:-edge]))
+    relDiff = maxDiff / numpy.max(numpy.abs(reference))
+    if relDiff > streamcalib.STREAM_REL_TOLERANCE:
+        raise AssertionError(f"FAILED: chunked calibration differs from calibrateReal() by {relDiff}")
+
+    # streaming directly from memory mapped raw data gives the same result
+    blocks = list(streamcalib.iterCalibrateRaw(binData, transfer, blockSize=100000))
+    if not numpy.allclose(numpy.concatenate(blocks), calibratedSignal, rtol=0.0, atol=1e-9):
+        raise AssertionError("FAILED: calibration of raw data blocks differs from calibrateChunked()")
+
+
+def test_calibrate_raw_to_file():
+    # streamed calibration written block by block shall match the whole
+    # record calibration within the documented tolerance and 16 bit resolution
+    dat = 'tests/data/KI_3501/583E9500.DAT'
+    cal = 'tests/data/KI_3501/Calib_file/5809C515.DAT'
+    cnl = -90.0
+    hs = -196.0
+
+    record = rawdat.RawDatRecord(dat)
+    calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(cal, cnl, hs)
+    transfer = calibration.CalibrationTransfer(calSpec, calFreq, record.sampleRate)
+    reference, referenceScaleFactor = calibration.scale(transfer.calibrateReal(calibration.toVolts(record.samples)))
+
+    with tempfile.TemporaryDirectory() as outputDir:
+        outputFileName = os.path.join(outputDir, 'streamed.wav')
+        metadata = audiofile.MetadataFull(sampleRate=record.sampleRate)
+        scaleFactor = streamcalib.calibrateRawToFile(record.samples, transfer, outputFileName,
+                                                     metadata, blockSize=54321)
+        if scaleFactor != referenceScaleFactor:
+            raise AssertionError(f"FAILED: streamed scale factor {scaleFactor} differs from {referenceScaleFactor}")
+        signal, sampleRate = soundfile.read(outputFileName)
+        if signal.size != reference.size:
+            raise AssertionError(f"FAILED: streamed calibration wrote {signal.size} samples")
+        if float(audiofile.extractMetadataJson(outputFileName)['scaleFactor']) != scaleFactor:
+            raise AssertionError("FAILED: scale factor not stored in metadata")
+
+        edge = int(sampleRate * streamcalib.STREAM_EDGE_SECONDS)
+        relDiff = numpy.max(numpy.abs(signal[edge:-edge] - reference[edge:-edge])) / numpy.max(numpy.abs(reference))
+        if relDiff > streamcalib.STREAM_REL_TOLERANCE + 2.0 ** -15:
+            raise AssertionError(f"FAILED: streamed calibration differs from calibrateReal() by {relDiff}")
+
+        # given scale factor, single pass, clipped beyond it
+        streamcalib.calibrateRawToFile(record.samples, transfer, outputFileName, metadata,
+                                       scaleFactor=scaleFactor / 10.0)
+        signal, sampleRate = soundfile.read(outputFileName)
+        if metadata.scaleFactor != scaleFactor / 10.0 or numpy.max(numpy.abs(signal)) > 1.0:
+            raise AssertionError("FAILED: given scale factor not applied")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_calibrate_chunked()
+    test_calibrate_raw_to_file()
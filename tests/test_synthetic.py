@@ -0,0 +1,82 @@
+import os
+import logging
+import tempfile
+import numpy
+from datetime import datetime, timedelta
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import catalogue
+from IMOSPATools import synthetic
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+
+def test_synthetic_raw_file():
+    schedule = datetime(2020, 1, 2, 3, 4, 5, 500000)
+    binData = synthetic.synthesizeSignal(6000 * 12, 6000, seed=7)
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for footerLines in [4, 6]:
+            fileName = os.path.join(tmpDir, synthetic.rawFileNameFor(schedule))
+            synthetic.writeRawFile(fileName, schedule, 6000, 10, setID=3501,
+                                   footerLines=footerLines, binData=binData)
+
+            info = rawdat.readRawFileInfo(fileName)
+            if (info.header.setID, info.header.sampleRate, info.header.duration) != (3501, 6000, 10):
+                raise AssertionError(f"FAILED: unexpected synthetic header {info.header}")
+            # sub-seconds have 1/65536 s resolution
+            if abs(info.header.schedule - schedule) > timedelta(microseconds=16):
+                raise AssertionError(f"FAILED: schedule {info.header.schedule} differs from {schedule}")
+            if footerLines == 6 and info.footer.dataBlockSize != 65536 or info.footer.dataValidity != 'data is ok':
+                raise AssertionError(f"FAILED: unexpected synthetic footer {info.footer}")
+
+            # the 2 s tail beyond the nominal duration is kept
+            readData, numChannels, sampleRate, durationHeader, \
+                startTime, endTime, scheduleTime = rawdat.readRawFile(fileName)
+            if not numpy.array_equal(readData, binData) or numChannels != 1:
+                raise AssertionError("FAILED: samples read differ from the samples written")
+            if not startTime < endTime or startTime != info.footer.startTime:
+                raise AssertionError(f"FAILED: unexpected footer times {startTime} {endTime}")
+
+
+def test_synthetic_deployment():
+    with tempfile.TemporaryDirectory() as tmpDir:
+        deploymentDir = os.path.join(tmpDir, 'SYNTH_1234')
+        fileNames = synthetic.writeDeployment(deploymentDir, 4, datetime(2020, 1, 1), interval=60.0,
+                                              duration=30, tailSeconds=1.0, setID=1234, cnl=-90.0, hs=-197.0)
+
+        with catalogue.Catalogue(os.path.join(tmpDir, 'catalogue.sqlite')) as cat:
+            counts = cat.scan(deploymentDir)
+            records = cat.records()
+        # the records plus the calibration file
+        if counts['added'] != 5 or counts['failed'] != 0:
+            raise AssertionError(f"FAILED: unexpected catalogue scan of synthetic deployment {counts}")
+        records = [r for r in records if synthetic.CALIB_FILE_DIR not in r['path']]
+        if sorted(r['path'] for r in records) != sorted(fileNames):
+            raise AssertionError("FAILED: synthetic records not catalogued")
+        if any(r['numSamples'] != 31 * 6000 for r in records):
+            raise AssertionError("FAILED: unexpected number of samples of synthetic records")
+
+        calibDir = os.path.join(deploymentDir, synthetic.CALIB_FILE_DIR)
+        calibFileName = [os.path.join(calibDir, f) for f in os.listdir(calibDir) if f.endswith('.DAT')][0]
+        with open(os.path.join(calibDir, synthetic.CALIB_PARAMS_FILE_NAME), 'r') as file:
+            if 'Hydrophone sensitivity: -197' not in file.read():
+                raise AssertionError("FAILED: unexpected synthetic calibration parameters")
+        calSpec, calFreq, calSampleRate = calibration.loadPrepCalibFile(calibFileName, -90.0, -197.0)
+        if calSampleRate != 6000 or not numpy.all(numpy.isfinite(calSpec)):
+            raise AssertionError("FAILED: synthetic calibration file not usable")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_synthetic_raw_file()
+    test_synthetic_deployment()
@@ -0,0 +1,83 @@
+import os
+import logging
+import tempfile
+import numpy
+from datetime import timedelta
+
+from IMOSPATools import rawdat
+from IMOSPATools import calibration
+from IMOSPATools import catalogue
+from IMOSPATools import timewindow
+
+log = logging.getLogger('IMOSPATools')
+calibration.doWriteIntermediateResults = False
+
+# relative to the max abs amplitude of the calibrated record
+WINDOW_REL_TOLERANCE = 5e-4
+
+
+def test_extract_window_matches_full_record():
+    raw = 'tests/data/Rottnest_3154/502DB01D.DAT'
+    cal = 'tests/data/Rottnest_3154/Calib_file/501E9BF5.DAT'
+    cnl = -90.0
+    hs = -197.8
+
+    info = rawdat.readRawFileInfo(raw)
+    transfer = calibration.CalibrationTransfer(*calibration.loadPrepCalibFile(cal, cnl, hs))
+    binData = rawdat.readRawFile(raw)[0]
+    reference = transfer.calibrateReal(calibration.toVolts(binData))
+
+    # 20 s window in the middle of the record, odd number of samples read
+    startTime = info.footer.startTime + timedelta(seconds=100.0002)
+    endTime = startTime + timedelta(seconds=20)
+    window = timewindow.extractWindow([info], startTime, endTime, transfer)
+
+    segment = window.segments[0]
+    if window.numCovered != window.signal.size or window.signal.size != 20 * info.header.sampleRate:
+        raise AssertionError(f"FAILED: window not fully covered {window.numCovered} of {window.signal.size}")
+    expected = reference[segment.firstSample:segment.firstSample + segment.numSamples]
+    maxDiff = numpy.max(numpy.abs(window.signal - expected)) / numpy.max(numpy.abs(reference))
+    if maxDiff > WINDOW_REL_TOLERANCE:
+        raise AssertionError(f"FAILED: window differs from whole record calibration by {maxDiff}")
+
+
+def test_extract_window_partial_coverage():
+    with tempfile.TemporaryDirectory() as tmpDir:
+        with catalogue.Catalogue(os.path.join(tmpDir, 'catalogue.sqlite')) as cat:
+            cat.scan('tests/data/KI_3501')
+            info = rawdat.readRawFileInfo('tests/data/KI_3501/583E9500.DAT')
+            # window starting 5 s before the record
+            startTime = info.footer.startTime - timedelta(seconds=5)
+            endTime = info.footer.startTime + timedelta(seconds=5)
+            infos = cat.fileInfos(startTime, endTime)
+
+    if [os.path.basename(i.fileName) for i in infos] != ['583E9500.DAT']:
+        raise AssertionError(f"FAILED: catalogue returned unexpected records {infos}")
+
+    window = timewindow.extractWindow(infos, startTime, endTime)
+    sampleRate = info.header.sampleRate
+    segment = window.segments[0]
+    if (segment.firstSample, segment.outputOffset, window.numCovered) != (0, 5 * sampleRate, 5 * sampleRate):
+        raise AssertionError(f"FAILED: unexpected window segment {segment}")
+    if numpy.any(window.signal[:segment.outputOffset] != 0.0):
+        raise AssertionError("FAILED: samples not covered by any record are not zero")
+
+    # uncalibrated - just Volts, with the mean of the padded range removed
+    padSamples = int(timewindow.WINDOW_PAD_SECONDS * sampleRate)
+    expected = calibration.toVolts(rawdat.readRawSampleRange(info, 0, segment.numSamples + padSamples))
+    expected = expected[:segment.numSamples]
+    if not numpy.allclose(window.signal[segment.outputOffset:], expected):
+        raise AssertionError("FAILED: window samples differ from the record samples")
+
+
+if __name__ == "__main__":
+    # set debugging logging level so we see as much as pos in testing
+    logLevel = logging.DEBUG
+
+    logFormat = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s] %(levelname)s: %(message)s"
+    logging.basicConfig(level=logLevel, format=logFormat,
+                        #  seconds resolution is good enough for logging timestamp
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    test_extract_window_matches_full_record()
+    test_extract_window_partial_coverage()